@@ -0,0 +1,116 @@
+"""Partition run_details by run_id (one LIST partition per run)
+
+Revision ID: 004_partition_run_details
+Revises: 003_add_run_progress
+Create Date: 2024-01-03 00:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '004_partition_run_details'
+down_revision = '003_add_run_progress'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = (
+    "id, run_id, case_id, case_data, truth, pred_value, pred_ok, pred_status, "
+    "pred_raw, pred_meta, match, mismatch_reason, compare_detail, comment, tag, reviewed"
+)
+
+
+def upgrade() -> None:
+    # Mover la tabla actual a un lado (conservando la secuencia de ids)
+    op.execute("ALTER SEQUENCE run_details_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE run_details RENAME TO run_details_legacy")
+    op.execute("ALTER TABLE run_details_legacy RENAME CONSTRAINT run_details_pkey TO run_details_legacy_pkey")
+    op.execute("ALTER INDEX ix_run_details_run_id RENAME TO ix_run_details_legacy_run_id")
+    op.execute("ALTER INDEX ix_run_details_case_id RENAME TO ix_run_details_legacy_case_id")
+
+    # Tabla particionada: la PK debe incluir la clave de partición.
+    # La PK (run_id, id) cubre además las búsquedas por run_id.
+    op.execute(
+        """
+        CREATE TABLE run_details (
+            id INTEGER NOT NULL DEFAULT nextval('run_details_id_seq'::regclass),
+            run_id VARCHAR NOT NULL REFERENCES runs (run_id),
+            case_id VARCHAR NOT NULL,
+            case_data JSON NOT NULL,
+            truth VARCHAR,
+            pred_value VARCHAR,
+            pred_ok BOOLEAN NOT NULL,
+            pred_status VARCHAR NOT NULL,
+            pred_raw TEXT,
+            pred_meta JSON NOT NULL DEFAULT '{}',
+            match BOOLEAN NOT NULL,
+            mismatch_reason TEXT,
+            compare_detail JSON NOT NULL DEFAULT '{}',
+            comment TEXT,
+            tag VARCHAR,
+            reviewed BOOLEAN NOT NULL DEFAULT false,
+            CONSTRAINT run_details_pkey PRIMARY KEY (run_id, id)
+        ) PARTITION BY LIST (run_id)
+        """
+    )
+    op.execute("CREATE INDEX ix_run_details_case_id ON run_details (case_id)")
+
+    # Una partición por run existente + DEFAULT para filas sin partición propia
+    op.execute(
+        """
+        DO $$
+        DECLARE r RECORD;
+        BEGIN
+            FOR r IN SELECT run_id FROM runs LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF run_details FOR VALUES IN (%L)',
+                    'run_details_' || replace(r.run_id, '-', ''), r.run_id
+                );
+            END LOOP;
+        END $$;
+        """
+    )
+    op.execute("CREATE TABLE run_details_default PARTITION OF run_details DEFAULT")
+
+    op.execute(f"INSERT INTO run_details ({COLUMNS}) SELECT {COLUMNS} FROM run_details_legacy")
+    op.execute("DROP TABLE run_details_legacy")
+    op.execute("ALTER SEQUENCE run_details_id_seq OWNED BY run_details.id")
+
+
+def downgrade() -> None:
+    op.execute("ALTER SEQUENCE run_details_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE run_details RENAME TO run_details_partitioned")
+    op.execute("ALTER TABLE run_details_partitioned RENAME CONSTRAINT run_details_pkey TO run_details_partitioned_pkey")
+    op.execute("ALTER INDEX ix_run_details_case_id RENAME TO ix_run_details_partitioned_case_id")
+
+    op.execute(
+        """
+        CREATE TABLE run_details (
+            id INTEGER NOT NULL DEFAULT nextval('run_details_id_seq'::regclass),
+            run_id VARCHAR NOT NULL REFERENCES runs (run_id),
+            case_id VARCHAR NOT NULL,
+            case_data JSON NOT NULL,
+            truth VARCHAR,
+            pred_value VARCHAR,
+            pred_ok BOOLEAN NOT NULL,
+            pred_status VARCHAR NOT NULL,
+            pred_raw TEXT,
+            pred_meta JSON NOT NULL DEFAULT '{}',
+            match BOOLEAN NOT NULL,
+            mismatch_reason TEXT,
+            compare_detail JSON NOT NULL DEFAULT '{}',
+            comment TEXT,
+            tag VARCHAR,
+            reviewed BOOLEAN NOT NULL DEFAULT false,
+            CONSTRAINT run_details_pkey PRIMARY KEY (id)
+        )
+        """
+    )
+    op.execute("CREATE INDEX ix_run_details_run_id ON run_details (run_id)")
+    op.execute("CREATE INDEX ix_run_details_case_id ON run_details (case_id)")
+
+    op.execute(f"INSERT INTO run_details ({COLUMNS}) SELECT {COLUMNS} FROM run_details_partitioned")
+    # DROP del padre elimina todas sus particiones
+    op.execute("DROP TABLE run_details_partitioned")
+    op.execute("ALTER SEQUENCE run_details_id_seq OWNED BY run_details.id")
@@ -0,0 +1,44 @@
+"""Add cold storage: blobs table and run_details blob references
+
+Revision ID: 005_add_cold_storage
+Revises: 004_partition_run_details
+Create Date: 2024-01-04 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005_add_cold_storage'
+down_revision = '004_partition_run_details'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'blobs',
+        sa.Column('blob_hash', sa.String(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('blob_hash')
+    )
+
+    # Sobre la tabla particionada los cambios se propagan a todas las particiones
+    op.add_column('run_details', sa.Column('pred_raw_ref', sa.String(), nullable=True))
+    op.add_column('run_details', sa.Column('case_data_ref', sa.String(), nullable=True))
+    op.alter_column('run_details', 'case_data', nullable=True)
+    op.create_index(op.f('ix_run_details_pred_raw_ref'), 'run_details', ['pred_raw_ref'], unique=False)
+    op.create_index(op.f('ix_run_details_case_data_ref'), 'run_details', ['case_data_ref'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_run_details_case_data_ref'), table_name='run_details')
+    op.drop_index(op.f('ix_run_details_pred_raw_ref'), table_name='run_details')
+    # Falla si hay case_data en frío (case_data NULL): hay que rehidratarlos antes
+    op.alter_column('run_details', 'case_data', nullable=False)
+    op.drop_column('run_details', 'case_data_ref')
+    op.drop_column('run_details', 'pred_raw_ref')
+    op.drop_table('blobs')
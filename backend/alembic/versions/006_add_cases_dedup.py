@@ -0,0 +1,42 @@
+"""Add cases table for content-addressed case_data deduplication
+
+Revision ID: 006_add_cases_dedup
+Revises: 005_add_cold_storage
+Create Date: 2024-01-05 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '006_add_cases_dedup'
+down_revision = '005_add_cold_storage'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'cases',
+        sa.Column('case_hash', sa.String(), nullable=False),
+        sa.Column('data', postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('case_hash')
+    )
+
+    # Las filas existentes conservan su case_data inline
+    op.add_column('run_details', sa.Column('case_hash', sa.String(), nullable=True))
+    op.create_index(op.f('ix_run_details_case_hash'), 'run_details', ['case_hash'], unique=False)
+
+
+def downgrade() -> None:
+    # Rehidratar case_data antes de eliminar la tabla de payloads
+    op.execute(
+        "UPDATE run_details SET case_data = c.data FROM cases c "
+        "WHERE run_details.case_hash = c.case_hash"
+    )
+    op.drop_index(op.f('ix_run_details_case_hash'), table_name='run_details')
+    op.drop_column('run_details', 'case_hash')
+    op.drop_table('cases')
@@ -0,0 +1,25 @@
+"""Add pipeline_metrics to runs (queue depth and utilization per stage)
+
+Revision ID: 007_add_pipeline_metrics
+Revises: 006_add_cases_dedup
+Create Date: 2024-01-06 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '007_add_pipeline_metrics'
+down_revision = '006_add_cases_dedup'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('runs', sa.Column('pipeline_metrics', postgresql.JSON(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('runs', 'pipeline_metrics')
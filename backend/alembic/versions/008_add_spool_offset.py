@@ -0,0 +1,24 @@
+"""Add spool_offset to runs (bytes of the local spool already loaded)
+
+Revision ID: 008_add_spool_offset
+Revises: 007_add_pipeline_metrics
+Create Date: 2024-01-07 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008_add_spool_offset'
+down_revision = '007_add_pipeline_metrics'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('runs', sa.Column('spool_offset', sa.BigInteger(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('runs', 'spool_offset')
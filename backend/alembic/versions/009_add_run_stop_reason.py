@@ -0,0 +1,27 @@
+"""Add stop_reason and circuit_breaker to runs
+
+Revision ID: 009_add_run_stop_reason
+Revises: 008_add_spool_offset
+Create Date: 2024-01-08 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '009_add_run_stop_reason'
+down_revision = '008_add_spool_offset'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('runs', sa.Column('stop_reason', sa.Text(), nullable=True))
+    op.add_column('runs', sa.Column('circuit_breaker', postgresql.JSON(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('runs', 'circuit_breaker')
+    op.drop_column('runs', 'stop_reason')
@@ -0,0 +1,25 @@
+"""Add sampling to runs
+
+Revision ID: 010_add_run_sampling
+Revises: 009_add_run_stop_reason
+Create Date: 2024-01-09 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '010_add_run_sampling'
+down_revision = '009_add_run_stop_reason'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('runs', sa.Column('sampling', postgresql.JSON(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('runs', 'sampling')
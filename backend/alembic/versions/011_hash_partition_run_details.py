@@ -0,0 +1,91 @@
+"""Repartition run_details by HASH (run_id) with a fixed set of partitions
+
+Revision ID: 011_hash_partition_run_details
+Revises: 010_add_run_sampling
+Create Date: 2024-01-10 00:00:00.000000
+
+La partición LIST por run (004) hacía un CREATE TABLE ... PARTITION OF en
+cada create_run (ACCESS EXCLUSIVE sobre run_details) y la cantidad de
+particiones crecía sin límite. Con HASH el conjunto es fijo y no hay DDL en
+el camino de los requests.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '011_hash_partition_run_details'
+down_revision = '010_add_run_sampling'
+branch_labels = None
+depends_on = None
+
+
+# Debe coincidir con app.db.partitions.HASH_PARTITIONS
+HASH_PARTITIONS = 16
+
+COLUMNS = (
+    "id, run_id, case_id, case_data, case_data_ref, case_hash, truth, pred_value, pred_ok, pred_status, "
+    "pred_raw, pred_raw_ref, pred_meta, match, mismatch_reason, compare_detail, comment, tag, reviewed"
+)
+
+INDEXED = ("case_id", "case_data_ref", "pred_raw_ref", "case_hash")
+
+
+def _create_parent(partition_by: str) -> None:
+    # Mismas columnas que run_details después de 005/006
+    op.execute(
+        f"""
+        CREATE TABLE run_details (LIKE run_details_previous INCLUDING DEFAULTS)
+        PARTITION BY {partition_by}
+        """
+    )
+    op.execute("ALTER TABLE run_details ADD CONSTRAINT run_details_pkey PRIMARY KEY (run_id, id)")
+    op.execute("ALTER TABLE run_details ADD FOREIGN KEY (run_id) REFERENCES runs (run_id)")
+    for column in INDEXED:
+        op.execute(f"CREATE INDEX ix_run_details_{column} ON run_details ({column})")
+
+
+def _move_aside() -> None:
+    op.execute("ALTER SEQUENCE run_details_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE run_details RENAME TO run_details_previous")
+    op.execute("ALTER TABLE run_details_previous RENAME CONSTRAINT run_details_pkey TO run_details_previous_pkey")
+    for column in INDEXED:
+        op.execute(f"ALTER INDEX ix_run_details_{column} RENAME TO ix_run_details_previous_{column}")
+
+
+def _copy_and_drop_previous() -> None:
+    op.execute(f"INSERT INTO run_details ({COLUMNS}) SELECT {COLUMNS} FROM run_details_previous")
+    # DROP del padre elimina todas sus particiones
+    op.execute("DROP TABLE run_details_previous")
+    op.execute("ALTER SEQUENCE run_details_id_seq OWNED BY run_details.id")
+
+
+def upgrade() -> None:
+    _move_aside()
+    _create_parent("HASH (run_id)")
+    for remainder in range(HASH_PARTITIONS):
+        op.execute(
+            f"CREATE TABLE run_details_p{remainder:02d} PARTITION OF run_details "
+            f"FOR VALUES WITH (MODULUS {HASH_PARTITIONS}, REMAINDER {remainder})"
+        )
+    _copy_and_drop_previous()
+
+
+def downgrade() -> None:
+    _move_aside()
+    _create_parent("LIST (run_id)")
+    op.execute(
+        """
+        DO $$
+        DECLARE r RECORD;
+        BEGIN
+            FOR r IN SELECT run_id FROM runs LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF run_details FOR VALUES IN (%L)',
+                    'run_details_' || replace(r.run_id, '-', ''), r.run_id
+                );
+            END LOOP;
+        END $$;
+        """
+    )
+    op.execute("CREATE TABLE run_details_default PARTITION OF run_details DEFAULT")
+    _copy_and_drop_previous()
@@ -0,0 +1,74 @@
+"""Endpoints de datasets subidos (ver app.core.datasets)"""
+from typing import List, Optional
+
+from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile
+
+from app.core import datasets
+from app.core.serialization import FastJSONResponse
+from app.models.dto import Case, DatasetInfo
+
+router = APIRouter(prefix="/api/datasets", tags=["datasets"])
+
+
+@router.post("", response_model=DatasetInfo)
+def upload_dataset(
+    file: UploadFile = File(...),
+    name: Optional[str] = Form(None),
+    format: Optional[str] = Form(None),
+    id_field: str = Form("id"),
+):
+    """Sube un CSV o JSONL (formato por `format` o por la extensión del archivo).
+
+    El archivo se convierte fila por fila, sin cargarlo entero en memoria.
+    Los plugins lo leen con `open_dataset(dataset_id)`.
+    """
+    try:
+        source_format = datasets.detect_format(file.filename, format)
+        meta = datasets.import_dataset(file.file, name or file.filename or "dataset", source_format, id_field)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Dataset inválido: {str(e)}")
+    finally:
+        file.file.close()
+    return DatasetInfo(**meta)
+
+
+@router.get("", response_model=List[DatasetInfo])
+def list_datasets():
+    """Lista los datasets subidos (más nuevos primero)"""
+    return [DatasetInfo(**meta) for meta in datasets.list_datasets()]
+
+
+@router.get("/{dataset_id}", response_model=DatasetInfo)
+def get_dataset(dataset_id: str):
+    """Obtiene la información de un dataset"""
+    try:
+        return DatasetInfo(**datasets.get_dataset_meta(dataset_id))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Dataset no encontrado")
+
+
+@router.get("/{dataset_id}/cases", response_model=List[Case], response_class=FastJSONResponse)
+def get_dataset_cases(
+    dataset_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Casos [offset, offset + limit) del dataset (acceso directo por índice)"""
+    try:
+        dataset = datasets.open_dataset(dataset_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Dataset no encontrado")
+    with dataset:
+        return [caso.model_dump() for caso in dataset.iter_range(offset, offset + limit)]
+
+
+@router.delete("/{dataset_id}")
+def delete_dataset(dataset_id: str):
+    """Elimina un dataset"""
+    try:
+        deleted = datasets.delete_dataset(dataset_id)
+    except KeyError:
+        deleted = False
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Dataset no encontrado")
+    return {"message": "Dataset eliminado"}
@@ -4,14 +4,35 @@ from sqlalchemy.orm import Session
 from typing import List, Dict, Any
 from datetime import datetime
 
-from app.db.session import get_db
+from app.db.session import get_db, SessionLocal
 from app.core.plugin import PluginFactory
-from app.models.dto import PluginCreate, PluginUpdate, PluginInfo
+from app.core.sandbox import close_pool
+from app.core.smoke_tests import SmokeTestJobs
+from app.models.dto import PluginCreate, PluginUpdate, PluginInfo, SmokeTestJob
 from app.models.db import Plugin
-from app.core.deps import ALLOWED_PACKAGES, BUILTIN_PACKAGES
+from app.core.deps import ALLOWED_PACKAGES, BUILTIN_PACKAGES, invalidate_caches, probe_modules
 
 router = APIRouter(prefix="/api/plugins", tags=["plugins"])
 
+# Smoke tests en background (background_test / background=true)
+smoke_tests = SmokeTestJobs(SessionLocal)
+
+
+def _builtin_plugin_info(plugin_name: str) -> PluginInfo:
+    # Metadatos desde la clase registrada en PluginFactory (display_name, config_schema)
+    plugin_class = PluginFactory.builtin_plugins()[plugin_name]
+    return PluginInfo(
+        plugin_name=plugin_name,
+        display_name=plugin_class.display_name or plugin_name,
+        status="active",
+        error_message=None,
+        config_schema=dict(plugin_class.config_schema),
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+        last_test_at=None
+    )
+
+
 
 @router.get("/deps")
 def get_plugin_deps() -> Dict[str, Any]:
@@ -19,15 +40,23 @@ def get_plugin_deps() -> Dict[str, Any]:
     return {
         "allowed": sorted(list(ALLOWED_PACKAGES)),
         "builtin": sorted(list(BUILTIN_PACKAGES)),
+        "installed": probe_modules(ALLOWED_PACKAGES),
         "note": "Si necesitás otra librería (no builtin y no listada), instalala en el proyecto antes de importarla."
     }
 
+
+@router.post("/deps/refresh")
+def refresh_plugin_deps() -> Dict[str, Any]:
+    """Vuelve a sondear los paquetes instalados (después de instalar o quitar uno)"""
+    invalidate_caches()
+    return {"installed": probe_modules(ALLOWED_PACKAGES)}
+
 @router.post("", response_model=PluginInfo)
-def create_plugin(plugin_data: PluginCreate, db: Session = Depends(get_db)):
-    """Crea un nuevo plugin"""
+def create_plugin(plugin_data: PluginCreate, background_test: bool = False, db: Session = Depends(get_db)):
+    """Crea un nuevo plugin (con background_test=true el smoke test no bloquea el request)"""
     # Verificar que no exista
     existing = db.query(Plugin).filter(Plugin.plugin_name == plugin_data.plugin_name).first()
-    if existing:
+    if existing or PluginFactory.is_builtin(plugin_data.plugin_name):
         raise HTTPException(status_code=400, detail=f"Plugin '{plugin_data.plugin_name}' ya existe")
     
     # Crear plugin
@@ -45,11 +74,15 @@ def create_plugin(plugin_data: PluginCreate, db: Session = Depends(get_db)):
     db.commit()
     
     # Probar el plugin
-    success, error_msg = PluginFactory.test_plugin(plugin_data.plugin_name, db)
-    if not success:
-        plugin.status = "error"
-        plugin.error_message = error_msg
-        db.commit()
+    test_job_id = None
+    if background_test:
+        test_job_id = smoke_tests.submit(plugin_data.plugin_name, plugin.code).job_id
+    else:
+        success, error_msg = PluginFactory.test_plugin(plugin_data.plugin_name, db)
+        if not success:
+            plugin.status = "error"
+            plugin.error_message = error_msg
+            db.commit()
     
     return PluginInfo(
         plugin_name=plugin.plugin_name,
@@ -59,7 +92,8 @@ def create_plugin(plugin_data: PluginCreate, db: Session = Depends(get_db)):
         config_schema=plugin.config_schema,
         created_at=plugin.created_at,
         updated_at=plugin.updated_at,
-        last_test_at=plugin.last_test_at
+        last_test_at=plugin.last_test_at,
+        test_job_id=test_job_id
     )
 
 
@@ -69,18 +103,7 @@ def list_plugins(db: Session = Depends(get_db)):
     plugins = db.query(Plugin).order_by(Plugin.plugin_name).all()
     
     # También incluir plugins built-in
-    built_in_plugins = [
-        PluginInfo(
-            plugin_name="demo",
-            display_name="Demo Plugin",
-            status="active",
-            error_message=None,
-            config_schema={"num_casos": "int", "error_rate": "float"},
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow(),
-            last_test_at=None
-        )
-    ]
+    built_in_plugins = [_builtin_plugin_info(name) for name in PluginFactory.builtin_plugins()]
     
     db_plugins = [
         PluginInfo(
@@ -103,17 +126,8 @@ def list_plugins(db: Session = Depends(get_db)):
 def get_plugin(plugin_name: str, db: Session = Depends(get_db)):
     """Obtiene información de un plugin"""
     # Si es built-in
-    if plugin_name == "demo":
-        return PluginInfo(
-            plugin_name="demo",
-            display_name="Demo Plugin",
-            status="active",
-            error_message=None,
-            config_schema={"num_casos": "int", "error_rate": "float"},
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow(),
-            last_test_at=None
-        )
+    if PluginFactory.is_builtin(plugin_name):
+        return _builtin_plugin_info(plugin_name)
     
     plugin = db.query(Plugin).filter(Plugin.plugin_name == plugin_name).first()
     if not plugin:
@@ -132,10 +146,11 @@ def get_plugin(plugin_name: str, db: Session = Depends(get_db)):
 
 
 @router.put("/{plugin_name}", response_model=PluginInfo)
-def update_plugin(plugin_name: str, plugin_data: PluginUpdate, db: Session = Depends(get_db)):
-    """Actualiza un plugin"""
-    if plugin_name == "demo":
-        raise HTTPException(status_code=400, detail="No se puede modificar el plugin 'demo'")
+def update_plugin(plugin_name: str, plugin_data: PluginUpdate, background_test: bool = False,
+                  db: Session = Depends(get_db)):
+    """Actualiza un plugin (con background_test=true el smoke test no bloquea el request)"""
+    if PluginFactory.is_builtin(plugin_name):
+        raise HTTPException(status_code=400, detail=f"No se puede modificar el plugin '{plugin_name}'")
     
     plugin = db.query(Plugin).filter(Plugin.plugin_name == plugin_name).first()
     if not plugin:
@@ -154,7 +169,8 @@ def update_plugin(plugin_name: str, plugin_data: PluginUpdate, db: Session = Dep
     plugin.updated_at = datetime.utcnow()
     
     # Si se actualizó el código, probar el plugin
-    if plugin_data.code is not None:
+    test_job_id = None
+    if plugin_data.code is not None and not background_test:
         success, error_msg = PluginFactory.test_plugin(plugin_name, db)
         if not success:
             plugin.status = "error"
@@ -164,6 +180,10 @@ def update_plugin(plugin_name: str, plugin_data: PluginUpdate, db: Session = Dep
     
     db.commit()
     
+    if plugin_data.code is not None and background_test:
+        # Después del commit: el job lee el código nuevo con su propia sesión
+        test_job_id = smoke_tests.submit(plugin_name, plugin.code).job_id
+    
     return PluginInfo(
         plugin_name=plugin.plugin_name,
         display_name=plugin.display_name,
@@ -172,33 +192,44 @@ def update_plugin(plugin_name: str, plugin_data: PluginUpdate, db: Session = Dep
         config_schema=plugin.config_schema,
         created_at=plugin.created_at,
         updated_at=plugin.updated_at,
-        last_test_at=plugin.last_test_at
+        last_test_at=plugin.last_test_at,
+        test_job_id=test_job_id
     )
 
 
 @router.post("/{plugin_name}/test")
-def test_plugin(plugin_name: str, db: Session = Depends(get_db)):
-    """Prueba un plugin para verificar que funciona"""
-    if plugin_name == "demo":
-        return {"success": True, "message": "Plugin demo siempre funciona"}
+def test_plugin(plugin_name: str, background: bool = False, db: Session = Depends(get_db)):
+    """Prueba un plugin para verificar que funciona (timings por fase; background=true devuelve un job)"""
+    if PluginFactory.is_builtin(plugin_name):
+        return {"success": True, "message": f"Plugin {plugin_name} siempre funciona"}
     
     plugin = db.query(Plugin).filter(Plugin.plugin_name == plugin_name).first()
     if not plugin:
         raise HTTPException(status_code=404, detail="Plugin no encontrado")
     
-    success, error_msg = PluginFactory.test_plugin(plugin_name, db)
+    if background:
+        return smoke_tests.submit(plugin_name, plugin.code)
     
-    if success:
-        return {"success": True, "message": "Plugin probado exitosamente"}
-    else:
-        return {"success": False, "message": error_msg}
+    result = PluginFactory.smoke_test(plugin_name, db)
+    if result.success:
+        result.message = "Plugin probado exitosamente"
+    return result
+
+
+@router.get("/{plugin_name}/test/{job_id}", response_model=SmokeTestJob)
+def get_test_job(plugin_name: str, job_id: str):
+    """Estado de un smoke test en background"""
+    job = smoke_tests.get(job_id)
+    if not job or job.plugin_name != plugin_name:
+        raise HTTPException(status_code=404, detail="Smoke test no encontrado")
+    return job
 
 
 @router.delete("/{plugin_name}")
 def delete_plugin(plugin_name: str, db: Session = Depends(get_db)):
     """Elimina un plugin"""
-    if plugin_name == "demo":
-        raise HTTPException(status_code=400, detail="No se puede eliminar el plugin 'demo'")
+    if PluginFactory.is_builtin(plugin_name):
+        raise HTTPException(status_code=400, detail=f"No se puede eliminar el plugin '{plugin_name}'")
     
     plugin = db.query(Plugin).filter(Plugin.plugin_name == plugin_name).first()
     if not plugin:
@@ -206,6 +237,7 @@ def delete_plugin(plugin_name: str, db: Session = Depends(get_db)):
     
     db.delete(plugin)
     db.commit()
+    close_pool(plugin_name)
     
     return {"message": f"Plugin '{plugin_name}' eliminado"}
 
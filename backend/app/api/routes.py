@@ -1,19 +1,24 @@
 """Endpoints de la API FastAPI"""
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from enum import Enum
 import csv
 import io
+import json
 from datetime import datetime
 
 from app.db.session import get_db, SessionLocal
-from app.core.runner import MassTestRunner
+from app.core.runner import MassTestRunner, cancellable, request_cancel
 from app.core.plugin import PluginFactory
+from app.core.scheduler import RunScheduler
+from app.core.spool import SpoolPending
 from app.core.store import ResultStore
+from app.core.serialization import FastJSONResponse
 from app.models.dto import (
-    RunConfig, RunResult, RunSummary, RunDetail as RunDetailDTO, CommentRequest, RunProgress
+    RunConfig, RunResult, RunSummary, RunDetail as RunDetailDTO, CommentRequest, RunProgress,
+    RunComparison
 )
 from app.models.db import Run, RunDetail
 
@@ -27,6 +32,13 @@ class DetailFilter(str, Enum):
     ERROR = "errors"
 
 
+class CompareFilter(str, Enum):
+    """Filtros para la lista de casos de una comparación"""
+    ALL = "all"
+    REGRESSIONS = "regressions"
+    FIXES = "fixes"
+
+
 def get_store(db: Session = Depends(get_db)) -> ResultStore:
     """Dependency para obtener ResultStore"""
     return ResultStore(db)
@@ -38,12 +50,21 @@ def get_runner(store: ResultStore = Depends(get_store)) -> MassTestRunner:
 
 
 def run_background_task(run_id: str, config: RunConfig):
-    """Ejecuta el run en background"""
+    """Ejecuta el run en background (lo lanza el scheduler cuando hay capacidad)"""
     db = SessionLocal()
     try:
         store = ResultStore(db)
-        runner = MassTestRunner(store)
-        runner.run_existing(run_id, config, db)
+        # Cancelable desde antes de start_run: no hay ventana en la que el run
+        # figure "running" sin que cancel_run lo encuentre
+        with cancellable(run_id):
+            if not store.start_run(run_id):
+                # Se eliminó o canceló mientras estaba en cola
+                return
+            runner = MassTestRunner(store)
+            runner.run_existing(run_id, config, db)
+    except SpoolPending as e:
+        # El run terminó y sus resultados están en el spool: lo cierra el SpoolDrainer
+        print(f"Run {run_id}: {str(e)}")
     except Exception as e:
         # Marcar run como failed
         run = db.query(Run).filter(Run.run_id == run_id).first()
@@ -55,31 +76,41 @@ def run_background_task(run_id: str, config: RunConfig):
         db.close()
 
 
+# Cola global de runs (capacidad por SCHEDULER_* en .env, ver app.core.scheduler)
+scheduler = RunScheduler(run_background_task)
+
+
 @router.post("/runs")
 def create_run(
     config: RunConfig,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
-    Crea una nueva ejecución y la ejecuta en segundo plano.
+    Crea una nueva ejecución y la encola; arranca en segundo plano cuando hay capacidad.
     Retorna el run_id inmediatamente.
     """
     try:
         store = ResultStore(db)
         
         # Crear run manualmente
-        run_id = store.create_run(config.plugin_name, config.config)
+        run_id = store.create_run(config.plugin_name, config.config, status="queued")
         
-        # Agregar tarea en background
-        background_tasks.add_task(run_background_task, run_id, config)
+        # Encolar en el scheduler
+        position = scheduler.submit(run_id, config)
         
-        return {"run_id": run_id, "status": "running", "message": "Run iniciado en segundo plano"}
+        if position is None:
+            return {"run_id": run_id, "status": "running", "message": "Run iniciado en segundo plano"}
+        return {
+            "run_id": run_id,
+            "status": "queued",
+            "queue_position": position,
+            "message": f"Run en cola (posición {position})"
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/runs", response_model=List[RunSummary])
+@router.get("/runs", response_model=List[RunSummary], response_class=FastJSONResponse)
 def list_runs(
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
@@ -107,13 +138,44 @@ def list_runs(
             total_cases=total,
             mismatches=mismatches,
             errors=errors,
-            processed_cases=run.processed_cases
+            processed_cases=run.processed_cases,
+            queue_position=scheduler.position(run.run_id) if run.status == "queued" else None,
+            stop_reason=run.stop_reason
         ))
     
     return summaries
 
 
-@router.get("/runs/{run_id}/details", response_model=List[RunDetailDTO])
+@router.get("/runs/queue")
+def get_run_queue():
+    """Runs en ejecución y en cola del scheduler, con la posición de cada uno"""
+    return dict(
+        scheduler.snapshot(),
+        max_concurrent_runs=scheduler.config.max_concurrent_runs,
+        plugin_limits=scheduler.config.plugin_limits,
+    )
+
+
+@router.get("/runs/compare", response_model=RunComparison, response_class=FastJSONResponse)
+def compare_runs(
+    base: str = Query(..., description="run_id de referencia"),
+    head: str = Query(..., description="run_id a comparar contra base"),
+    filter: Optional[CompareFilter] = Query(None, description="Filtro: all, regressions, fixes"),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    store: ResultStore = Depends(get_store)
+):
+    """Compara dos runs por case_id: regresiones, fixes, delta de matriz de confusión
+    y lista paginada de casos que cambiaron de resultado"""
+    for run_id in (base, head):
+        if not store.get_run(run_id):
+            raise HTTPException(status_code=404, detail=f"Run '{run_id}' no encontrado")
+    
+    kind = filter.value if filter and filter != CompareFilter.ALL else None
+    return store.compare_runs(base, head, kind=kind, limit=limit, offset=offset)
+
+
+@router.get("/runs/{run_id}/details", response_model=List[RunDetailDTO], response_class=FastJSONResponse)
 def get_run_details(
     run_id: str,
     filter: Optional[DetailFilter] = Query(None, description="Filtro: all, mismatches, errors"),
@@ -130,10 +192,11 @@ def get_run_details(
     # Convertir Enum a string o None
     filter_str = filter.value if filter else None
     details = store.get_run_details(run_id, filter_type=filter_str, limit=limit, offset=offset)
+    # Los payloads en almacenamiento frío no se descomprimen en el listado
     return [
         RunDetailDTO(
             case_id=d.case_id,
-            case_data=d.case_data,
+            case_data=store.load_case_data(d, include_cold=False),
             truth=d.truth,
             pred_value=d.pred_value,
             pred_ok=d.pred_ok,
@@ -144,12 +207,37 @@ def get_run_details(
             meta=d.pred_meta,
             comment=d.comment,
             tag=d.tag,
-            reviewed=d.reviewed
+            reviewed=d.reviewed,
+            cold_storage=bool(d.pred_raw_ref or d.case_data_ref)
         )
         for d in details
     ]
 
 
+@router.get("/runs/{run_id}/details/{case_id}", response_model=RunDetailDTO, response_class=FastJSONResponse)
+def get_run_detail(run_id: str, case_id: str, store: ResultStore = Depends(get_store)):
+    """Obtiene el detalle completo de un caso (descomprime raw/case_data si están en frío)"""
+    detail = store.get_run_detail(run_id, case_id)
+    if not detail:
+        raise HTTPException(status_code=404, detail="Caso no encontrado")
+    
+    return RunDetailDTO(
+        case_id=detail.case_id,
+        case_data=store.load_case_data(detail),
+        truth=detail.truth,
+        pred_value=detail.pred_value,
+        pred_ok=detail.pred_ok,
+        pred_status=detail.pred_status,
+        match=detail.match,
+        mismatch_reason=detail.mismatch_reason,
+        raw=store.load_pred_raw(detail),
+        meta=detail.pred_meta,
+        comment=detail.comment,
+        tag=detail.tag,
+        reviewed=detail.reviewed
+    )
+
+
 @router.post("/runs/{run_id}/details/{case_id}/comment")
 def add_comment(
     run_id: str,
@@ -176,7 +264,12 @@ def add_comment(
 
 @router.get("/runs/{run_id}/export.csv")
 def export_csv(run_id: str, store: ResultStore = Depends(get_store)):
-    """Exporta detalles de un run a CSV"""
+    """Exporta detalles de un run a CSV.
+    
+    La columna case_data no incluye los payloads en almacenamiento frío (queda
+    `{}`, igual que en el listado de detalles): descomprimir hasta 10k blobs en
+    un request es demasiado caro. Se ven al abrir el caso.
+    """
     # Verificar que el run existe
     run = store.get_run(run_id)
     if not run:
@@ -191,7 +284,7 @@ def export_csv(run_id: str, store: ResultStore = Depends(get_store)):
     # Headers
     writer.writerow([
         "case_id", "truth", "pred_value", "match", "pred_ok", "pred_status",
-        "mismatch_reason", "comment", "tag", "reviewed"
+        "mismatch_reason", "comment", "tag", "reviewed", "case_data"
     ])
     
     # Datos
@@ -206,7 +299,8 @@ def export_csv(run_id: str, store: ResultStore = Depends(get_store)):
             d.mismatch_reason or "",
             d.comment or "",
             d.tag or "",
-            d.reviewed
+            d.reviewed,
+            json.dumps(store.load_case_data(d, include_cold=False), ensure_ascii=False)
         ])
     
     output.seek(0)
@@ -218,6 +312,46 @@ def export_csv(run_id: str, store: ResultStore = Depends(get_store)):
     )
 
 
+@router.post("/runs/{run_id}/cancel")
+def cancel_run(run_id: str, store: ResultStore = Depends(get_store)):
+    """
+    Cancela un run. Si está en cola no llega a arrancar; si está corriendo deja
+    de tomar casos nuevos, termina lo que está en vuelo y queda "cancelled" con
+    las métricas de lo procesado.
+    """
+    run = store.get_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run no encontrado")
+    
+    if run.status == "queued":
+        # En cola o recién despachado: si todavía no arrancó, start_run ya no lo toma
+        scheduler.discard(run_id)
+        if store.cancel_queued_run(run_id, stop_reason="Cancelado por el usuario"):
+            return {"run_id": run_id, "status": "cancelled", "message": "Run cancelado antes de arrancar"}
+    if request_cancel(run_id):
+        return {"run_id": run_id, "status": "cancelling", "message": "Cancelación pedida; se termina lo que está en vuelo"}
+    
+    run = store.get_run(run_id)
+    if run and run.status == "running":
+        # Lo va a cerrar el drainer del spool, o quedó de un proceso anterior
+        raise HTTPException(status_code=409, detail="El run no se está ejecutando en este proceso")
+    raise HTTPException(status_code=409, detail=f"El run ya terminó (status: {run.status if run else 'eliminado'})")
+
+
+@router.delete("/runs/{run_id}")
+def delete_run(run_id: str, store: ResultStore = Depends(get_store)):
+    """Elimina un run y todos sus detalles"""
+    run = store.get_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run no encontrado")
+    if run.status == "running" or (run.status == "queued" and not scheduler.discard(run_id)):
+        raise HTTPException(status_code=409, detail="No se puede eliminar un run en ejecución")
+    
+    store.delete_run(run_id)
+    
+    return {"message": f"Run '{run_id}' eliminado"}
+
+
 @router.get("/runs/{run_id}", response_model=RunSummary)
 def get_run(run_id: str, db: Session = Depends(get_db), store: ResultStore = Depends(get_store)):
     """Obtiene detalles de una ejecución"""
@@ -240,6 +374,11 @@ def get_run(run_id: str, db: Session = Depends(get_db), store: ResultStore = Dep
         total_cases=total,
         mismatches=mismatches,
         errors=errors,
-        processed_cases=run.processed_cases
+        processed_cases=run.processed_cases,
+        pipeline_metrics=run.pipeline_metrics,
+        queue_position=scheduler.position(run.run_id) if run.status == "queued" else None,
+        stop_reason=run.stop_reason,
+        circuit_breaker=run.circuit_breaker,
+        sampling=run.sampling
     )
 
@@ -0,0 +1,117 @@
+"""CLI para correr un plugin sin server ni PostgreSQL (jobs de CI)
+
+Uso (desde backend/):
+    python -m app.cli demo --config '{"num_casos": 100}'
+    python -m app.cli mi_plugin --plugin-file plugins/mi_plugin.py --config @config.json \\
+        --store jsonl:results/run.jsonl.gz --min-accuracy 0.9
+    python -m app.cli demo --run-config '{"workers": 4, "sampling": {"target_width": 0.02}}' --store sqlite:runs.db
+
+Usa el mismo MassTestRunner que la API. El plugin es uno built-in o un archivo
+.py con el mismo formato que los plugins dinámicos (mismos imports permitidos
+y los mismos símbolos disponibles: TestPlugin, Case, Pred, Compare,
+open_dataset). Los resultados van al store elegido con --store (ver
+app.core.sinks); el spool local no se usa.
+
+Imprime el resumen del run en JSON por stdout. Código de salida: 0 si el run
+terminó "completed" (y alcanzó --min-accuracy), 1 si no, 2 si los argumentos
+son inválidos. Ctrl+C cancela el run (termina lo que está en vuelo); un
+segundo Ctrl+C lo interrumpe.
+"""
+import argparse
+import json
+import signal
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from app.core import serialization
+from app.core.plugin import PluginFactory
+from app.core.runner import MassTestRunner, request_cancel
+from app.core.sinks import open_result_store, run_summary
+from app.core.spool import SpoolConfig
+from app.models.dto import RunConfig
+
+
+def _json_arg(value: str) -> Dict[str, Any]:
+    """JSON literal o @archivo"""
+    text = Path(value[1:]).read_text(encoding="utf-8") if value.startswith("@") else value
+    parsed = json.loads(text)
+    if not isinstance(parsed, dict):
+        raise ValueError("se esperaba un objeto JSON")
+    return parsed
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Corre un plugin sin server")
+    parser.add_argument("plugin", help="Nombre del plugin (built-in, o el nombre para --plugin-file)")
+    parser.add_argument("--plugin-file", default="", help="Archivo .py con el plugin (formato de plugin dinámico)")
+    parser.add_argument("--config", default="{}", help="Config del plugin: JSON o @archivo.json")
+    parser.add_argument("--run-config", default="{}",
+                        help="Resto del RunConfig (workers, batch_size, sampling, ...): JSON o @archivo.json")
+    parser.add_argument("--store", default="memory", help="memory (default), jsonl:PATH[.gz] o sqlite:PATH")
+    parser.add_argument("--min-accuracy", type=float, default=None, help="Sale con 1 si la accuracy queda por debajo")
+    args = parser.parse_args(argv)
+    try:
+        args.config = _json_arg(args.config)
+        args.run_config = _json_arg(args.run_config)
+        args.run_config = RunConfig(**dict(args.run_config, plugin_name=args.plugin, config=args.config))
+    except (OSError, ValueError, ValidationError) as e:
+        parser.error(f"config inválida: {str(e)}")
+    if args.plugin_file:
+        try:
+            code = Path(args.plugin_file).read_text(encoding="utf-8")
+            plugin = PluginFactory._load_plugin_from_code(code, args.plugin)
+        except (OSError, ValueError) as e:
+            parser.error(f"no se pudo cargar {args.plugin_file}: {str(e)}")
+        PluginFactory.register(args.plugin, type(plugin))
+    try:
+        args.store = open_result_store(args.store)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    store, config = args.store, args.run_config
+    runner = MassTestRunner(store, spool_config=SpoolConfig())
+    run_id = store.create_run(config.plugin_name, config.config)
+
+    def cancel(signum, frame) -> None:
+        print("Cancelando el run (Ctrl+C de nuevo para interrumpir)...", file=sys.stderr)
+        request_cancel(run_id)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    previous = signal.signal(signal.SIGINT, cancel)
+    started = time.perf_counter()
+    error = None
+    try:
+        runner.run_existing(run_id, config, None)
+    except Exception as e:
+        error = str(e)
+        if store.get_run(run_id).status == "running":
+            # Falló antes de arrancar (p. ej. plugin inexistente)
+            store.fail_run(run_id)
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+    summary = run_summary(store.get_run(run_id))
+    summary["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    if error is not None:
+        summary["error"] = error
+    store.close()
+    print(serialization.dumps(summary))
+
+    if summary["status"] != "completed":
+        return 1
+    if args.min_accuracy is not None and (summary["accuracy"] or 0.0) < args.min_accuracy:
+        print(f"Accuracy {summary['accuracy']:.4f} por debajo de {args.min_accuracy}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+"""Almacenamiento frío comprimido para payloads grandes (pred_raw, case_data)
+
+Los valores se guardan comprimidos (zstd si `zstandard` está instalado, gzip
+si no) y direccionados por contenido (sha256 del valor sin comprimir), así que
+los payloads repetidos se guardan una sola vez. En run_details queda sólo una
+referencia `<backend>:<sha256>` y el valor se descomprime recién cuando se abre
+el detalle del caso.
+
+Configuración por variables de entorno:
+- COLD_STORAGE: "" (deshabilitado), "db" (tabla blobs) o "disk" (directorio local)
+- COLD_STORAGE_DIR: directorio del backend "disk" (default ./cold_storage)
+- COLD_STORAGE_CODEC: "zstd" o "gzip" (default zstd si está disponible)
+- COLD_STORAGE_CASE_DATA: "1" para guardar también case_data en frío (sólo
+  con CASE_DEDUP=0; si no, case_data ya se guarda una sola vez en `cases`)
+- COLD_STORAGE_MIN_BYTES: valores más chicos quedan inline (default 512)
+"""
+import gzip
+import hashlib
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, delete, exists, select
+from sqlalchemy.orm import Session
+
+from app.db.upsert import insert_or_touch
+from app.models.db import Blob, RunDetail
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depende del entorno
+    zstandard = None
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Blobs sin referencias más nuevos que esto no se eliminan (puede haber un
+# guardado en curso que todavía no hizo commit del detalle que los referencia)
+GC_GRACE_PERIOD = timedelta(hours=1)
+
+
+def default_codec() -> str:
+    return "zstd" if zstandard is not None else "gzip"
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    """Comprime con el codec pedido (cae a gzip si zstd no está instalado)"""
+    if codec == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(payload: bytes) -> bytes:
+    """Descomprime detectando el codec por sus magic bytes"""
+    if payload.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise RuntimeError("El blob está comprimido con zstd pero 'zstandard' no está instalado")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if payload.startswith(GZIP_MAGIC):
+        return gzip.decompress(payload)
+    raise ValueError("Formato de blob desconocido")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ColdStorageConfig:
+    """Configuración del almacenamiento frío"""
+
+    def __init__(self, backend: str = "", directory: str = "./cold_storage",
+                 codec: Optional[str] = None, case_data: bool = False, min_bytes: int = 512):
+        self.backend = backend
+        self.directory = directory
+        self.codec = codec or default_codec()
+        self.case_data = case_data
+        self.min_bytes = min_bytes
+
+    @classmethod
+    def from_env(cls) -> "ColdStorageConfig":
+        return cls(
+            backend=os.getenv("COLD_STORAGE", "").strip().lower(),
+            directory=os.getenv("COLD_STORAGE_DIR", "./cold_storage"),
+            codec=os.getenv("COLD_STORAGE_CODEC") or None,
+            case_data=os.getenv("COLD_STORAGE_CASE_DATA", "0") == "1",
+            min_bytes=int(os.getenv("COLD_STORAGE_MIN_BYTES", "512")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend in ("db", "disk")
+
+
+class BlobStore(ABC):
+    """Almacén de blobs comprimidos direccionados por contenido"""
+
+    name: str = ""
+
+    def __init__(self, codec: Optional[str] = None):
+        self.codec = codec or default_codec()
+
+    def put(self, data: bytes) -> str:
+        """Guarda el valor (si no existía) y devuelve su referencia"""
+        key = content_hash(data)
+        self._write(key, data)
+        return f"{self.name}:{key}"
+
+    def put_many(self, values: List[bytes]) -> List[str]:
+        """Como put() para un lote; devuelve las referencias en el mismo orden.
+
+        Se escriben en orden de hash, así dos lotes concurrentes con valores
+        repetidos toman los locks en el mismo orden.
+        """
+        keys = [content_hash(data) for data in values]
+        by_key = dict(zip(keys, values))
+        self._write_many([(key, by_key[key]) for key in sorted(by_key)])
+        return [f"{self.name}:{key}" for key in keys]
+
+    def get(self, ref: str) -> bytes:
+        """Devuelve el valor descomprimido de una referencia"""
+        _, key = ref.split(":", 1)
+        return decompress(self._read(key))
+
+    @abstractmethod
+    def _write(self, key: str, data: bytes) -> None:
+        pass
+
+    def _write_many(self, items: List[Tuple[str, bytes]]) -> None:
+        for key, data in items:
+            self._write(key, data)
+
+    @abstractmethod
+    def _read(self, key: str) -> bytes:
+        pass
+
+    @abstractmethod
+    def collect_garbage(self) -> int:
+        """Elimina blobs sin referencias en run_details. Devuelve cuántos."""
+        pass
+
+
+class DbBlobStore(BlobStore):
+    """Blobs en la tabla `blobs` de la misma base (viajan en la misma transacción)"""
+
+    name = "db"
+
+    def __init__(self, db: Session, codec: Optional[str] = None):
+        super().__init__(codec)
+        self.db = db
+
+    def _write(self, key: str, data: bytes) -> None:
+        self._write_many([(key, data)])
+
+    def _write_many(self, items: List[Tuple[str, bytes]]) -> None:
+        # Si ya existe sólo se "toca" last_used_at (protege al blob del GC)
+        insert_or_touch(
+            self.db, Blob,
+            [{"blob_hash": key, "size": len(data), "data": compress(data, self.codec)} for key, data in items],
+            key="blob_hash", touch_column="last_used_at", touch_after=GC_GRACE_PERIOD / 2,
+        )
+
+    def _read(self, key: str) -> bytes:
+        data = self.db.execute(select(Blob.data).where(Blob.blob_hash == key)).scalar()
+        if data is None:
+            raise KeyError(f"Blob '{key}' no encontrado")
+        return bytes(data)
+
+    def collect_garbage(self) -> int:
+        cutoff = datetime.utcnow() - GC_GRACE_PERIOD
+        referenced = exists().where(
+            (RunDetail.pred_raw_ref == self.name + ":" + Blob.blob_hash)
+            | (RunDetail.case_data_ref == self.name + ":" + Blob.blob_hash)
+        )
+        result = self.db.execute(
+            delete(Blob)
+            .where(and_(Blob.last_used_at < cutoff, ~referenced))
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount
+
+
+class DiskBlobStore(BlobStore):
+    """Blobs en un directorio local: <dir>/<hash[:2]>/<hash>"""
+
+    name = "disk"
+
+    def __init__(self, root: str, db: Optional[Session] = None, codec: Optional[str] = None):
+        super().__init__(codec)
+        self.root = Path(root)
+        self.db = db
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        try:
+            os.utime(path)  # ya existe: lo protege del GC
+            return
+        except FileNotFoundError:
+            pass  # no existe (o el GC lo acaba de retirar): se escribe
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Escritura atómica: tmp + rename en el mismo directorio
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(compress(data, self.codec))
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def _read(self, key: str) -> bytes:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            raise KeyError(f"Blob '{key}' no encontrado")
+
+    def collect_garbage(self, batch_size: int = 500) -> int:
+        if self.db is None or not self.root.exists():
+            return 0
+
+        cutoff = time.time() - GC_GRACE_PERIOD.total_seconds()
+        candidates = [
+            p for p in self.root.glob("??/*")
+            if not p.name.startswith(".") and self._mtime(p) < cutoff
+        ]
+
+        removed = 0
+        for i in range(0, len(candidates), batch_size):
+            batch = candidates[i:i + batch_size]
+            refs = [f"{self.name}:{p.name}" for p in batch]
+            used = set(self.db.execute(
+                select(RunDetail.pred_raw_ref).where(RunDetail.pred_raw_ref.in_(refs))
+            ).scalars())
+            used.update(self.db.execute(
+                select(RunDetail.case_data_ref).where(RunDetail.case_data_ref.in_(refs))
+            ).scalars())
+            for path, ref in zip(batch, refs):
+                if ref not in used and self._remove_if_stale(path, cutoff):
+                    removed += 1
+        return removed
+
+    @staticmethod
+    def _mtime(path: Path) -> float:
+        try:
+            return path.stat().st_mtime
+        except FileNotFoundError:
+            return float("inf")  # lo borró otro sweep
+
+    @staticmethod
+    def _remove_if_stale(path: Path, cutoff: float) -> bool:
+        """Borra el blob salvo que un put() lo haya reusado desde el snapshot.
+
+        Un put() concurrente puede deduplicar sobre el blob (os.utime) con su
+        detalle todavía en el buffer del writer o en el spool, así que las
+        referencias commiteadas no alcanzan. El blob se retira primero con un
+        rename (un put() posterior ya no lo encuentra y lo vuelve a escribir)
+        y recién ahí se mira el mtime: si alguien lo tocó, se devuelve.
+        """
+        retired = path.with_name(f".gc-{path.name}")
+        try:
+            os.replace(path, retired)
+        except FileNotFoundError:
+            return False
+        try:
+            if retired.stat().st_mtime >= cutoff:
+                # Mismo contenido que un eventual blob reescrito: pisarlo es seguro
+                os.replace(retired, path)
+                return False
+            retired.unlink()
+        except FileNotFoundError:
+            return False
+        return True
+
+
+def get_blob_store(db: Session, config: Optional[ColdStorageConfig] = None) -> Optional[BlobStore]:
+    """Blob store configurado para escribir (None si está deshabilitado)"""
+    config = config or ColdStorageConfig.from_env()
+    if config.backend == "db":
+        return DbBlobStore(db, codec=config.codec)
+    if config.backend == "disk":
+        return DiskBlobStore(config.directory, db=db, codec=config.codec)
+    return None
+
+
+def read_blob(db: Session, ref: str, config: Optional[ColdStorageConfig] = None) -> bytes:
+    """Lee una referencia según su propio backend (independiente de la config actual)"""
+    backend = ref.split(":", 1)[0]
+    if backend == "db":
+        return DbBlobStore(db).get(ref)
+    if backend == "disk":
+        config = config or ColdStorageConfig.from_env()
+        return DiskBlobStore(config.directory, db=db).get(ref)
+    raise ValueError(f"Referencia de blob inválida: '{ref}'")
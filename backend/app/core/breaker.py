@@ -0,0 +1,126 @@
+"""Circuit breaker por tasa de errores para el runner
+
+Cuenta los `Pred(ok=False)` en una ventana deslizante de los últimos N casos.
+Si la tasa supera el máximo (con al menos `min_cases` en la ventana) el
+breaker se abre:
+- action="abort": el run deja de tomar casos (como una cancelación), termina
+  lo que está en vuelo y queda "failed" con el motivo en runs.stop_reason
+- action="pause": no se ejecutan casos durante `pause_seconds`; después se deja
+  pasar una sola unidad de prueba (half-open). Si sale sin errores el breaker
+  se cierra y el run sigue; si no, vuelve a abrirse. Pasadas `max_trips`
+  aperturas se aborta igual.
+
+Las unidades se piden con `acquire()` (devuelve un ticket, o cuántos segundos
+esperar) y su resultado se informa con `record(ticket, preds)`. Los
+resultados de unidades admitidas antes de un cambio de estado se ignoran para
+decidir el probe.
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.models.dto import CircuitBreakerConfig
+
+CLOSED, OPEN, HALF_OPEN, ABORTED = "closed", "open", "half_open", "aborted"
+
+# Cada cuánto reintentan los que esperan a que se resuelva el probe
+_PROBE_POLL_SECONDS = 0.05
+
+
+class CircuitBreaker:
+    """Estado del breaker de un run (thread-safe)"""
+
+    def __init__(self, config: CircuitBreakerConfig, stop: threading.Event):
+        self.config = config
+        # Se activa al abortar: el runner lo trata como un pedido de cancelación
+        self.stop = stop
+        self.state = CLOSED
+        self.reason: Optional[str] = None
+        self.trips: List[Dict[str, Any]] = []
+        self._window: deque = deque(maxlen=config.window)
+        self._errors = 0
+        self._generation = 0
+        self._open_until = 0.0
+        self._probe: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def aborted(self) -> bool:
+        return self.state == ABORTED
+
+    def acquire(self) -> Tuple[Optional[int], float]:
+        """(ticket, 0) si la unidad se puede ejecutar ya; (None, segundos) si hay que esperar"""
+        with self._lock:
+            if self.state == CLOSED:
+                return self._generation, 0.0
+            if self.state == OPEN:
+                remaining = self._open_until - time.monotonic()
+                if remaining > 0:
+                    return None, remaining
+                self.state = HALF_OPEN
+                self._generation += 1
+                self._probe = None
+            if self.state == HALF_OPEN and self._probe is None:
+                # Una sola unidad de prueba por apertura
+                self._probe = self._generation
+                return self._probe, 0.0
+            return None, _PROBE_POLL_SECONDS
+
+    def record(self, ticket: Optional[int], preds: Iterable[Any]) -> None:
+        errors = [not pred.ok for pred in preds]
+        with self._lock:
+            if ticket != self._generation:
+                return
+            if self.state == HALF_OPEN and ticket == self._probe:
+                if any(errors):
+                    self._trip(sum(errors) / len(errors) if errors else 1.0, len(errors), probe=True)
+                else:
+                    self._close()
+            elif self.state == CLOSED:
+                for error in errors:
+                    if len(self._window) == self._window.maxlen:
+                        self._errors -= self._window[0]
+                    self._window.append(error)
+                    self._errors += error
+                if len(self._window) >= self.config.min_cases:
+                    rate = self._errors / len(self._window)
+                    if rate > self.config.max_error_rate:
+                        self._trip(rate, len(self._window))
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "trips": list(self.trips), "config": self.config.model_dump()}
+
+    def _trip(self, rate: float, cases: int, probe: bool = False) -> None:
+        self._generation += 1
+        self.trips.append({
+            "at": datetime.utcnow().isoformat(),
+            "error_rate": round(rate, 4),
+            "cases": cases,
+            "probe": probe,
+        })
+        where = "en la unidad de prueba" if probe else f"en los últimos {cases} casos"
+        reason = (
+            f"Circuit breaker: {rate:.0%} de errores {where} "
+            f"(máximo {self.config.max_error_rate:.0%})"
+        )
+        if self.config.action == "abort" or len(self.trips) > self.config.max_trips:
+            self.state = ABORTED
+            if self.config.action == "pause":
+                reason += f"; {len(self.trips)} aperturas (máximo {self.config.max_trips})"
+            self.reason = reason
+            self.stop.set()
+            print(f"{reason}: se aborta el run")
+            return
+        self.state = OPEN
+        self._open_until = time.monotonic() + self.config.pause_seconds
+        print(f"{reason}: pausa de {self.config.pause_seconds}s")
+
+    def _close(self) -> None:
+        self.state = CLOSED
+        self._generation += 1
+        self._probe = None
+        self._window.clear()
+        self._errors = 0
@@ -0,0 +1,287 @@
+"""Datasets subidos: CSV/JSONL en un formato binario con índice de offsets y mmap
+
+`POST /api/datasets` recibe un CSV o JSONL y lo convierte, fila por fila (sin
+cargarlo entero en memoria), en un directorio DATASETS_DIR/<dataset_id>/:
+- records.bin: registros JSON `[id, data]` uno detrás del otro
+- index.bin: N+1 offsets uint64 (nativos): el caso i ocupa
+  records.bin[offsets[i]:offsets[i+1]]
+- meta.json: nombre, formato de origen, cantidad de casos, bytes y fecha
+
+Los dos archivos se leen con mmap: `Dataset` da el total sin leer nada, el
+caso i-ésimo en O(1) (un slice del mmap, sin copiar, y el parseo de ese único
+registro) y rangos o shards contiguos. Cualquier plugin lo usa con
+`open_dataset(dataset_id)` (en los plugins dinámicos ya está disponible sin
+importarlo), p. ej. devolviéndolo desde `obtener_casos`.
+
+Filas:
+- JSONL: cada línea es un objeto. Si tiene sólo `id_field` y `data` (un Case
+  exportado), se usa tal cual; si no, el objeto entero es `data`.
+- CSV: cada fila (con encabezado) es `data`, con los valores como string.
+El id sale de `id_field` (default "id"); si la fila no lo tiene, es el número
+de fila.
+"""
+import csv
+import io
+import json
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from array import array
+from collections.abc import Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+from app.core import serialization
+from app.models.dto import Case
+
+DATASET_FORMATS = ("csv", "jsonl")
+RECORDS_FILE = "records.bin"
+INDEX_FILE = "index.bin"
+META_FILE = "meta.json"
+
+# Offsets por escritura del índice
+_INDEX_CHUNK = 8192
+_DATASET_ID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+def datasets_root() -> Path:
+    """Directorio de los datasets (DATASETS_DIR, default ./datasets)"""
+    return Path(os.getenv("DATASETS_DIR", "").strip() or "./datasets")
+
+
+def _dataset_path(dataset_id: str, root: Optional[Path] = None) -> Path:
+    # El id termina en un path: sólo se aceptan los uuid que genera el upload
+    if not _DATASET_ID.fullmatch(dataset_id):
+        raise KeyError(dataset_id)
+    return (root or datasets_root()) / dataset_id
+
+
+class Dataset(Sequence):
+    """Acceso de sólo lectura a un dataset subido (mmap, sin cargarlo en memoria)"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.meta: Dict[str, Any] = json.loads((path / META_FILE).read_text(encoding="utf-8"))
+        self._records: Optional[mmap.mmap] = None
+        self._index_map: Optional[mmap.mmap] = None
+        self._offsets: Union[memoryview, List[int]] = [0]
+        self._view: Optional[memoryview] = None
+        count = self.meta["num_cases"]
+        if count:
+            with open(path / INDEX_FILE, "rb") as f:
+                self._index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            with open(path / RECORDS_FILE, "rb") as f:
+                self._records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._offsets = memoryview(self._index_map).cast("Q")
+            self._view = memoryview(self._records)
+        self._count = count
+
+    @property
+    def dataset_id(self) -> str:
+        return self.path.name
+
+    def __len__(self) -> int:
+        return self._count
+
+    def raw(self, i: int) -> memoryview:
+        """Bytes JSON del caso i-ésimo: un slice del mmap, sin copiar"""
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        return self._view[self._offsets[i]:self._offsets[i + 1]]
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Case, List[Case]]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        case_id, data = serialization.loads(self.raw(i))
+        # Los casos se validaron al subir el dataset: sin validación de pydantic
+        return Case.model_construct(id=case_id, data=data)
+
+    def __iter__(self) -> Iterator[Case]:
+        return self.iter_range(0, self._count)
+
+    def iter_range(self, start: int, stop: Optional[int] = None) -> Iterator[Case]:
+        """Casos [start, stop) en orden"""
+        stop = self._count if stop is None else min(stop, self._count)
+        for i in range(max(start, 0), stop):
+            yield self[i]
+
+    def shard_bounds(self, index: int, count: int) -> Tuple[int, int]:
+        """[start, stop) del shard `index` de `count` (contiguos y de tamaño parejo)"""
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"Shard inválido: {index} de {count}")
+        return self._count * index // count, self._count * (index + 1) // count
+
+    def shard(self, index: int, count: int) -> Iterator[Case]:
+        """Casos del shard `index` de `count`"""
+        return self.iter_range(*self.shard_bounds(index, count))
+
+    def close(self) -> None:
+        # Los memoryview se liberan antes que los mmap (si no, close falla)
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+        if self._view is not None:
+            self._view.release()
+        for m in (self._records, self._index_map):
+            if m is not None:
+                m.close()
+        self._records = self._index_map = self._view = None
+        self._offsets = [0]
+        self._count = 0
+
+    def __enter__(self) -> "Dataset":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def open_dataset(dataset_id: str, root: Optional[Path] = None) -> Dataset:
+    """Abre un dataset subido (KeyError si no existe)"""
+    path = _dataset_path(dataset_id, root)
+    if not (path / META_FILE).is_file():
+        raise KeyError(dataset_id)
+    return Dataset(path)
+
+
+class DatasetWriter:
+    """Escribe un dataset en un directorio temporal y lo publica al cerrar"""
+
+    def __init__(self, name: str, source_format: str, root: Optional[Path] = None):
+        self.root = root or datasets_root()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.dataset_id = str(uuid.uuid4())
+        self.name = name
+        self.source_format = source_format
+        self.count = 0
+        self._tmp = Path(tempfile.mkdtemp(dir=self.root, prefix=".upload-"))
+        self._records = open(self._tmp / RECORDS_FILE, "wb")
+        self._index = open(self._tmp / INDEX_FILE, "wb")
+        self._offsets = array("Q", [0])
+        self._offset = 0
+
+    def add(self, case_id: Any, data: Dict[str, Any]) -> None:
+        payload = serialization.dumps_bytes([str(case_id), data])
+        self._records.write(payload)
+        self._offset += len(payload)
+        self._offsets.append(self._offset)
+        self.count += 1
+        if len(self._offsets) >= _INDEX_CHUNK:
+            self._offsets.tofile(self._index)
+            self._offsets = array("Q")
+
+    def commit(self) -> Dict[str, Any]:
+        """Cierra los archivos y mueve el dataset a su directorio definitivo"""
+        self._offsets.tofile(self._index)
+        self._records.close()
+        self._index.close()
+        meta = {
+            "dataset_id": self.dataset_id,
+            "name": self.name,
+            "format": self.source_format,
+            "num_cases": self.count,
+            "size_bytes": self._offset,
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        (self._tmp / META_FILE).write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(self._tmp, self.root / self.dataset_id)
+        return meta
+
+    def abort(self) -> None:
+        self._records.close()
+        self._index.close()
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+
+def _jsonl_rows(stream: BinaryIO, id_field: str) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = serialization.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Línea {line_number}: JSON inválido ({str(e)})")
+        if not isinstance(row, dict):
+            raise ValueError(f"Línea {line_number}: se esperaba un objeto JSON")
+        if set(row) == {id_field, "data"} and isinstance(row["data"], dict):
+            yield row[id_field], row["data"]
+        else:
+            yield row.get(id_field), row
+
+
+def _csv_rows(stream: BinaryIO, id_field: str) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        for row in csv.DictReader(text):
+            yield row.get(id_field), row
+    except csv.Error as e:
+        raise ValueError(f"CSV inválido: {str(e)}")
+    finally:
+        # El stream es del que llama: no se cierra con el wrapper
+        text.detach()
+
+
+def detect_format(filename: Optional[str], source_format: Optional[str] = None) -> str:
+    """Formato pedido o, si no, el de la extensión del archivo"""
+    source_format = (source_format or Path(filename or "").suffix.lstrip(".")).lower()
+    if source_format == "ndjson":
+        source_format = "jsonl"
+    if source_format not in DATASET_FORMATS:
+        raise ValueError(f"Formato de dataset no soportado: '{source_format}' (opciones: {', '.join(DATASET_FORMATS)})")
+    return source_format
+
+
+def import_dataset(stream: BinaryIO, name: str, source_format: str, id_field: str = "id",
+                   root: Optional[Path] = None) -> Dict[str, Any]:
+    """Convierte un CSV/JSONL (stream binario) en un dataset; devuelve su meta"""
+    rows = _csv_rows(stream, id_field) if source_format == "csv" else _jsonl_rows(stream, id_field)
+    writer = DatasetWriter(name, source_format, root)
+    try:
+        for row_number, (case_id, data) in enumerate(rows):
+            writer.add(row_number if case_id is None else case_id, data)
+        return writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def list_datasets(root: Optional[Path] = None) -> List[Dict[str, Any]]:
+    root = root or datasets_root()
+    if not root.is_dir():
+        return []
+    metas = []
+    for meta_path in root.glob(f"*/{META_FILE}"):
+        try:
+            metas.append(json.loads(meta_path.read_text(encoding="utf-8")))
+        except (OSError, ValueError) as e:
+            print(f"Error al leer dataset {meta_path.parent.name}: {str(e)}")
+    return sorted(metas, key=lambda meta: meta["created_at"], reverse=True)
+
+
+def get_dataset_meta(dataset_id: str, root: Optional[Path] = None) -> Dict[str, Any]:
+    """meta.json de un dataset (KeyError si no existe)"""
+    path = _dataset_path(dataset_id, root) / META_FILE
+    if not path.is_file():
+        raise KeyError(dataset_id)
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def delete_dataset(dataset_id: str, root: Optional[Path] = None) -> bool:
+    """Elimina un dataset (los runs que lo tienen abierto siguen leyendo su mmap)"""
+    path = _dataset_path(dataset_id, root)
+    if not path.is_dir():
+        return False
+    shutil.rmtree(path)
+    return True
@@ -1,6 +1,22 @@
-"""Configuración de dependencias permitidas para plugins dinámicos"""
+"""Configuración de dependencias permitidas para plugins dinámicos
+
+La validación de imports se hace en cada carga y test de un plugin. Para no
+repetir trabajo:
+- La disponibilidad de cada módulo (`find_spec`, que en paquetes como pandas
+  recorre el filesystem) se memoiza por proceso.
+- El resultado de validar un código se cachea por hash del código.
+
+Ambas caches se invalidan con `invalidate_caches()` (o con
+`POST /api/plugins/deps/refresh`) después de instalar o quitar paquetes.
+"""
+import ast
+import hashlib
+import importlib
 import importlib.util
-from typing import Set, List, Tuple, Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Set, List, Tuple, Optional
 
 # Módulos builtin de Python que siempre están permitidos
 BUILTIN_PACKAGES: Set[str] = {
@@ -17,7 +33,7 @@ BUILTIN_PACKAGES: Set[str] = {
     "urllib", "urllib.parse", "urllib.request", "http", "email","ftplib",
     # Utilidades
     "sys", "types", "traceback", "warnings", "logging", "argparse",
-    "subprocess", "threading", "multiprocessing", "concurrent",
+    "subprocess", "threading", "multiprocessing", "concurrent", "asyncio",
     # Datos
     "decimal", "fractions", "statistics", "array", "struct",
 }
@@ -41,6 +57,9 @@ ALLOWED_PACKAGES: Set[str] = {
     "urllib3",
     # Openai
     "openai",
+    # HTTP async (plugins con async def)
+    "aiohttp",
+    "httpx",
     # FTP conexión
     "ftplib"
 }
@@ -57,8 +76,17 @@ def get_top_level_module(module_name: str) -> str:
     return parts[0]
 
 
-def is_module_available(module_name: str) -> bool:
-    """Verifica si un módulo está disponible en el entorno"""
+# Cantidad de resultados de validación (por hash de código) que se recuerdan
+VALIDATION_CACHE_SIZE = 256
+# Threads para sondear módulos todavía no cacheados
+PROBE_WORKERS = 8
+
+_cache_lock = threading.Lock()
+_module_cache: Dict[str, bool] = {}
+_validation_cache: "OrderedDict[str, Tuple[bool, Optional[str]]]" = OrderedDict()
+
+
+def _find_module(module_name: str) -> bool:
     try:
         spec = importlib.util.find_spec(module_name)
         return spec is not None
@@ -66,24 +94,49 @@ def is_module_available(module_name: str) -> bool:
         return False
 
 
-def validate_plugin_imports(code: str) -> Tuple[bool, Optional[str]]:
-    """
-    Valida que todos los imports del código del plugin usen solo
-    dependencias permitidas (builtin o en ALLOWED_PACKAGES).
-    
-    Returns:
-        Tuple[bool, Optional[str]]: (es_válido, mensaje_error)
-    """
-    import ast
-    
-    try:
-        tree = ast.parse(code)
-    except SyntaxError as e:
-        return False, f"Error de sintaxis en el código: {str(e)}"
-    
+def is_module_available(module_name: str) -> bool:
+    """Verifica si un módulo está disponible en el entorno (memoizado)"""
+    with _cache_lock:
+        cached = _module_cache.get(module_name)
+    if cached is not None:
+        return cached
+
+    available = _find_module(module_name)
+    with _cache_lock:
+        _module_cache[module_name] = available
+    return available
+
+
+def probe_modules(module_names: Iterable[str]) -> Dict[str, bool]:
+    """Disponibilidad de varios módulos; los no cacheados se sondean en paralelo"""
+    names = sorted(set(module_names))
+    with _cache_lock:
+        result = {name: _module_cache[name] for name in names if name in _module_cache}
+    pending = [name for name in names if name not in result]
+
+    if len(pending) > 1:
+        with ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(pending))) as pool:
+            found = dict(zip(pending, pool.map(_find_module, pending)))
+        with _cache_lock:
+            _module_cache.update(found)
+        result.update(found)
+    else:
+        for name in pending:
+            result[name] = is_module_available(name)
+    return result
+
+
+def invalidate_caches() -> None:
+    """Olvida la disponibilidad de módulos y las validaciones cacheadas"""
+    importlib.invalidate_caches()
+    with _cache_lock:
+        _module_cache.clear()
+        _validation_cache.clear()
+
+
+def _collect_imports(tree: ast.AST) -> Set[str]:
     imports: Set[str] = set()
     
-    # Recolectar todos los imports
     for node in ast.walk(tree):
         if isinstance(node, ast.Import):
             # import X
@@ -93,36 +146,59 @@ def validate_plugin_imports(code: str) -> Tuple[bool, Optional[str]]:
         elif isinstance(node, ast.ImportFrom):
             # from X import Y
             # from X import Y as Z
-            if node.module:
-                # Ignorar imports relativos (from . import, from .. import)
-                if node.level == 0:
-                    imports.add(node.module)
-                elif node.level > 0:
-                    # Import relativo encontrado - no permitido explícitamente
-                    # pero no lo bloqueamos por ahora, solo lo ignoramos
-                    pass
+            # Los imports relativos (from . import, from .. import) no están
+            # permitidos explícitamente, pero no se bloquean: se ignoran
+            if node.module and node.level == 0:
+                imports.add(node.module)
+    
+    return imports
+
+
+def _validate_imports(code: str) -> Tuple[bool, Optional[str]]:
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return False, f"Error de sintaxis en el código: {str(e)}"
+    
+    top_levels = sorted({get_top_level_module(name) for name in _collect_imports(tree)} - {""})
     
-    # Validar cada import
-    for module_name in imports:
-        top_level = get_top_level_module(module_name)
-        
-        if not top_level:
-            continue
-        
-        # Verificar si es builtin
-        if top_level in BUILTIN_PACKAGES:
-            continue
-        
-        # Verificar si está en la lista permitida
-        if top_level in ALLOWED_PACKAGES:
-            # Verificar que el módulo realmente esté disponible
-            if not is_module_available(top_level):
-                return False, f"Missing dependency: {top_level}. Install it in the backend environment before importing."
-            continue
-        
-        # Si no está en ninguna lista, no está permitido
-        allowed_list = ", ".join(sorted(ALLOWED_PACKAGES))
-        return False, f"Dependency not allowed: {top_level}. Allowed: {allowed_list}"
+    # Primero los no permitidos (no hace falta sondear nada)
+    for top_level in top_levels:
+        if top_level not in BUILTIN_PACKAGES and top_level not in ALLOWED_PACKAGES:
+            allowed_list = ", ".join(sorted(ALLOWED_PACKAGES))
+            return False, f"Dependency not allowed: {top_level}. Allowed: {allowed_list}"
+    
+    # Los permitidos tienen que estar instalados
+    external = [name for name in top_levels if name not in BUILTIN_PACKAGES]
+    availability = probe_modules(external)
+    for top_level in external:
+        if not availability[top_level]:
+            return False, f"Missing dependency: {top_level}. Install it in the backend environment before importing."
     
     return True, None
 
+
+def validate_plugin_imports(code: str) -> Tuple[bool, Optional[str]]:
+    """
+    Valida que todos los imports del código del plugin usen solo
+    dependencias permitidas (builtin o en ALLOWED_PACKAGES).
+    
+    El resultado se cachea por hash del código: crear, actualizar, testear y
+    correr el mismo plugin valida una sola vez.
+    
+    Returns:
+        Tuple[bool, Optional[str]]: (es_válido, mensaje_error)
+    """
+    key = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    with _cache_lock:
+        cached = _validation_cache.get(key)
+        if cached is not None:
+            _validation_cache.move_to_end(key)
+            return cached
+    
+    result = _validate_imports(code)
+    with _cache_lock:
+        _validation_cache[key] = result
+        while len(_validation_cache) > VALIDATION_CACHE_SIZE:
+            _validation_cache.popitem(last=False)
+    return result
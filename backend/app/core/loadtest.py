@@ -0,0 +1,283 @@
+"""Simulación de backends para pruebas de carga
+
+- LatencyModel: distribuciones de latencia (fixed, lognormal, heavy_tail).
+- burn_cpu: consumo de CPU sintético por caso.
+- StandInServer: servidor HTTP local que imita a un backend de predicción
+  (OpenAI, ECRM, ...) con latencia, errores, timeouts y payloads grandes,
+  para hacer benchmarks del motor de ejecución sin salir de la máquina.
+
+El plugin built-in "loadtest" (app/core/plugin.py) usa estas piezas en modo
+"local" (simula en proceso) o "http" (llama al StandInServer).
+
+Levantar el servidor standalone (desde backend/):
+    python -m app.core.loadtest --port 8099 --latency lognormal --latency-ms 300 --error-rate 0.02
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+LABELS = ["T1", "T2", "T3", "T4"]
+
+# Parámetros de simulación y sus defaults (config del plugin o del servidor)
+SIMULATION_DEFAULTS: Dict[str, Any] = {
+    "latency": "fixed",  # fixed | lognormal | heavy_tail
+    "latency_ms": 50.0,  # fijo, mediana (lognormal) o mínimo (heavy_tail)
+    "latency_sigma": 0.5,  # dispersión de la lognormal
+    "tail_alpha": 1.5,  # índice de la cola Pareto (menor = cola más pesada)
+    "max_latency_ms": 60000.0,
+    "error_rate": 0.0,
+    "timeout_rate": 0.0,
+    "timeout_ms": 5000.0,
+    "cpu_ms": 0.0,
+    "raw_bytes": 256,
+    "accuracy": 0.8,
+}
+
+
+def simulation_params(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Parámetros de simulación con defaults aplicados"""
+    return {key: config.get(key, default) for key, default in SIMULATION_DEFAULTS.items()}
+
+
+class LatencyModel:
+    """Distribución de latencias en milisegundos"""
+
+    def __init__(self, distribution: str = "fixed", latency_ms: float = 50.0, sigma: float = 0.5,
+                 tail_alpha: float = 1.5, max_ms: float = 60000.0):
+        if distribution not in ("fixed", "lognormal", "heavy_tail"):
+            raise ValueError(f"Distribución de latencia desconocida: '{distribution}'")
+        self.distribution = distribution
+        self.latency_ms = float(latency_ms)
+        self.sigma = float(sigma)
+        self.tail_alpha = float(tail_alpha)
+        self.max_ms = float(max_ms)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "LatencyModel":
+        params = simulation_params(config)
+        return cls(
+            distribution=params["latency"],
+            latency_ms=params["latency_ms"],
+            sigma=params["latency_sigma"],
+            tail_alpha=params["tail_alpha"],
+            max_ms=params["max_latency_ms"],
+        )
+
+    def sample_ms(self, rng: random.Random) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        if self.distribution == "lognormal":
+            value = rng.lognormvariate(math.log(self.latency_ms), self.sigma)
+        elif self.distribution == "heavy_tail":
+            value = self.latency_ms * rng.paretovariate(self.tail_alpha)
+        else:
+            value = self.latency_ms
+        return min(value, self.max_ms)
+
+
+def burn_cpu(ms: float) -> None:
+    """Ocupa la CPU durante `ms` milisegundos (simula parsing/post-proceso)"""
+    if ms <= 0:
+        return
+    deadline = time.perf_counter() + ms / 1000
+    digest = b"loadtest"
+    while time.perf_counter() < deadline:
+        digest = hashlib.sha256(digest).digest()
+
+
+def simulate_prediction(case_id: str, truth: Optional[str], params: Dict[str, Any],
+                        rng: random.Random) -> Dict[str, Any]:
+    """Decide el resultado simulado de un caso (sin esperar).
+
+    Returns:
+        dict con outcome ("ok" | "error" | "timeout"), latency_ms y, si es ok,
+        prediction, confidence y text (payload de tamaño raw_bytes)
+    """
+    latency_ms = LatencyModel.from_config(params).sample_ms(rng)
+    roll = rng.random()
+    if roll < params["timeout_rate"]:
+        return {"outcome": "timeout", "latency_ms": params["timeout_ms"]}
+    if roll < params["timeout_rate"] + params["error_rate"]:
+        return {"outcome": "error", "latency_ms": latency_ms, "error": "Simulated backend error"}
+
+    truth = truth or rng.choice(LABELS)
+    if rng.random() < params["accuracy"]:
+        prediction = truth
+    else:
+        prediction = rng.choice([label for label in LABELS if label != truth])
+    return {
+        "outcome": "ok",
+        "latency_ms": latency_ms,
+        "prediction": prediction,
+        "confidence": round(rng.uniform(0.5, 0.99), 2),
+        "text": "x" * int(params["raw_bytes"]),
+        "case_id": case_id,
+    }
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Endpoints del servidor stand-in:
+
+    - POST /predict {"case_id", "data": {"label"...}, "simulate": {...overrides}}
+    - POST /predict_batch {"cases": [{"case_id", "data"}...], "simulate": {...}}
+      (una sola latencia por lote, como un endpoint batch real)
+    """
+
+    server_version = "LoadTestStandIn/1.0"
+    protocol_version = "HTTP/1.1"  # keep-alive: los clientes reusan la conexión
+
+    def log_message(self, format, *args):  # noqa: A002 - firma de BaseHTTPRequestHandler
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):  # noqa: N802
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):  # noqa: N802
+        # Leer siempre el body: con keep-alive no puede quedar en el socket
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        if self.path not in ("/predict", "/predict_batch"):
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "Invalid JSON"})
+            return
+
+        params = simulation_params({**self.server.defaults, **request.get("simulate", {})})
+        cases = request.get("cases", []) if self.path == "/predict_batch" else [request]
+        rng = random.Random()
+        results = [
+            simulate_prediction(str(c.get("case_id", "")), (c.get("data") or {}).get("label"), params, rng)
+            for c in cases
+        ]
+
+        if any(r["outcome"] == "timeout" for r in results):
+            # Responde después del timeout del cliente: el cliente corta antes
+            time.sleep(params["timeout_ms"] * 2 / 1000)
+            self.close_connection = True
+            self._send_json(504, {"error": "Simulated timeout"})
+            return
+
+        time.sleep(max((r["latency_ms"] for r in results), default=0.0) / 1000)
+        burn_cpu(params["cpu_ms"] * len(results))
+        if self.path == "/predict_batch":
+            self._send_json(200, {"results": results})
+        elif results[0]["outcome"] == "error":
+            self._send_json(500, {"error": results[0]["error"]})
+        else:
+            self._send_json(200, results[0])
+
+
+class _StandInHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # El cliente corta la conexión en los timeouts simulados: no es un error
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StandInServer:
+    """Servidor HTTP local que imita un backend de predicción.
+
+    Uso:
+        server = StandInServer(port=0, defaults={"latency": "lognormal", "latency_ms": 200})
+        url = server.start()  # http://127.0.0.1:<port>
+        ...
+        server.stop()
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, defaults: Optional[Dict[str, Any]] = None):
+        self.host = host
+        self.port = port
+        self.defaults = simulation_params(defaults or {})
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _bind(self) -> None:
+        self._httpd = _StandInHTTPServer((self.host, self.port), _StandInHandler)
+        self._httpd.defaults = self.defaults
+
+    def start(self) -> str:
+        """Levanta el servidor en un thread daemon y devuelve su URL"""
+        self._bind()
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="loadtest-standin", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def serve_forever(self) -> None:
+        self._bind()
+        print(f"Stand-in server escuchando en {self.url}/predict")
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Servidor stand-in para pruebas de carga")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", default="fixed", choices=["fixed", "lognormal", "heavy_tail"])
+    parser.add_argument("--latency-ms", type=float, default=SIMULATION_DEFAULTS["latency_ms"])
+    parser.add_argument("--latency-sigma", type=float, default=SIMULATION_DEFAULTS["latency_sigma"])
+    parser.add_argument("--tail-alpha", type=float, default=SIMULATION_DEFAULTS["tail_alpha"])
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-ms", type=float, default=SIMULATION_DEFAULTS["timeout_ms"])
+    parser.add_argument("--cpu-ms", type=float, default=0.0)
+    parser.add_argument("--raw-bytes", type=int, default=SIMULATION_DEFAULTS["raw_bytes"])
+    args = parser.parse_args(argv)
+
+    StandInServer(args.host, args.port, defaults={
+        "latency": args.latency,
+        "latency_ms": args.latency_ms,
+        "latency_sigma": args.latency_sigma,
+        "tail_alpha": args.tail_alpha,
+        "error_rate": args.error_rate,
+        "timeout_rate": args.timeout_rate,
+        "timeout_ms": args.timeout_ms,
+        "cpu_ms": args.cpu_ms,
+        "raw_bytes": args.raw_bytes,
+    }).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Pipeline por etapas con colas acotadas (backpressure) y métricas por etapa
+
+El runner de plugins sync se arma como cuatro etapas conectadas por colas:
+
+    produce ─units─▶ execute (N threads) ─executed─▶ compare (M threads) ─compared─▶ persist
+
+Cada etapa tiene su propia concurrencia y las colas tienen un tamaño máximo:
+si una etapa se atrasa, las anteriores se bloquean al encolar en lugar de
+acumular resultados en memoria. Así un commit lento no frena las llamadas al
+modelo (hasta que la cola se llena) y viceversa.
+
+Cancelar (`Pipeline.cancelled`) deja de producir unidades nuevas y descarta
+las que todavía no se ejecutaron; lo que está en vuelo termina y se guarda.
+
+Si una etapa falla se cierran sus colas de entrada (las etapas anteriores dejan
+de producir) y las posteriores terminan lo que ya estaba en vuelo: los casos ya
+ejecutados y comparados se guardan igual. Si falla la primera o la última
+etapa se cierran todas las colas.
+
+Las métricas muestran dónde está el cuello de botella:
+- por etapa: casos procesados, segundos ocupados y utilización
+- por cola: profundidad máxima y media, y cuánto esperaron los productores
+  (backpressure) y los consumidores (etapa sin trabajo)
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Fin de stream: cada worker de la etapa siguiente recibe uno
+END = object()
+
+# Cada cuánto se revisa si se cerró la cola (o el pipeline) mientras se espera
+_POLL_SECONDS = 0.1
+
+
+class PipelineAborted(Exception):
+    """Se cerró la cola por una falla en otra etapa: el thread actual deja de trabajar"""
+
+
+class StageQueue:
+    """Cola acotada entre dos etapas, con métricas de profundidad y espera"""
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.closed = threading.Event()
+        self._lock = threading.Lock()
+        self.puts = 0
+        self.max_depth = 0
+        self._depth_sum = 0
+        self.put_wait_seconds = 0.0
+        self.get_wait_seconds = 0.0
+
+    def put(self, item: Any) -> None:
+        started = time.perf_counter()
+        while True:
+            if self.closed.is_set():
+                raise PipelineAborted()
+            try:
+                self._queue.put(item, timeout=_POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        depth = self._queue.qsize()
+        with self._lock:
+            self.put_wait_seconds += time.perf_counter() - started
+            self.puts += 1
+            self._depth_sum += depth
+            self.max_depth = max(self.max_depth, depth)
+
+    def get(self) -> Any:
+        started = time.perf_counter()
+        while True:
+            if self.closed.is_set():
+                raise PipelineAborted()
+            try:
+                item = self._queue.get(timeout=_POLL_SECONDS)
+                break
+            except queue.Empty:
+                continue
+        with self._lock:
+            self.get_wait_seconds += time.perf_counter() - started
+        return item
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "maxsize": self.maxsize,
+            "max_depth": self.max_depth,
+            "mean_depth": round(self._depth_sum / self.puts, 3) if self.puts else 0.0,
+            "put_wait_seconds": round(self.put_wait_seconds, 4),
+            "get_wait_seconds": round(self.get_wait_seconds, 4),
+        }
+
+
+class Stage:
+    """Contadores de una etapa y cierre de la cola siguiente al terminar"""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.done = threading.Event()
+        self._remaining = workers
+        self._lock = threading.Lock()
+
+    def record(self, items: int, seconds: float) -> None:
+        with self._lock:
+            self.items += items
+            self.busy_seconds += seconds
+
+    def worker_finished(self, downstream: Optional[StageQueue] = None, consumers: int = 1) -> None:
+        """El último worker en terminar manda un END por consumidor de la cola siguiente"""
+        with self._lock:
+            self._remaining -= 1
+            last = self._remaining == 0
+        if last:
+            if downstream is not None:
+                for _ in range(consumers):
+                    downstream.put(END)
+            self.done.set()
+
+    def metrics(self, elapsed: float) -> Dict[str, Any]:
+        capacity = elapsed * self.workers
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 4),
+            "utilization": round(self.busy_seconds / capacity, 3) if capacity > 0 else 0.0,
+        }
+
+
+class Pipeline:
+    """Threads, colas y etapas de una ejecución"""
+
+    def __init__(self, cancelled: Optional[threading.Event] = None):
+        # Se cerraron todas las colas (falla en la primera o la última etapa)
+        self.aborted = threading.Event()
+        # Cancelación cooperativa: las etapas la consultan entre unidades
+        self.cancelled = cancelled or threading.Event()
+        self.errors: List[BaseException] = []
+        self.queues: Dict[str, StageQueue] = {}
+        self.stages: Dict[str, Stage] = {}
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def queue(self, name: str, maxsize: int) -> StageQueue:
+        self.queues[name] = StageQueue(name, maxsize)
+        return self.queues[name]
+
+    def stage(self, name: str, workers: int) -> Stage:
+        self.stages[name] = Stage(name, workers)
+        return self.stages[name]
+
+    def spawn(self, name: str, target: Callable[..., None], *args: Any) -> threading.Thread:
+        thread = threading.Thread(target=self._guard, args=(target, args), name=name, daemon=True)
+        with self._lock:
+            self._threads.append(thread)
+        thread.start()
+        return thread
+
+    def _guard(self, target: Callable[..., None], args: tuple) -> None:
+        try:
+            target(*args)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self.fail(e)
+
+    def run_worker(self, stage: Stage, body: Callable[[], None], upstream: Iterable[StageQueue] = (),
+                   downstream: Optional[StageQueue] = None, consumers: int = 1) -> None:
+        """Corre un worker de `stage`; si falla cierra las colas `upstream`.
+
+        Termine bien o mal, el worker cuenta como terminado: el último manda los
+        END a `downstream` y las etapas siguientes vacían lo que ya tenían.
+        """
+        try:
+            body()
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self.fail(e, upstream)
+        finally:
+            try:
+                stage.worker_finished(downstream, consumers)
+            except PipelineAborted:
+                pass
+
+    def fail(self, error: BaseException, close: Optional[Iterable[StageQueue]] = None) -> None:
+        """Registra el error y cierra las colas `close` (None = todas)"""
+        with self._lock:
+            self.errors.append(error)
+        if close is None:
+            self.aborted.set()
+            close = list(self.queues.values())
+        for q in close:
+            q.closed.set()
+
+    def wait_until(self, event: threading.Event) -> None:
+        """Espera un evento de otra etapa (o el aborto del pipeline)"""
+        while not event.wait(_POLL_SECONDS):
+            if self.aborted.is_set():
+                return
+
+    def join(self) -> None:
+        # Los threads se pueden lanzar desde otros threads: se repite hasta que no haya nuevos
+        joined = 0
+        while True:
+            with self._lock:
+                pending = self._threads[joined:]
+            if not pending:
+                return
+            for thread in pending:
+                thread.join()
+            joined += len(pending)
+
+    def metrics(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self._started
+        return {
+            "elapsed_seconds": round(elapsed, 4),
+            "stages": {name: stage.metrics(elapsed) for name, stage in self.stages.items()},
+            "queues": {name: q.metrics() for name, q in self.queues.items()},
+        }
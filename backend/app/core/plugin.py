@@ -8,20 +8,57 @@ Correcciones clave:
 """
 
 from abc import ABC, abstractmethod
-from typing import Iterable, Dict, Any, Optional, Set, Tuple
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Dict, Any, List, Optional, Set, Tuple
+import asyncio
+import hashlib
+import inspect
+import os
 import random
 import importlib.util
+import http.client
+import json
 import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
 
 from sqlalchemy.orm import Session
 
-from app.models.dto import Case, Pred, Compare
+from app.models.dto import Case, Pred, Compare, SmokeTestResult
 from app.models.db import Plugin
 from app.core.deps import validate_plugin_imports
+from app.core import loadtest
+from app.core.datasets import open_dataset
 
 
 class TestPlugin(ABC):
-    """Interfaz que deben implementar todos los plugins"""
+    """Interfaz que deben implementar todos los plugins
+
+    ejecutar_test, comparar_resultados y ejecutar_batch pueden definirse como
+    `async def` (clientes async de openai, aiohttp, ...): el runner los ejecuta
+    en un event loop con concurrencia acotada (RunConfig.concurrency).
+
+    setup/teardown (opcionales, también pueden ser async) abren y cierran una
+    sola vez por instancia los recursos compartidos entre casos: pools de
+    conexiones, tokens MSAL, sesiones HTTP, DataFrames de lookup.
+
+    display_name y config_schema los muestra la API para los plugins built-in
+    (los dinámicos los guardan en la tabla `plugins`).
+    """
+
+    display_name: Optional[str] = None
+    config_schema: Dict[str, str] = {}
+
+    def setup(self, config: Dict[str, Any]) -> None:
+        """Abre recursos compartidos antes de obtener y procesar los casos (opcional)"""
+        pass
+
+    def teardown(self) -> None:
+        """Libera los recursos de setup. Se llama siempre, aunque setup o el run fallen."""
+        pass
 
     @abstractmethod
     def obtener_casos(self, config: Dict[str, Any]) -> Iterable[Case]:
@@ -38,10 +75,104 @@ class TestPlugin(ABC):
         """Compara el resultado esperado (truth) con la predicción"""
         pass
 
+    def ejecutar_batch(self, casos: List[Case], config: Dict[str, Any]) -> List[Pred]:
+        """Ejecuta el test para varios casos en una sola llamada (opcional).
+
+        Los plugins cuyo backend acepta requests en lote (endpoints de embeddings,
+        SQL con IN (...)) pueden sobrescribirlo: el runner lo detecta y le pasa
+        micro-batches. Debe devolver una Pred por caso, en el mismo orden.
+        """
+        return [self.ejecutar_test(caso, config) for caso in casos]
+
+    def comparar_vectorizado(self, casos, preds, config: Dict[str, Any]):
+        """Compara un lote completo con operaciones vectoriales (opcional).
+
+        Recibe dos DataFrames de pandas alineados por posición: `casos` (case_id
+        y las claves de case.data) y `preds` (ok, value, status, meta). Devuelve
+        un DataFrame o dict de columnas con `match` y `reason` (obligatorias) y
+        `truth`, `pred`, `detail` (opcionales). Si el plugin lo implementa, el
+        runner lo usa por micro-batch en lugar de comparar_resultados.
+
+        El atributo de clase `vectorized_case_fields` (lista de claves) limita las
+        columnas de `casos` a las que usa la comparación.
+        """
+        raise NotImplementedError
+
+
+def supports_batch(plugin: TestPlugin) -> bool:
+    """True si el plugin sobrescribe ejecutar_batch"""
+    return type(plugin).ejecutar_batch is not TestPlugin.ejecutar_batch
+
+
+def supports_vectorized_compare(plugin: TestPlugin) -> bool:
+    """True si el plugin implementa comparar_vectorizado"""
+    return type(plugin).comparar_vectorizado is not TestPlugin.comparar_vectorizado
+
+
+def is_async_plugin(plugin: TestPlugin) -> bool:
+    """True si alguno de los métodos del plugin es `async def`"""
+    methods = [plugin.setup, plugin.teardown, plugin.ejecutar_test, plugin.comparar_resultados]
+    if supports_batch(plugin):
+        methods.append(plugin.ejecutar_batch)
+    return any(inspect.iscoroutinefunction(m) for m in methods)
+
+
+async def maybe_await(result: Any) -> Any:
+    """Espera el resultado si es una corrutina (métodos sync o async indistintamente)"""
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+def first_case(plugin: TestPlugin, config: Dict[str, Any]) -> Optional[Case]:
+    """Primer caso de obtener_casos sin recorrer el resto (None si no genera casos)"""
+    # El proxy del sandbox lo pide así para que el worker corte en el primer caso
+    primer_caso = getattr(plugin, "primer_caso", None)
+    if primer_caso is not None:
+        return primer_caso(config)
+    casos = iter(plugin.obtener_casos(config))
+    try:
+        return next(casos, None)
+    finally:
+        # Generadores: corre sus finally (cierra conexiones/archivos abiertos)
+        close = getattr(casos, "close", None)
+        if close is not None:
+            close()
+
+
+def smoke_test_timeout() -> float:
+    """Segundos máximos del smoke test (PLUGIN_TEST_TIMEOUT_SECONDS, default 30; 0 = sin límite)"""
+    value = os.getenv("PLUGIN_TEST_TIMEOUT_SECONDS", "").strip()
+    return float(value) if value else 30.0
+
+
+class SmokeTestTimeout(TimeoutError):
+    """El smoke test no terminó dentro del timeout"""
+
+
+class _PhaseTimer:
+    """Duración de cada fase del smoke test y la fase en curso"""
+
+    def __init__(self):
+        self.timings_ms: Dict[str, float] = {}
+        self.current: Optional[str] = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        # Si la fase falla, `current` queda con su nombre
+        self.current = name
+        started = time.perf_counter()
+        yield
+        self.timings_ms[name] = round((time.perf_counter() - started) * 1000, 3)
+        self.current = None
+
 
 class DemoPlugin(TestPlugin):
     """Plugin de demostración para probar el pipeline end-to-end"""
 
+    display_name = "Demo Plugin"
+    config_schema = {"num_casos": "int", "error_rate": "float"}
+
     def obtener_casos(self, config: Dict[str, Any]) -> Iterable[Case]:
         """Genera casos simulados"""
         num_casos = config.get("num_casos", 30)
@@ -130,13 +261,187 @@ class DemoPlugin(TestPlugin):
         )
 
 
+class LoadTestPlugin(DemoPlugin):
+    """Plugin que imita la latencia de backends reales (OpenAI, ECRM) para pruebas de carga
+
+    Config (además de los parámetros de app.core.loadtest.SIMULATION_DEFAULTS):
+    - num_casos: cantidad de casos (se generan de forma lazy)
+    - mode: "local" (simula en proceso) o "http" (llama a un StandInServer)
+    - server_url: URL del StandInServer en modo "http"
+    - seed: si se indica, la simulación es determinística por caso
+
+    En modo "http" setup abre una conexión keep-alive por instancia (una por
+    worker), así no hay un handshake TCP por caso.
+    """
+
+    display_name = "Load Test Plugin"
+    config_schema = {
+        "num_casos": "int",
+        "mode": "str",
+        "server_url": "str",
+        "latency": "str",
+        "latency_ms": "float",
+        "latency_sigma": "float",
+        "tail_alpha": "float",
+        "error_rate": "float",
+        "timeout_rate": "float",
+        "timeout_ms": "float",
+        "cpu_ms": "float",
+        "raw_bytes": "int",
+        "accuracy": "float",
+        "seed": "str",
+    }
+
+    _connection: Optional[http.client.HTTPConnection] = None
+
+    def setup(self, config: Dict[str, Any]) -> None:
+        if config.get("mode", "local") == "http":
+            url = urllib.parse.urlsplit(config.get("server_url") or "http://127.0.0.1:8099")
+            timeout = loadtest.simulation_params(config)["timeout_ms"] / 1000
+            self._connection = http.client.HTTPConnection(url.hostname, url.port, timeout=timeout)
+
+    def teardown(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _rng(self, caso_id: str, config: Dict[str, Any]) -> random.Random:
+        seed = config.get("seed")
+        return random.Random(f"{seed}:{caso_id}") if seed not in (None, "") else random.Random()
+
+    def obtener_casos(self, config: Dict[str, Any]) -> Iterable[Case]:
+        """Genera casos sintéticos bajo demanda"""
+        num_casos = config.get("num_casos", 100)
+        for i in range(num_casos):
+            rng = self._rng(f"case_{i}", config)
+            yield Case(
+                id=f"load_case_{i+1}",
+                data={
+                    "label": rng.choice(loadtest.LABELS),
+                    "input_text": f"Texto de carga {i+1}",
+                    "metadata": {"source": "loadtest", "index": i},
+                },
+            )
+
+    def ejecutar_test(self, caso: Case, config: Dict[str, Any]) -> Pred:
+        if config.get("mode", "local") == "http":
+            return self._ejecutar_http(caso, config)
+
+        params = loadtest.simulation_params(config)
+        result = loadtest.simulate_prediction(caso.id, caso.data.get("label"), params, self._rng(caso.id, config))
+        time.sleep(result["latency_ms"] / 1000)
+        loadtest.burn_cpu(params["cpu_ms"])
+        return self._to_pred(caso, result)
+
+    def ejecutar_batch(self, casos: List[Case], config: Dict[str, Any]) -> List[Pred]:
+        """Simula un endpoint batch: una sola latencia por lote"""
+        if config.get("mode", "local") == "http":
+            return self._ejecutar_http_batch(casos, config)
+
+        params = loadtest.simulation_params(config)
+        results = [
+            loadtest.simulate_prediction(caso.id, caso.data.get("label"), params, self._rng(caso.id, config))
+            for caso in casos
+        ]
+        latency_ms = max((r["latency_ms"] for r in results), default=0.0)
+        time.sleep(latency_ms / 1000)
+        loadtest.burn_cpu(params["cpu_ms"] * len(casos))
+        for result in results:
+            result["latency_ms"] = latency_ms
+        return [self._to_pred(caso, result) for caso, result in zip(casos, results)]
+
+    def _post(self, path: str, payload: Dict[str, Any], config: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """POST al StandInServer. Devuelve (respuesta, None) o (None, resultado de falla)"""
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        try:
+            if self._connection is not None:
+                # Conexión keep-alive de setup (se reconecta sola si se cerró)
+                self._connection.request("POST", path, body=body, headers=headers)
+                response = self._connection.getresponse()
+                data = response.read()
+                if response.status >= 400:
+                    return None, {"outcome": "error", "error": f"HTTP {response.status}"}
+                return json.loads(data), None
+
+            params = loadtest.simulation_params(config)
+            url = config.get("server_url") or "http://127.0.0.1:8099"
+            request = urllib.request.Request(f"{url.rstrip('/')}{path}", data=body, headers=headers)
+            with urllib.request.urlopen(request, timeout=params["timeout_ms"] / 1000) as response:
+                return json.loads(response.read()), None
+        except urllib.error.HTTPError as e:
+            return None, {"outcome": "error", "error": f"HTTP {e.code}"}
+        except (TimeoutError, OSError, http.client.HTTPException) as e:
+            if self._connection is not None:
+                self._connection.close()
+            # urllib envuelve los timeouts de conexión en URLError(reason=timeout)
+            reason = getattr(e, "reason", e)
+            timed_out = isinstance(e, TimeoutError) or isinstance(reason, TimeoutError)
+            return None, {"outcome": "timeout" if timed_out else "error", "error": str(reason)}
+
+    def _ejecutar_http_batch(self, casos: List[Case], config: Dict[str, Any]) -> List[Pred]:
+        started = time.perf_counter()
+        response, failure = self._post(
+            "/predict_batch", {"cases": [{"case_id": c.id, "data": c.data} for c in casos]}, config
+        )
+        results = response["results"] if response else [dict(failure) for _ in casos]
+        latency_ms = (time.perf_counter() - started) * 1000
+        for result in results:
+            result["latency_ms"] = latency_ms
+        return [self._to_pred(caso, result) for caso, result in zip(casos, results)]
+
+    def _ejecutar_http(self, caso: Case, config: Dict[str, Any]) -> Pred:
+        started = time.perf_counter()
+        response, failure = self._post("/predict", {"case_id": caso.id, "data": caso.data}, config)
+        result = response or failure
+        result["latency_ms"] = (time.perf_counter() - started) * 1000
+        return self._to_pred(caso, result)
+
+    def _to_pred(self, caso: Case, result: Dict[str, Any]) -> Pred:
+        latency_ms = round(result["latency_ms"], 3)
+        if result["outcome"] != "ok":
+            return Pred(
+                ok=False,
+                value=None,
+                status=result["outcome"],
+                raw=None,
+                meta={"error": result.get("error", "Simulated timeout"), "case_id": caso.id, "latency_ms": latency_ms},
+            )
+
+        return Pred(
+            ok=True,
+            value=result["prediction"],
+            status="success",
+            raw=json.dumps({
+                "prediction": result["prediction"],
+                "confidence": result["confidence"],
+                "text": result["text"],
+            }),
+            meta={"confidence": result["confidence"], "model": "loadtest", "latency_ms": latency_ms},
+        )
+
+
 class PluginFactory:
     """Factory para obtener plugins por nombre"""
 
     _plugins: Dict[str, type] = {
         "demo": DemoPlugin,
+        "loadtest": LoadTestPlugin,
     }
     _db_session: Optional[Session] = None
+    # Smoke tests que superaron el timeout y siguen corriendo (el código del
+    # plugin no se puede interrumpir en modo inprocess), por plugin y código
+    _stuck_smoke_tests: Dict[str, threading.Thread] = {}
+    _stuck_lock = threading.Lock()
+
+    @classmethod
+    def builtin_plugins(cls) -> Dict[str, type]:
+        """Plugins registrados en código (no se editan ni se borran por la API)"""
+        return dict(cls._plugins)
+
+    @classmethod
+    def is_builtin(cls, name: str) -> bool:
+        return name in cls._plugins
 
     @classmethod
     def set_db_session(cls, db: Session):
@@ -144,16 +449,21 @@ class PluginFactory:
         cls._db_session = db
 
     @classmethod
-    def get(cls, name: str) -> TestPlugin:
-        """Obtiene un plugin por nombre, validando su estado"""
+    def get(cls, name: str, db: Optional[Session] = None) -> TestPlugin:
+        """Obtiene un plugin por nombre, validando su estado.
+
+        Los dinámicos se leen con `db` o, si no se pasa, con la sesión de
+        set_db_session (los threads en background pasan la suya).
+        """
         # Built-in
         if name in cls._plugins:
             return cls._plugins[name]()
 
         # DB
-        if cls._db_session:
+        session = db or cls._db_session
+        if session:
             plugin_db = (
-                cls._db_session.query(Plugin)
+                session.query(Plugin)
                 .filter(Plugin.plugin_name == name)
                 .first()
             )
@@ -170,11 +480,19 @@ class PluginFactory:
 
             # Cargar plugin dinámicamente (si falla acá sí es un error real de carga)
             try:
+                from app.core import sandbox
+
+                if sandbox.execution_mode() == "subprocess":
+                    # El código corre en workers aislados; acá sólo se validan los imports
+                    is_valid, error_msg = validate_plugin_imports(plugin_db.code)
+                    if not is_valid:
+                        raise ValueError(error_msg)
+                    return sandbox.sandboxed_plugin(name, plugin_db.code)
                 return cls._load_plugin_from_code(plugin_db.code, name)
             except Exception as e:
                 plugin_db.status = "error"
                 plugin_db.error_message = str(e)
-                cls._db_session.commit()
+                session.commit()
                 raise ValueError(f"Error al cargar plugin '{name}': {str(e)}")
 
         raise ValueError(
@@ -205,6 +523,8 @@ class PluginFactory:
                     "Case": Case,
                     "Pred": Pred,
                     "Compare": Compare,
+                    # Datasets subidos por la API (ver app.core.datasets)
+                    "open_dataset": open_dataset,
                 }
             )
 
@@ -278,42 +598,136 @@ class PluginFactory:
             or "no se encontró una clase que implemente testplugin" in m
         )
 
+    @staticmethod
+    async def _smoke_test(plugin: TestPlugin, test_config: Dict[str, Any], timer: _PhaseTimer) -> None:
+        """setup, un caso por ejecutar_test/ejecutar_batch/comparar_resultados y teardown"""
+        try:
+            with timer.phase("setup"):
+                await maybe_await(plugin.setup(test_config))
+
+            # Hacer una prueba básica: sólo el primer caso (obtener_casos puede leer una fuente enorme)
+            with timer.phase("obtener_casos"):
+                caso = first_case(plugin, test_config)
+                if caso is None:
+                    raise ValueError("Plugin no genera casos de prueba")
+
+            # Probar ejecutar un caso
+            with timer.phase("ejecutar_test"):
+                pred = await maybe_await(plugin.ejecutar_test(caso, test_config))
+                if not isinstance(pred, Pred):
+                    raise ValueError("ejecutar_test no retorna un objeto Pred válido")
+
+            # Probar ejecutar en lote (si el plugin lo implementa)
+            if supports_batch(plugin):
+                with timer.phase("ejecutar_batch"):
+                    preds = await maybe_await(plugin.ejecutar_batch([caso], test_config))
+                    if not isinstance(preds, list) or len(preds) != 1 or not isinstance(preds[0], Pred):
+                        raise ValueError("ejecutar_batch no retorna una lista de Pred (una por caso)")
+
+            # Probar comparar
+            with timer.phase("comparar_resultados"):
+                cmp = await maybe_await(plugin.comparar_resultados(caso, pred, test_config))
+                if not isinstance(cmp, Compare):
+                    raise ValueError("comparar_resultados no retorna un objeto Compare válido")
+
+            # Probar comparar vectorizado (si el plugin lo implementa)
+            if supports_vectorized_compare(plugin):
+                from app.core.vectorized import compare_vectorized
+
+                with timer.phase("comparar_vectorizado"):
+                    compare_vectorized(plugin, [caso], [pred], test_config)
+        finally:
+            failed_phase = timer.current
+            with timer.phase("teardown"):
+                await maybe_await(plugin.teardown())
+            timer.current = failed_phase
+
+    @classmethod
+    def _check_not_stuck(cls, key: str) -> None:
+        """Rechaza el smoke test si el anterior del mismo código sigue corriendo"""
+        with cls._stuck_lock:
+            thread = cls._stuck_smoke_tests.get(key)
+            if thread is not None and not thread.is_alive():
+                del cls._stuck_smoke_tests[key]
+                thread = None
+        if thread is not None:
+            raise RuntimeError(
+                "El smoke test anterior de este código superó el timeout y sigue corriendo; "
+                "se puede reintentar cuando termine"
+            )
+
+    @classmethod
+    def _smoke_test_with_timeout(cls, plugin: TestPlugin, test_config: Dict[str, Any],
+                                 timer: _PhaseTimer, timeout: float, key: Optional[str] = None) -> None:
+        """Corre _smoke_test en un thread aparte y espera a lo sumo `timeout` segundos.
+
+        Si se corta, el thread sigue hasta que el plugin devuelva el control
+        (y ahí corre teardown, en el finally de _smoke_test); mientras tanto
+        queda registrado bajo `key` y _check_not_stuck rechaza otra prueba.
+        """
+        errors: List[BaseException] = []
+
+        def target() -> None:
+            try:
+                # Un solo event loop para toda la prueba (recursos async de setup)
+                asyncio.run(cls._smoke_test(plugin, test_config, timer))
+            except BaseException as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=target, name=f"smoke-test-{type(plugin).__name__}", daemon=True)
+        thread.start()
+        thread.join(timeout if timeout > 0 else None)
+        if thread.is_alive():
+            # El código del plugin no se puede interrumpir: el thread termina solo (o
+            # falla enseguida si es el proxy del sandbox, que mata su worker en abort)
+            abort = getattr(plugin, "abort", None)
+            if abort is not None:
+                abort()
+            if key is not None:
+                with cls._stuck_lock:
+                    cls._stuck_smoke_tests[key] = thread
+            raise SmokeTestTimeout(f"El smoke test superó {timeout:g}s (fase '{timer.current}')")
+        if errors:
+            raise errors[0]
+
     @classmethod
     def test_plugin(cls, plugin_name: str, db: Session) -> Tuple[bool, Optional[str]]:
+        """Prueba un plugin; devuelve (ok, mensaje de error). Ver smoke_test."""
+        result = cls.smoke_test(plugin_name, db)
+        return result.success, result.message
+
+    @classmethod
+    def smoke_test(cls, plugin_name: str, db: Session, timeout: Optional[float] = None) -> SmokeTestResult:
         """Prueba un plugin para verificar que funciona correctamente.
 
         Importante:
         - Arma un config dummy desde config_schema para evitar fallos por ausencia de keys.
-        - No marca status=error por errores de ejecución; solo por errores de carga.
+        - Sólo pide el primer caso de obtener_casos.
+        - Corta a los `timeout` segundos (default PLUGIN_TEST_TIMEOUT_SECONDS) desde setup.
+        - No marca status=error por errores de ejecución (ni timeout); solo por errores de carga.
         """
-        original_session = cls._db_session
+        timeout = smoke_test_timeout() if timeout is None else timeout
+        timer = _PhaseTimer()
+        started = time.perf_counter()
+        tested_code = None
         try:
-            cls.set_db_session(db)
-
             plugin_db = db.query(Plugin).filter(Plugin.plugin_name == plugin_name).first()
             schema = plugin_db.config_schema if plugin_db else {}
+            tested_code = plugin_db.code if plugin_db else None
             test_config = cls._build_dummy_config_from_schema(schema)
+            stuck_key = plugin_name
+            if tested_code is not None:
+                stuck_key += ":" + hashlib.sha256(tested_code.encode("utf-8")).hexdigest()
+            cls._check_not_stuck(stuck_key)
 
-            plugin = cls.get(plugin_name)
-
-            # Hacer una prueba básica
-            casos = list(plugin.obtener_casos(test_config))
-            if not casos:
-                raise ValueError("Plugin no genera casos de prueba")
-
-            # Probar ejecutar un caso
-            caso = casos[0]
-            pred = plugin.ejecutar_test(caso, test_config)
-            if not isinstance(pred, Pred):
-                raise ValueError("ejecutar_test no retorna un objeto Pred válido")
+            # La sesión va explícita: corre también en threads en background
+            with timer.phase("load"):
+                plugin = cls.get(plugin_name, db)
 
-            # Probar comparar
-            cmp = plugin.comparar_resultados(caso, pred, test_config)
-            if not isinstance(cmp, Compare):
-                raise ValueError("comparar_resultados no retorna un objeto Compare válido")
+            cls._smoke_test_with_timeout(plugin, test_config, timer, timeout, stuck_key)
 
             # Si llegamos aquí, el plugin funciona
-            if plugin_db:
+            if plugin_db and cls._still_tested(db, plugin_db, tested_code):
                 from datetime import datetime
 
                 plugin_db.status = "active"
@@ -321,13 +735,17 @@ class PluginFactory:
                 plugin_db.last_test_at = datetime.utcnow()
                 db.commit()
 
-            return True, None
+            return SmokeTestResult(
+                success=True,
+                timings_ms=timer.timings_ms,
+                total_ms=round((time.perf_counter() - started) * 1000, 3),
+            )
 
         except Exception as e:
             msg = str(e)
 
             plugin_db = db.query(Plugin).filter(Plugin.plugin_name == plugin_name).first()
-            if plugin_db:
+            if plugin_db and cls._still_tested(db, plugin_db, tested_code):
                 from datetime import datetime
 
                 # Guardamos siempre el mensaje (para que se vea en la UI)
@@ -340,7 +758,19 @@ class PluginFactory:
 
                 db.commit()
 
-            return False, msg
+            return SmokeTestResult(
+                success=False,
+                message=msg,
+                timed_out=isinstance(e, SmokeTestTimeout),
+                phase=timer.current,
+                timings_ms=timer.timings_ms,
+                total_ms=round((time.perf_counter() - started) * 1000, 3),
+            )
 
-        finally:
-            cls._db_session = original_session
+    @staticmethod
+    def _still_tested(db: Session, plugin_db: Plugin, tested_code: Optional[str]) -> bool:
+        """False si el código cambió mientras corría el test (el resultado ya no aplica)"""
+        if tested_code is None:
+            return True
+        db.refresh(plugin_db)
+        return plugin_db.code == tested_code
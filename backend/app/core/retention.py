@@ -0,0 +1,132 @@
+"""Política de retención de runs y sweeper periódico
+
+La política se configura por variables de entorno:
+- RETENTION_KEEP_LAST: conservar los últimos N runs por plugin (vacío = sin límite)
+- RETENTION_MAX_AGE_DAYS: eliminar runs más viejos que N días (vacío = sin límite)
+- RETENTION_SWEEP_INTERVAL_SECONDS: cada cuánto corre el sweeper (default 3600)
+- RETENTION_DELETE_CHUNK_SIZE: filas por DELETE al borrar un run (default 5000)
+
+Sólo se eliminan runs terminados; los runs en ejecución nunca se tocan.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.store import ResultStore
+from app.models.db import Run
+
+# Estados de runs que se pueden eliminar
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+def _env_number(name: str, cast=int):
+    value = os.getenv(name, "").strip()
+    return cast(value) if value else None
+
+
+class RetentionPolicy:
+    """Qué runs conservar: últimos N por plugin y/o edad máxima"""
+
+    def __init__(self, keep_last: Optional[int] = None, max_age_days: Optional[float] = None,
+                 chunk_size: int = 5000):
+        self.keep_last = keep_last
+        self.max_age_days = max_age_days
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        return cls(
+            keep_last=_env_number("RETENTION_KEEP_LAST"),
+            max_age_days=_env_number("RETENTION_MAX_AGE_DAYS", float),
+            chunk_size=_env_number("RETENTION_DELETE_CHUNK_SIZE") or 5000,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.keep_last is not None or self.max_age_days is not None
+
+    def expired_run_ids(self, db: Session, now: Optional[datetime] = None) -> List[str]:
+        """Runs terminados que la política manda eliminar (una sola consulta)"""
+        if not self.enabled:
+            return []
+
+        # Posición de cada run dentro de su plugin (1 = el más reciente)
+        ranked = (
+            select(
+                Run.run_id,
+                Run.created_at,
+                func.row_number()
+                .over(partition_by=Run.plugin_name, order_by=Run.created_at.desc())
+                .label("position"),
+            )
+            .where(Run.status.in_(FINISHED_STATUSES))
+            .subquery()
+        )
+
+        conditions = []
+        if self.keep_last is not None:
+            conditions.append(ranked.c.position > self.keep_last)
+        if self.max_age_days is not None:
+            cutoff = (now or datetime.utcnow()) - timedelta(days=self.max_age_days)
+            conditions.append(ranked.c.created_at < cutoff)
+
+        query = select(ranked.c.run_id).where(or_(*conditions)).order_by(ranked.c.created_at)
+        return db.execute(query).scalars().all()
+
+
+def sweep(db: Session, policy: RetentionPolicy) -> int:
+    """Aplica la política una vez. Devuelve la cantidad de runs eliminados."""
+    store = ResultStore(db)
+    deleted = 0
+    for run_id in policy.expired_run_ids(db):
+        store.delete_run(run_id, chunk_size=policy.chunk_size)
+        deleted += 1
+
+    # Payloads de casos deduplicados que ya no usa ningún run
+    store.collect_case_garbage()
+
+    # Payloads en almacenamiento frío que ya no referencia ningún detalle
+    if store.blobs is not None:
+        store.blobs.collect_garbage()
+
+    return deleted
+
+
+class RetentionSweeper:
+    """Thread en background que aplica la política periódicamente"""
+
+    def __init__(self, session_factory, policy: RetentionPolicy, interval_seconds: float = 3600):
+        self.session_factory = session_factory
+        self.policy = policy
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="retention-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            db = self.session_factory()
+            try:
+                deleted = sweep(db, self.policy)
+                if deleted:
+                    print(f"Retención: {deleted} runs eliminados")
+            except Exception as e:
+                print(f"Error en sweeper de retención: {str(e)}")
+            finally:
+                db.close()
+            self._stop.wait(self.interval_seconds)
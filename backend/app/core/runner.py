@@ -1,15 +1,140 @@
 """MassTestRunner: ejecuta tests masivos usando un plugin"""
-from app.core.plugin import PluginFactory, TestPlugin
-from app.core.store import ResultStore
-from app.models.dto import RunResult, Metrics, RunConfig
+import asyncio
+import inspect
+import threading
+import time
+from collections.abc import Sized
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from app.core.breaker import CircuitBreaker
+from app.core.pipeline import END, Pipeline, PipelineAborted
+from app.core.plugin import (
+    PluginFactory, TestPlugin, is_async_plugin, maybe_await, supports_batch, supports_vectorized_compare,
+)
+from app.core.sampling import CaseSampler
+from app.core.snapshots import SnapshotCache, SnapshotReader
+from app.core.spool import SpoolConfig, SpoolPending, SpoolWriter
+from app.core.store import DetailWriter, ResultStore
+from app.core.vectorized import compare_vectorized
+from app.models.dto import Case, Compare, Pred, RunResult, Metrics, RunConfig
 from sqlalchemy.orm import Session
 
+# Tamaño de micro-batch por defecto para plugins que implementan ejecutar_batch
+DEFAULT_BATCH_SIZE = 32
+# Con comparar_vectorizado el costo fijo de armar los DataFrames pide lotes más grandes
+DEFAULT_VECTORIZED_BATCH_SIZE = 1024
+# Detalles por INSERT/commit y máximo de segundos entre flushes (progreso visible)
+DETAIL_FLUSH_SIZE = 500
+DETAIL_FLUSH_INTERVAL = 1.0
+
+# Pedidos de cancelación por run_id (el runner los consulta entre unidades de trabajo)
+_cancel_events: Dict[str, threading.Event] = {}
+_cancel_lock = threading.Lock()
+
+
+def _cancel_event(run_id: str) -> threading.Event:
+    """Registra el run como ejecutándose en este proceso (lo saca run_existing al terminar)"""
+    with _cancel_lock:
+        return _cancel_events.setdefault(run_id, threading.Event())
+
+
+@contextmanager
+def cancellable(run_id: str) -> Iterator[threading.Event]:
+    """Registra el run como cancelable desde antes de arrancarlo (p. ej. antes de start_run)"""
+    event = _cancel_event(run_id)
+    try:
+        yield event
+    finally:
+        with _cancel_lock:
+            _cancel_events.pop(run_id, None)
+
+
+def request_cancel(run_id: str) -> bool:
+    """Pide cancelar un run que se ejecuta en este proceso.
+    
+    Es cooperativo: el runner deja de tomar casos nuevos, termina lo que está
+    en vuelo, guarda lo pendiente y cierra el run como "cancelled".
+    
+    Returns:
+        bool: False si el run no se está ejecutando en este proceso (ya
+        terminó, lo cierra el drainer del spool o quedó de un proceso anterior)
+    """
+    with _cancel_lock:
+        event = _cancel_events.get(run_id)
+    if event is None:
+        return False
+    event.set()
+    return True
+
+
+def fail_orphaned_running_runs(store: ResultStore, spool_config: SpoolConfig) -> int:
+    """Runs "running" de un proceso anterior que nadie va a cerrar.
+    
+    Se llama al arrancar: los que tienen un spool pendiente los cierra el
+    SpoolDrainer; el resto se marca como failed. Como la cola del scheduler,
+    asume que este es el único proceso que ejecuta runs contra la base.
+    """
+    return store.fail_running_runs(
+        exclude=spool_config.pending_run_ids(),
+        stop_reason="El proceso que lo ejecutaba terminó antes de cerrarlo (reinicio)",
+    )
+
+
+def iter_micro_batches(casos: Iterable[Case], batch_size: int, max_wait_ms: float) -> Iterator[List[Case]]:
+    """Agrupa casos en lotes de hasta `batch_size`.
+
+    Un lote incompleto se entrega igual si su primer caso ya esperó más de
+    `max_wait_ms` (p. ej. casos que llegan lento desde una base o una API).
+    La espera se controla entre casos: no interrumpe una lectura bloqueada.
+    """
+    batch: List[Case] = []
+    deadline = 0.0
+    for caso in casos:
+        if not batch:
+            deadline = time.monotonic() + max_wait_ms / 1000
+        batch.append(caso)
+        if len(batch) >= batch_size or time.monotonic() >= deadline:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _Total:
+    """Mensaje de la etapa source a persist con el total de casos"""
+    
+    __slots__ = ("total",)
+    
+    def __init__(self, total: int):
+        self.total = total
+
+
+class _Counted:
+    """Casos de un stream sin len(): el total se conoce recién al recorrerlo entero"""
+    
+    def __init__(self, casos: Iterable[Case]):
+        self.casos = casos
+        self.count = 0
+        self.exhausted = False
+    
+    def __iter__(self) -> Iterator[Case]:
+        for caso in self.casos:
+            self.count += 1
+            yield caso
+        self.exhausted = True
+
 
 class MassTestRunner:
     """Runner principal que ejecuta tests masivos"""
     
-    def __init__(self, store: ResultStore):
+    def __init__(self, store: ResultStore, spool_config: Optional[SpoolConfig] = None,
+                 snapshots: Optional[SnapshotCache] = None):
         self.store = store
+        # Con SPOOL_DIR los detalles pasan por el spool local (ver app.core.spool)
+        self.spool_config = spool_config or SpoolConfig.from_env()
+        # Con SNAPSHOT_DIR los casos se leen de un snapshot local (ver app.core.snapshots)
+        self.snapshots = snapshots or SnapshotCache()
     
     def run(self, config: RunConfig, db: Session) -> RunResult:
         """Ejecuta un test run completo (crea el run)"""
@@ -19,44 +144,444 @@ class MassTestRunner:
     
     def run_existing(self, run_id: str, config: RunConfig, db: Session) -> RunResult:
         """Ejecuta un test run para un run_id existente"""
-        # Configurar DB session en PluginFactory para cargar plugins dinámicos
-        PluginFactory.set_db_session(db)
-        
-        # Obtener plugin (valida estado automáticamente)
-        plugin = PluginFactory.get(config.plugin_name)
+        # Obtener plugin (valida estado automáticamente); la sesión va explícita
+        # para no pisar la de otros threads
+        plugin = PluginFactory.get(config.plugin_name, db)
         
+        pipeline = None
+        cancelled = _cancel_event(run_id)
+        # Si el breaker aborta, frena el run por el mismo camino que una cancelación
+        breaker = CircuitBreaker(config.circuit_breaker, cancelled) if config.circuit_breaker else None
+        # El modo muestreo también: corta cuando el intervalo de confianza es lo bastante angosto
+        sampler = CaseSampler(config.sampling, cancelled) if config.sampling else None
         try:
-            # Obtener casos
-            casos = plugin.obtener_casos(config.config)
-            
-            # Convertir a lista si es iterable (para contar total)
-            casos_list = list(casos) if not isinstance(casos, list) else casos
-            total_cases = len(casos_list)
-            
-            # Actualizar total de casos
-            self.store.update_run_progress(run_id, total_cases=total_cases)
-            
-            # Procesar cada caso
-            for caso in casos_list:
-                # Ejecutar test
-                pred = plugin.ejecutar_test(caso, config.config)
-                
-                # Comparar resultados
-                cmp = plugin.comparar_resultados(caso, pred, config.config)
-                
-                # Guardar detalle (actualiza progreso automáticamente)
-                self.store.save_detail(run_id, caso, pred, cmp)
+            if is_async_plugin(plugin):
+                asyncio.run(self._run_async(run_id, plugin, config, cancelled, breaker, sampler))
+            else:
+                pipeline = Pipeline(cancelled)
+                self._run_sync(run_id, plugin, config, pipeline, breaker, sampler)
             
-            # Calcular métricas y cerrar run
+            # Calcular métricas (de lo procesado, si se detuvo antes) y cerrar run
             metrics = self.store.compute_metrics(run_id)
-            self.store.close_run(run_id)
+            self.store.close_run(run_id, metrics, **self._outcome(cancelled, breaker, sampler, pipeline))
             
             return RunResult(run_id=run_id, metrics=metrics)
         
+        except SpoolPending:
+            # Los resultados están a salvo en disco: el SpoolDrainer cierra el run
+            raise
         except Exception as e:
-            # Marcar run como failed
-            run = self.store.get_run(run_id)
-            if run:
-                run.status = "failed"
-                self.store.db.commit()
+            # Marcar run como failed (con las métricas del pipeline para diagnosticar)
+            self.store.fail_run(
+                run_id,
+                pipeline_metrics=pipeline.metrics() if pipeline else None,
+                circuit_breaker=breaker.metrics() if breaker else None,
+                sampling=sampler.report() if sampler else None,
+            )
             raise e
+        finally:
+            with _cancel_lock:
+                _cancel_events.pop(run_id, None)
+    
+    @staticmethod
+    def _outcome(cancelled: threading.Event, breaker: Optional[CircuitBreaker],
+                 sampler: Optional[CaseSampler], pipeline: Optional[Pipeline] = None) -> Dict[str, Any]:
+        """Estado final y datos de cierre del run (close_run; también van al fin del spool)"""
+        if breaker is not None and breaker.aborted:
+            status, stop_reason = "failed", breaker.reason
+        elif sampler is not None and sampler.converged:
+            status, stop_reason = "completed", sampler.stop_reason()
+        elif cancelled.is_set():
+            status, stop_reason = "cancelled", "Cancelado por el usuario"
+        else:
+            status, stop_reason = "completed", None
+        return {
+            "status": status,
+            "stop_reason": stop_reason,
+            "pipeline_metrics": pipeline.metrics() if pipeline else None,
+            "circuit_breaker": breaker.metrics() if breaker else None,
+            "sampling": sampler.report() if sampler else None,
+        }
+    
+    def _cases(self, plugin: TestPlugin, config: RunConfig,
+               sampler: Optional[CaseSampler] = None) -> Tuple[Iterable[Case], Optional[int]]:
+        """Casos a evaluar y su total (None si todavía no se conoce).
+        
+        Sin muestreo los casos no se materializan: una lista, un Dataset o un
+        snapshot traen su len(); un generador se recorre en streaming (las
+        colas acotadas del pipeline limitan la memoria) envuelto en _Counted,
+        y el total se guarda al terminar. En modo muestreo, la muestra (una
+        pasada por el stream).
+        """
+        casos = self._obtener_casos(plugin, config)
+        if sampler is not None:
+            try:
+                sample = sampler.draw(casos)
+            finally:
+                self._close_cases(casos)
+            return sample, len(sample)
+        if isinstance(casos, Sized):
+            return casos, len(casos)
+        return _Counted(casos), None
+    
+    @staticmethod
+    def _close_cases(casos: Iterable[Case]) -> None:
+        if isinstance(casos, _Counted):
+            casos = casos.casos
+        if isinstance(casos, SnapshotReader):
+            casos.close()
+    
+    def _obtener_casos(self, plugin: TestPlugin, config: RunConfig) -> Iterable[Case]:
+        """obtener_casos del plugin, o el snapshot local si está vigente"""
+        if not self.snapshots.enabled:
+            return plugin.obtener_casos(config.config)
+        return self.snapshots.cases(
+            config.plugin_name, config.config,
+            lambda: plugin.obtener_casos(config.config),
+            refresh=config.refresh_snapshot,
+        )
+    
+    def _load_cases(self, run_id: str, plugin: TestPlugin, config: RunConfig,
+                    sampler: Optional[CaseSampler] = None) -> Iterable[Case]:
+        # Obtener casos
+        casos, total_cases = self._cases(plugin, config, sampler)
+        
+        # Actualizar total de casos (si es un stream, lo guarda _process_async al terminarlo)
+        if total_cases is not None:
+            self.store.update_run_progress(run_id, total_cases=total_cases)
+        return casos
+    
+    def _run_sync(self, run_id: str, plugin: TestPlugin, config: RunConfig, pipeline: Pipeline,
+                  breaker: Optional[CircuitBreaker] = None, sampler: Optional[CaseSampler] = None) -> None:
+        """Pipeline por etapas (ver app.core.pipeline); este thread es la etapa persist.
+        
+        - source: setup del plugin, obtener_casos (o la muestra) y teardown al final (un thread)
+        - produce: arma casos sueltos o micro-batches y los encola
+        - execute: `config.workers` threads. Con un solo worker ejecuta el thread
+          source con la instancia principal; con más, cada uno crea su instancia y
+          hace su setup/teardown (los recursos no se comparten entre threads)
+        - compare: `config.compare_workers` threads; comparan con la misma
+          instancia que ejecutó la unidad
+        - persist: guarda los detalles en lotes desde este thread (la sesión de
+          DB no es thread-safe) y los pasa al sampler
+        """
+        units = pipeline.queue("units", config.queue_size)
+        executed = pipeline.queue("executed", config.queue_size)
+        compared = pipeline.queue("compared", config.queue_size)
+        for name, workers in (("produce", 1), ("execute", config.workers),
+                              ("compare", config.compare_workers), ("persist", 1)):
+            pipeline.stage(name, workers)
+        
+        pipeline.spawn("pipeline-source", self._source_stage, pipeline, plugin, config, breaker, sampler)
+        for i in range(config.compare_workers):
+            pipeline.spawn(f"pipeline-compare-{i}", self._compare_stage, pipeline, config)
+        
+        try:
+            self._persist_stage(run_id, pipeline, breaker, sampler)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            pipeline.fail(e)
+        finally:
+            pipeline.join()
+        if pipeline.errors:
+            raise pipeline.errors[0]
+    
+    def _source_stage(self, pipeline: Pipeline, plugin: TestPlugin, config: RunConfig,
+                      breaker: Optional[CircuitBreaker], sampler: Optional[CaseSampler]) -> None:
+        casos: Iterable[Case] = ()
+        try:
+            plugin.setup(config.config)
+            casos, total = self._cases(plugin, config, sampler)
+            # El total lo guarda la etapa persist (la única que usa la sesión de DB);
+            # si es un stream lo manda la etapa produce al terminarlo
+            if total is not None:
+                pipeline.queues["compared"].put(_Total(total))
+            
+            use_batch, units = self._units(plugin, casos, config)
+            counted = casos if isinstance(casos, _Counted) else None
+            pipeline.spawn("pipeline-produce", self._produce_stage, pipeline, units, config, counted)
+            if config.workers == 1:
+                self._execute_worker(pipeline, plugin, use_batch, config, breaker)
+            else:
+                for i in range(config.workers):
+                    pipeline.spawn(
+                        f"pipeline-execute-{i}", self._execute_instance, pipeline, type(plugin), use_batch, config, breaker
+                    )
+            # Los compares pueden usar recursos de setup: teardown recién al final
+            pipeline.wait_until(pipeline.stages["compare"].done)
+        finally:
+            self._close_cases(casos)
+            self._teardown(plugin)
+    
+    @staticmethod
+    def _produce_stage(pipeline: Pipeline, units: Iterable[List[Case]], config: RunConfig,
+                       counted: Optional[_Counted] = None) -> None:
+        stage = pipeline.stages["produce"]
+        queue = pipeline.queues["units"]
+        
+        def produce() -> None:
+            started = time.perf_counter()
+            for unit in units:
+                if pipeline.cancelled.is_set():
+                    return
+                stage.record(len(unit), time.perf_counter() - started)
+                queue.put(unit)
+                started = time.perf_counter()
+            if counted is not None and counted.exhausted:
+                # Antes del END de "compared" (que espera a que termine esta etapa)
+                pipeline.queues["compared"].put(_Total(counted.count))
+        
+        pipeline.run_worker(stage, produce, downstream=queue, consumers=config.workers)
+    
+    def _execute_instance(self, pipeline: Pipeline, plugin_class: type, use_batch: bool, config: RunConfig,
+                          breaker: Optional[CircuitBreaker]) -> None:
+        """Worker de execute con su propia instancia del plugin (RunConfig.workers > 1)"""
+        plugin = plugin_class()
+        try:
+            self._execute_worker(pipeline, plugin, use_batch, config, breaker, setup=True)
+        finally:
+            self._teardown(plugin)
+    
+    def _execute_worker(self, pipeline: Pipeline, plugin: TestPlugin, use_batch: bool, config: RunConfig,
+                        breaker: Optional[CircuitBreaker], setup: bool = False) -> None:
+        stage = pipeline.stages["execute"]
+        inbox, outbox = pipeline.queues["units"], pipeline.queues["executed"]
+        
+        def execute() -> None:
+            if setup:
+                plugin.setup(config.config)
+            while True:
+                unit = inbox.get()
+                if unit is END:
+                    return
+                ticket = self._admit(breaker, pipeline.cancelled)
+                if pipeline.cancelled.is_set():
+                    # Cancelado: las unidades que quedaron en la cola no se ejecutan
+                    continue
+                started = time.perf_counter()
+                preds = self._execute_unit(plugin, unit, use_batch, config)
+                stage.record(len(unit), time.perf_counter() - started)
+                if breaker is not None:
+                    breaker.record(ticket, preds)
+                outbox.put((plugin, unit, preds))
+        
+        pipeline.run_worker(stage, execute, upstream=[inbox], downstream=outbox, consumers=config.compare_workers)
+        # Los compares usan esta instancia: el teardown espera a que terminen
+        pipeline.wait_until(pipeline.stages["compare"].done)
+    
+    def _compare_stage(self, pipeline: Pipeline, config: RunConfig) -> None:
+        stage = pipeline.stages["compare"]
+        inbox, outbox = pipeline.queues["executed"], pipeline.queues["compared"]
+        
+        def compare() -> None:
+            while True:
+                item = inbox.get()
+                if item is END:
+                    return
+                plugin, unit, preds = item
+                started = time.perf_counter()
+                cmps = self._compare(plugin, unit, preds, config)
+                stage.record(len(unit), time.perf_counter() - started)
+                outbox.put(list(zip(unit, preds, cmps)))
+        
+        pipeline.run_worker(stage, compare, upstream=[pipeline.queues["units"], inbox], downstream=outbox)
+    
+    def _persist_stage(self, run_id: str, pipeline: Pipeline, breaker: Optional[CircuitBreaker],
+                       sampler: Optional[CaseSampler]) -> None:
+        stage = pipeline.stages["persist"]
+        inbox = pipeline.queues["compared"]
+        
+        def outcome() -> Dict[str, Any]:
+            return self._outcome(pipeline.cancelled, breaker, sampler, pipeline)
+        
+        with self._writer(run_id, outcome) as writer:
+            while True:
+                item = inbox.get()
+                if item is END:
+                    break
+                started = time.perf_counter()
+                if isinstance(item, _Total):
+                    writer.set_total(item.total)
+                    continue
+                for caso, pred, cmp in item:
+                    # Guardar detalle (en lotes; actualiza progreso en cada flush)
+                    writer.add(caso, pred, cmp)
+                    if sampler is not None:
+                        sampler.observe(pred, cmp)
+                stage.record(len(item), time.perf_counter() - started)
+        stage.done.set()
+    
+    async def _run_async(self, run_id: str, plugin: TestPlugin, config: RunConfig,
+                         cancelled: threading.Event, breaker: Optional[CircuitBreaker] = None,
+                         sampler: Optional[CaseSampler] = None) -> None:
+        """Igual que _run_sync pero en el event loop (setup/teardown pueden ser async)"""
+        casos: Iterable[Case] = ()
+        try:
+            await maybe_await(plugin.setup(config.config))
+            casos = self._load_cases(run_id, plugin, config, sampler)
+            await self._process_async(run_id, plugin, casos, config, cancelled, breaker, sampler)
+        finally:
+            self._close_cases(casos)
+            try:
+                await maybe_await(plugin.teardown())
+            except Exception as e:
+                print(f"Error en teardown del plugin: {str(e)}")
+    
+    @staticmethod
+    def _admit(breaker: Optional[CircuitBreaker], stop: threading.Event) -> Optional[int]:
+        """Espera a que el circuit breaker deje pasar una unidad (None sin breaker o si el run se detuvo)"""
+        if breaker is None:
+            return None
+        while not stop.is_set():
+            ticket, wait = breaker.acquire()
+            if ticket is not None:
+                return ticket
+            stop.wait(wait)
+        return None
+    
+    @staticmethod
+    async def _admit_async(breaker: Optional[CircuitBreaker], stop: threading.Event) -> Optional[int]:
+        """Como _admit sin bloquear el event loop"""
+        if breaker is None:
+            return None
+        while not stop.is_set():
+            ticket, wait = breaker.acquire()
+            if ticket is not None:
+                return ticket
+            # El evento es de threading: se revisa cada poco para ver una cancelación
+            await asyncio.sleep(min(wait, 0.1))
+        return None
+    
+    @staticmethod
+    def _teardown(plugin: TestPlugin) -> None:
+        # Un error al liberar recursos no debe perder los resultados del run
+        try:
+            plugin.teardown()
+        except Exception as e:
+            print(f"Error en teardown del plugin: {str(e)}")
+    
+    @staticmethod
+    def _batch_size(plugin: TestPlugin, config: RunConfig) -> int:
+        if config.batch_size:
+            return config.batch_size
+        if supports_vectorized_compare(plugin):
+            return DEFAULT_VECTORIZED_BATCH_SIZE
+        return DEFAULT_BATCH_SIZE
+    
+    def _units(self, plugin: TestPlugin, casos: Iterable[Case], config: RunConfig) -> Tuple[bool, Iterable[List[Case]]]:
+        """Unidades de trabajo: micro-batches si el plugin implementa ejecutar_batch o
+        comparar_vectorizado, si no casos sueltos"""
+        batch_size = self._batch_size(plugin, config)
+        if (supports_batch(plugin) or supports_vectorized_compare(plugin)) and batch_size > 1:
+            return True, iter_micro_batches(casos, batch_size, config.batch_max_wait_ms)
+        return False, ([caso] for caso in casos)
+    
+    def _execute_unit(self, plugin: TestPlugin, unit: List[Case], use_batch: bool,
+                      config: RunConfig) -> List[Pred]:
+        """Ejecuta una unidad de trabajo de un plugin sync"""
+        if use_batch and supports_batch(plugin):
+            # Plugin con ejecutar_batch: una llamada por micro-batch
+            preds = plugin.ejecutar_batch(unit, config.config)
+            self._check_batch(unit, preds)
+            return preds
+        return [plugin.ejecutar_test(caso, config.config) for caso in unit]
+    
+    @staticmethod
+    def _compare(plugin: TestPlugin, unit: List[Case], preds: List[Pred], config: RunConfig) -> List[Compare]:
+        """Compara un lote: vectorizado si el plugin lo implementa, si no caso por caso"""
+        if supports_vectorized_compare(plugin):
+            return compare_vectorized(plugin, unit, preds, config.config)
+        return [plugin.comparar_resultados(caso, pred, config.config) for caso, pred in zip(unit, preds)]
+    
+    async def _process_async(self, run_id: str, plugin: TestPlugin, casos: Iterable[Case], config: RunConfig,
+                             cancelled: Optional[threading.Event] = None,
+                             breaker: Optional[CircuitBreaker] = None,
+                             sampler: Optional[CaseSampler] = None) -> None:
+        """Procesa los casos de un plugin async con a lo sumo `config.concurrency` unidades en vuelo.
+        
+        Una unidad es un caso, o un micro-batch si ejecutar_batch también es async.
+        Los detalles se guardan desde el thread del event loop (la sesión de DB no
+        es thread-safe); ante el primer error se cancela lo que queda en vuelo.
+        Con `cancelled` activado no se lanzan unidades nuevas y se espera a las
+        que están en vuelo. Con `breaker`, cada unidad espera a que el circuit
+        breaker la deje pasar. Con `sampler`, cada resultado guardado se le
+        informa (puede activar `cancelled` para cortar el run).
+        """
+        cancelled = cancelled or threading.Event()
+        batch_size = self._batch_size(plugin, config)
+        use_batch = (
+            supports_batch(plugin)
+            and inspect.iscoroutinefunction(plugin.ejecutar_batch)
+            and batch_size > 1
+        )
+        units = (
+            iter_micro_batches(casos, batch_size, config.batch_max_wait_ms)
+            if use_batch else ([caso] for caso in casos)
+        )
+        semaphore = asyncio.Semaphore(config.concurrency)
+        pending: Set[asyncio.Task] = set()
+        errors: List[BaseException] = []
+        
+        async def process(unit: List[Case], ticket: Optional[int]) -> None:
+            try:
+                if use_batch:
+                    preds = await plugin.ejecutar_batch(unit, config.config)
+                    self._check_batch(unit, preds)
+                else:
+                    preds = [await maybe_await(plugin.ejecutar_test(unit[0], config.config))]
+                if supports_vectorized_compare(plugin):
+                    cmps = compare_vectorized(plugin, unit, preds, config.config)
+                else:
+                    cmps = [
+                        await maybe_await(plugin.comparar_resultados(caso, pred, config.config))
+                        for caso, pred in zip(unit, preds)
+                    ]
+                if breaker is not None:
+                    breaker.record(ticket, preds)
+                for caso, pred, cmp in zip(unit, preds, cmps):
+                    writer.add(caso, pred, cmp)
+                    if sampler is not None:
+                        sampler.observe(pred, cmp)
+            finally:
+                semaphore.release()
+        
+        def on_done(task: asyncio.Task) -> None:
+            pending.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                errors.append(task.exception())
+        
+        with self._writer(run_id, lambda: self._outcome(cancelled, breaker, sampler)) as writer:
+            for unit in units:
+                await semaphore.acquire()
+                ticket = await self._admit_async(breaker, cancelled)
+                if errors or cancelled.is_set():
+                    semaphore.release()
+                    break
+                task = asyncio.create_task(process(unit, ticket))
+                pending.add(task)
+                task.add_done_callback(on_done)
+            
+            if errors:
+                for task in pending:
+                    task.cancel()
+            if pending:
+                await asyncio.wait(set(pending))
+            if isinstance(casos, _Counted) and casos.exhausted:
+                writer.set_total(casos.count)
+        if errors:
+            raise errors[0]
+    
+    def _writer(self, run_id: str,
+                outcome: Optional[Callable[[], Dict[str, Any]]] = None) -> Union[DetailWriter, SpoolWriter]:
+        """Writer de detalles; con spool, `outcome` arma el cierre del run que va en el registro de fin"""
+        if self.spool_config.enabled:
+            return SpoolWriter(self.store, run_id, self.spool_config, DETAIL_FLUSH_INTERVAL, outcome)
+        return self.store.detail_writer(run_id, DETAIL_FLUSH_SIZE, DETAIL_FLUSH_INTERVAL)
+    
+    @staticmethod
+    def _check_batch(batch: List[Case], preds: List[Any]) -> None:
+        if len(preds) != len(batch):
+            raise ValueError(
+                f"ejecutar_batch devolvió {len(preds)} predicciones para {len(batch)} casos"
+            )
@@ -0,0 +1,164 @@
+"""Modo muestreo: muestra aleatoria de los casos y corte por intervalo de confianza
+
+Con `RunConfig.sampling`, el runner no evalúa todos los casos de
+`obtener_casos`: recorre el stream una vez con reservoir sampling (memoria
+acotada a `sample_size` casos por estrato) y evalúa la muestra de a poco. En
+cuanto el intervalo de Wilson de la accuracy es más angosto que
+`target_width`, el run se detiene (termina lo que está en vuelo) y queda
+"completed" con el intervalo en runs.sampling. Si `obtener_casos` devuelve
+algo con acceso por índice (una lista o un dataset subido, ver
+app.core.datasets) y no se estratifica, se eligen índices al azar en lugar de
+recorrer todo.
+
+Estratificado (`stratify_by`, una clave de case.data, p. ej. la etiqueta
+esperada): cada estrato tiene su reservoir y la muestra se reparte en
+proporción al tamaño de cada uno. Los casos se intercalan de forma que
+cualquier prefijo de la muestra mantiene esas proporciones, así el corte
+temprano no sesga hacia un estrato.
+"""
+import math
+import random
+import threading
+from collections.abc import Sequence
+from statistics import NormalDist
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.models.dto import Case, SamplingConfig
+
+# Un stratify_by con demasiados valores distintos (p. ej. un id) no tiene sentido y llenaría la memoria
+MAX_STRATA = 100
+
+
+def wilson_interval(successes: int, total: int, confidence: float = 0.95) -> Tuple[float, float]:
+    """Intervalo de Wilson para una proporción (0, 1 si no hay casos)"""
+    if total <= 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    p = successes / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    half = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def _allocate(sizes: Dict[str, int], sample_size: int) -> Dict[str, int]:
+    """Reparto proporcional de la muestra entre estratos (mayores restos)"""
+    population = sum(sizes.values())
+    if population <= sample_size:
+        return dict(sizes)
+    quotas = {key: sample_size * size / population for key, size in sizes.items()}
+    allocation = {key: int(quota) for key, quota in quotas.items()}
+    remaining = sample_size - sum(allocation.values())
+    for key in sorted(quotas, key=lambda k: quotas[k] - allocation[k], reverse=True)[:remaining]:
+        allocation[key] += 1
+    return allocation
+
+
+class CaseSampler:
+    """Arma la muestra de un run y sigue su intervalo de confianza"""
+
+    def __init__(self, config: SamplingConfig, stop: Optional[threading.Event] = None):
+        self.config = config
+        # Se activa cuando el intervalo es lo bastante angosto (mismo camino que una cancelación)
+        self.stop = stop or threading.Event()
+        self.converged = False
+        self.population = 0
+        self.strata: Dict[str, Dict[str, int]] = {}
+        self.sample_size = 0
+        self.evaluated = 0
+        self.matches = 0
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+
+    def draw(self, casos: Iterable[Case]) -> List[Case]:
+        """Recorre el stream una vez y devuelve la muestra en orden de evaluación"""
+        k = self.config.sample_size
+        if not self.config.stratify_by and isinstance(casos, Sequence):
+            # Acceso por índice (lista, dataset subido): se leen sólo los casos de la muestra
+            n = len(casos)
+            self.population = n
+            self.strata = {"all": {"population": n, "sample": min(k, n)}}
+            self.sample_size = min(k, n)
+            return [casos[i] for i in self._rng.sample(range(n), self.sample_size)]
+        reservoirs: Dict[str, List[Case]] = {}
+        seen: Dict[str, int] = {}
+        for caso in casos:
+            key = self._stratum(caso)
+            reservoir = reservoirs.get(key)
+            if reservoir is None:
+                if len(reservoirs) >= MAX_STRATA:
+                    raise ValueError(
+                        f"sampling.stratify_by='{self.config.stratify_by}' tiene más de {MAX_STRATA} valores distintos"
+                    )
+                reservoir = reservoirs[key] = []
+                seen[key] = 0
+            seen[key] += 1
+            # Algoritmo R: el i-ésimo caso reemplaza a uno al azar con probabilidad k/i
+            if len(reservoir) < k:
+                reservoir.append(caso)
+            else:
+                j = self._rng.randrange(seen[key])
+                if j < k:
+                    reservoir[j] = caso
+
+        allocation = _allocate(seen, k)
+        keyed = []
+        for key, reservoir in reservoirs.items():
+            chosen = self._rng.sample(reservoir, allocation[key])
+            # Posición i-ésima del estrato en (i + u) / n: cualquier prefijo queda proporcional
+            n = len(chosen)
+            keyed.extend(((i + self._rng.random()) / n, caso) for i, caso in enumerate(chosen))
+        keyed.sort(key=lambda item: item[0])
+
+        self.population = sum(seen.values())
+        self.strata = {key: {"population": seen[key], "sample": allocation[key]} for key in sorted(seen)}
+        self.sample_size = len(keyed)
+        return [caso for _, caso in keyed]
+
+    def _stratum(self, caso: Case) -> str:
+        if not self.config.stratify_by:
+            return "all"
+        return str(caso.data.get(self.config.stratify_by))
+
+    def observe(self, pred: Any, cmp: Any) -> None:
+        """Suma un resultado (accuracy como en compute_metrics: sólo casos con pred.value)"""
+        if pred.value is None:
+            return
+        with self._lock:
+            self.evaluated += 1
+            self.matches += bool(cmp.match)
+            if self.converged or self.evaluated < self.config.min_cases:
+                return
+            low, high = wilson_interval(self.matches, self.evaluated, self.config.confidence)
+            if high - low <= self.config.target_width:
+                self.converged = True
+                self.stop.set()
+
+    def stop_reason(self) -> str:
+        low, high = self.interval()
+        return (
+            f"Muestreo: IC {self.config.confidence:.0%} de accuracy [{low:.4f}, {high:.4f}] "
+            f"con {self.evaluated} casos evaluados (ancho objetivo {self.config.target_width})"
+        )
+
+    def interval(self) -> Tuple[float, float]:
+        return wilson_interval(self.matches, self.evaluated, self.config.confidence)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            low, high = self.interval()
+            return {
+                "population": self.population,
+                "sample_size": self.sample_size,
+                "strata": self.strata,
+                "evaluated": self.evaluated,
+                "matches": self.matches,
+                "accuracy": self.matches / self.evaluated if self.evaluated else None,
+                "ci_low": low,
+                "ci_high": high,
+                "ci_width": high - low,
+                "confidence": self.config.confidence,
+                "target_width": self.config.target_width,
+                "stopped_early": self.converged,
+                "config": self.config.model_dump(),
+            }
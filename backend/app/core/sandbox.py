@@ -0,0 +1,610 @@
+"""Sandbox de subprocesos para plugins dinámicos
+
+En modo "inprocess" (default) el código de un plugin dinámico se ejecuta con
+`exec` dentro del proceso de la API: cada recarga deja un módulo más en
+memoria y un plugin que se cuelga o consume toda la memoria afecta al server.
+
+En modo "subprocess" el código corre en procesos worker (`python -m
+app.core.sandbox`) con límites de memoria y CPU (rlimits). El proceso de la API
+sólo ve un `SandboxedPlugin`, un proxy que manda casos y recibe Pred/Compare
+por un protocolo compacto: frames con largo de 4 bytes + JSON (orjson si está
+instalado) sobre stdin/stdout del worker.
+
+- Los workers se reusan entre runs (un pool por plugin, con el código ya
+  cargado) y se reciclan después de N casos: la memoria que pierda el plugin
+  vuelve al sistema y el contador de CPU del rlimit arranca de cero.
+- El proxy implementa ejecutar_batch: ejecución y comparación de un
+  micro-batch viajan en un solo ida y vuelta.
+- obtener_casos llega en chunks de CASES_CHUNK casos (un pedido y un frame
+  por chunk): una fuente grande no se serializa entera ni se arma en memoria.
+- Un worker que supera sus límites muere; el caso en curso falla con
+  SandboxError y el run se marca como failed.
+
+Configuración por variables de entorno:
+- PLUGIN_EXECUTION_MODE: "inprocess" (default) o "subprocess"
+- PLUGIN_SANDBOX_WORKERS: workers ociosos que se mantienen por plugin (default 2)
+- PLUGIN_SANDBOX_MAX_CASES: casos por worker antes de reciclarlo (default 5000)
+- PLUGIN_SANDBOX_MEMORY_MB: RLIMIT_AS por worker, 0 = sin límite (default 2048)
+- PLUGIN_SANDBOX_CPU_SECONDS: RLIMIT_CPU por worker, 0 = sin límite (default 600)
+- PLUGIN_SANDBOX_CALL_TIMEOUT: segundos máximos por llamada, 0 = sin límite (default 300)
+
+Los rlimits y el timeout por llamada sólo se aplican en POSIX. El worker los
+aplica al arrancar (recibe los valores por argv): `preexec_fn` no es seguro en
+un server con threads.
+"""
+import argparse
+import asyncio
+import hashlib
+import inspect
+import itertools
+import os
+import select
+import struct
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+from app.core import serialization
+from app.core.plugin import (
+    PluginFactory, TestPlugin, first_case, supports_batch, supports_vectorized_compare,
+)
+from app.models.dto import Case, Compare, Pred
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+EXECUTION_MODES = ("inprocess", "subprocess")
+
+_HEADER = struct.Struct(">I")
+# Casos por frame al transferir obtener_casos desde el worker
+CASES_CHUNK = 500
+_BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+class SandboxError(RuntimeError):
+    """El worker del sandbox murió, no respondió a tiempo o rompió el protocolo"""
+
+
+def execution_mode() -> str:
+    mode = os.getenv("PLUGIN_EXECUTION_MODE", "inprocess").strip().lower() or "inprocess"
+    if mode not in EXECUTION_MODES:
+        raise ValueError(f"PLUGIN_EXECUTION_MODE desconocido: '{mode}' (usar {' o '.join(EXECUTION_MODES)})")
+    return mode
+
+
+class SandboxConfig:
+    """Límites y tamaño del pool de workers"""
+
+    def __init__(self, workers: int = 2, max_cases: int = 5000, memory_mb: int = 2048,
+                 cpu_seconds: int = 600, call_timeout: float = 300):
+        self.workers = workers
+        self.max_cases = max_cases
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.call_timeout = call_timeout
+
+    @classmethod
+    def from_env(cls) -> "SandboxConfig":
+        return cls(
+            workers=int(os.getenv("PLUGIN_SANDBOX_WORKERS", "2")),
+            max_cases=int(os.getenv("PLUGIN_SANDBOX_MAX_CASES", "5000")),
+            memory_mb=int(os.getenv("PLUGIN_SANDBOX_MEMORY_MB", "2048")),
+            cpu_seconds=int(os.getenv("PLUGIN_SANDBOX_CPU_SECONDS", "600")),
+            call_timeout=float(os.getenv("PLUGIN_SANDBOX_CALL_TIMEOUT", "300")),
+        )
+
+    def worker_args(self) -> List[str]:
+        """Argumentos del worker con sus límites (los aplica él mismo en main)"""
+        return ["--memory-mb", str(self.memory_mb), "--cpu-seconds", str(self.cpu_seconds)]
+
+    def apply_limits(self) -> None:
+        """Aplica los rlimits al proceso actual (el worker, al arrancar)"""
+        if resource is None:
+            return
+        if self.memory_mb > 0:
+            limit = self.memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        if self.cpu_seconds > 0:
+            resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds))
+
+
+# --- Protocolo: [largo uint32 big-endian][JSON] ---
+
+def write_frame(stream: BinaryIO, message: Dict[str, Any]) -> None:
+    payload = serialization.dumps_bytes(message)
+    stream.write(_HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+
+def _read_exact(stream: BinaryIO, size: int, deadline: Optional[float]) -> Optional[bytes]:
+    chunks = []
+    remaining = size
+    fd = stream.fileno()
+    while remaining:
+        if deadline is not None:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or not select.select([fd], [], [], timeout)[0]:
+                raise TimeoutError("el worker del sandbox no respondió a tiempo")
+        chunk = os.read(fd, remaining)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def read_frame(stream: BinaryIO, deadline: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Lee un mensaje; None si el otro extremo cerró el pipe"""
+    header = _read_exact(stream, _HEADER.size, deadline)
+    if header is None:
+        return None
+    payload = _read_exact(stream, _HEADER.unpack(header)[0], deadline)
+    if payload is None:
+        return None
+    return serialization.loads(payload)
+
+
+# --- Lado del worker (proceso hijo) ---
+
+class _PluginHost:
+    """Ejecuta las operaciones del protocolo sobre el plugin cargado"""
+
+    def __init__(self):
+        self.plugin: Optional[TestPlugin] = None
+        self.loop = asyncio.new_event_loop()
+        # Iterador de obtener_casos abierto (abrir_casos / siguientes_casos)
+        self.casos: Optional[Iterator[Case]] = None
+
+    def _close_casos(self) -> None:
+        casos, self.casos = self.casos, None
+        close = getattr(casos, "close", None)
+        if close is not None:
+            close()
+
+    def _run(self, result: Any) -> Any:
+        # Métodos async del plugin: se resuelven en el loop propio del worker
+        if inspect.isawaitable(result):
+            return self.loop.run_until_complete(result)
+        return result
+
+    def handle(self, message: Dict[str, Any]) -> Any:
+        op = message["op"]
+        if op == "load":
+            self.plugin = PluginFactory._load_plugin_from_code(message["code"], message["name"])
+            return None
+        if self.plugin is None:
+            raise RuntimeError("No hay plugin cargado en el worker")
+
+        config = message.get("config") or {}
+        if op == "setup":
+            # Instancia nueva por run, como en modo inprocess (el código ya está cargado)
+            self._close_casos()
+            self.plugin = type(self.plugin)()
+            return self._run(self.plugin.setup(config))
+        if op == "teardown":
+            self._close_casos()
+            return self._run(self.plugin.teardown())
+        if op == "abrir_casos":
+            self._close_casos()
+            self.casos = iter(self.plugin.obtener_casos(config))
+            return None
+        if op == "siguientes_casos":
+            if self.casos is None:
+                raise RuntimeError("siguientes_casos sin abrir_casos")
+            size = message.get("size") or CASES_CHUNK
+            chunk = [caso.model_dump() for caso in itertools.islice(self.casos, size)]
+            done = len(chunk) < size
+            if done:
+                self._close_casos()
+            return {"cases": chunk, "done": done}
+        if op == "primer_caso":
+            caso = first_case(self.plugin, config)
+            return caso.model_dump() if caso is not None else None
+        if op == "ejecutar":
+            return self._ejecutar([Case(**c) for c in message["cases"]], config)
+        if op == "comparar":
+            cmp = self._run(self.plugin.comparar_resultados(Case(**message["case"]), Pred(**message["pred"]), config))
+            return _compare_dict(cmp)
+        raise ValueError(f"Operación desconocida: '{op}'")
+
+    def _ejecutar(self, casos: List[Case], config: Dict[str, Any]) -> Dict[str, Any]:
+        if supports_batch(self.plugin) and len(casos) > 1:
+            preds = self._run(self.plugin.ejecutar_batch(casos, config))
+            if not isinstance(preds, list) or len(preds) != len(casos):
+                raise ValueError(f"ejecutar_batch devolvió {len(preds)} predicciones para {len(casos)} casos")
+        else:
+            preds = [self._run(self.plugin.ejecutar_test(caso, config)) for caso in casos]
+        for pred in preds:
+            if not isinstance(pred, Pred):
+                raise ValueError("ejecutar_test no retorna un objeto Pred válido")
+
+        if supports_vectorized_compare(self.plugin):
+            from app.core.vectorized import compare_vectorized
+
+            cmps = compare_vectorized(self.plugin, casos, preds, config)
+        else:
+            cmps = [self._run(self.plugin.comparar_resultados(c, p, config)) for c, p in zip(casos, preds)]
+        return {"preds": [pred.model_dump() for pred in preds], "compares": [_compare_dict(cmp) for cmp in cmps]}
+
+
+def _compare_dict(cmp: Any) -> Dict[str, Any]:
+    if isinstance(cmp, Compare):
+        return cmp.model_dump()
+    if hasattr(cmp, "to_dto"):  # CompareRecord
+        return cmp.to_dto().model_dump()
+    raise ValueError("comparar_resultados no retorna un objeto Compare válido")
+
+
+def serve(stdin: BinaryIO, stdout: BinaryIO) -> None:
+    """Loop del worker: un mensaje, una respuesta, hasta que se cierre stdin"""
+    host = _PluginHost()
+    while True:
+        message = read_frame(stdin)
+        if message is None or message.get("op") == "exit":
+            return
+        try:
+            reply = {"ok": True, "result": host.handle(message)}
+        except Exception as e:
+            reply = {"ok": False, "error": str(e), "load": message.get("op") == "load"}
+        write_frame(stdout, reply)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.core.sandbox")
+    parser.add_argument("--memory-mb", type=int, default=0)
+    parser.add_argument("--cpu-seconds", type=int, default=0)
+    args = parser.parse_args()
+    SandboxConfig(memory_mb=args.memory_mb, cpu_seconds=args.cpu_seconds).apply_limits()
+
+    # stdout queda reservado para el protocolo: los print del plugin van a stderr
+    channel = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    serve(sys.stdin.buffer, channel)
+
+
+# --- Lado de la API (proceso padre) ---
+
+class SandboxWorker:
+    """Un proceso worker con el código del plugin cargado"""
+
+    def __init__(self, name: str, code: str, config: SandboxConfig):
+        self.config = config
+        self.cases = 0
+        self._lock = threading.Lock()
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(_BACKEND_DIR), env.get("PYTHONPATH")]))
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "app.core.sandbox", *config.worker_args()],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=str(_BACKEND_DIR),
+            env=env,
+        )
+        try:
+            self.call("load", name=name, code=code)
+        except BaseException:
+            self.close()
+            raise
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def call(self, op: str, **payload: Any) -> Any:
+        timeout = self.config.call_timeout
+        deadline = time.monotonic() + timeout if timeout > 0 and os.name == "posix" else None
+        try:
+            # Un request a la vez por pipe (execute y compare pueden correr en threads distintos)
+            with self._lock:
+                write_frame(self.process.stdin, {"op": op, **payload})
+                reply = read_frame(self.process.stdout, deadline)
+        except TimeoutError as e:
+            self.close()
+            raise SandboxError(str(e))
+        except (BrokenPipeError, OSError):
+            reply = None
+        if reply is None:
+            # El worker cerró el pipe: esperar su exit code para el mensaje
+            self._reap()
+            self.close()
+            raise SandboxError(
+                f"El worker del sandbox terminó inesperadamente (exit code {self.process.returncode}); "
+                "puede haber superado los límites de memoria/CPU"
+            )
+        if not reply["ok"]:
+            # Los errores de carga mantienen el mensaje (PluginFactory los reconoce)
+            raise (ValueError if reply["load"] else RuntimeError)(reply["error"])
+        return reply["result"]
+
+    def close(self, wait: bool = False) -> None:
+        """Pide al worker que termine; la espera (y el kill si no sale) va en background"""
+        if self.alive:
+            try:
+                write_frame(self.process.stdin, {"op": "exit"})
+            except OSError:
+                pass
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        if wait:
+            self._reap()
+        else:
+            threading.Thread(target=self._reap, name="sandbox-reaper", daemon=True).start()
+
+    def _reap(self) -> None:
+        try:
+            self.process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class SandboxPool:
+    """Workers pre-cargados con el código de un plugin
+
+    Se mantienen hasta `workers` procesos ociosos con el código ya cargado:
+    cuando acquire() se lleva uno (o release() recicla uno que llegó a
+    `max_cases`), se lanza un reemplazo en background para que el próximo
+    acquire, o el reciclado en medio de un run, no espere el arranque.
+    """
+
+    def __init__(self, name: str, code: str, config: Optional[SandboxConfig] = None):
+        self.name = name
+        self.code = code
+        self.code_hash = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        self.config = config or SandboxConfig.from_env()
+        self._idle: List[SandboxWorker] = []
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._warming = False
+        self._closed = False
+
+    def warm(self, count: int = 1) -> None:
+        """Lanza workers hasta tener `count` ociosos (propaga errores de carga)"""
+        while True:
+            with self._lock:
+                if self._closed or len(self._idle) >= count:
+                    return
+            self._add_idle(SandboxWorker(self.name, self.code, self.config))
+
+    def acquire(self) -> SandboxWorker:
+        worker = None
+        with self._lock:
+            # Si ya hay uno arrancando en background se espera ese (no se lanza otro)
+            while not self._idle and self._warming and not self._closed:
+                self._ready.wait()
+            while self._idle and worker is None:
+                candidate = self._idle.pop()
+                if candidate.alive:
+                    worker = candidate
+                else:
+                    candidate.close()
+        self._schedule_prewarm()
+        return worker or SandboxWorker(self.name, self.code, self.config)
+
+    def release(self, worker: SandboxWorker) -> None:
+        if not worker.alive or worker.cases >= self.config.max_cases:
+            worker.close()
+            self._schedule_prewarm()
+            return
+        self._add_idle(worker)
+
+    def _add_idle(self, worker: SandboxWorker) -> None:
+        with self._lock:
+            if not self._closed and len(self._idle) < max(self.config.workers, 1):
+                self._idle.append(worker)
+                self._ready.notify()
+                return
+        worker.close()
+
+    def _schedule_prewarm(self) -> None:
+        with self._lock:
+            if self._warming or self._closed or len(self._idle) >= self.config.workers:
+                return
+            self._warming = True
+        threading.Thread(target=self._prewarm, name=f"sandbox-prewarm-{self.name}", daemon=True).start()
+
+    def _prewarm(self) -> None:
+        try:
+            self.warm(self.config.workers)
+        except Exception as e:
+            print(f"Error precalentando worker del sandbox '{self.name}': {str(e)}")
+        finally:
+            with self._lock:
+                self._warming = False
+                self._ready.notify_all()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._ready.notify_all()
+        for worker in idle:
+            worker.close(wait=True)
+
+
+class SandboxedPlugin(TestPlugin):
+    """Proxy de un plugin dinámico que corre en un worker del sandbox
+
+    Cada instancia toma un worker en setup y lo devuelve en teardown (con
+    RunConfig.workers > 1 cada thread tiene el suyo). Si el worker llega a
+    `max_cases` en medio de un run, se cambia por otro y se repite el setup.
+    """
+
+    pool: SandboxPool
+
+    def __init__(self):
+        self._worker: Optional[SandboxWorker] = None
+        self._config: Dict[str, Any] = {}
+        # Worker con el iterador de obtener_casos abierto (no se libera al reciclar)
+        self._streaming: Optional[SandboxWorker] = None
+        self._stream_lock = threading.Lock()
+        # Compares ya calculados en el worker junto con la ejecución del lote
+        self._compares: Dict[str, Any] = {}
+
+    def setup(self, config: Dict[str, Any]) -> None:
+        self._config = config
+        self._worker = self.pool.acquire()
+        self._worker.call("setup", config=config)
+
+    def teardown(self) -> None:
+        with self._stream_lock:
+            worker, self._worker = self._worker, None
+            # Un obtener_casos sin terminar ya no libera su worker: se libera acá
+            streaming, self._streaming = self._streaming, None
+        self._compares.clear()
+        try:
+            if worker is not None:
+                self._retire(worker)
+        finally:
+            if streaming is not None and streaming is not worker:
+                self._retire(streaming)
+
+    def _call(self, op: str, **payload: Any) -> Any:
+        if self._worker is None:
+            raise RuntimeError("SandboxedPlugin sin setup: no tiene worker asignado")
+        return self._worker.call(op, **payload)
+
+    def obtener_casos(self, config: Dict[str, Any]) -> Iterable[Case]:
+        """Casos en chunks, pedidos de a uno entre las llamadas de ejecución.
+
+        Si el worker se recicla mientras tanto, el viejo (que tiene el
+        iterador) sigue hasta terminar los casos y recién ahí se libera.
+        """
+        worker = self._worker
+        if worker is None:
+            raise RuntimeError("SandboxedPlugin sin setup: no tiene worker asignado")
+        with self._stream_lock:
+            self._streaming = worker
+        try:
+            worker.call("abrir_casos", config=config)
+            while True:
+                chunk = worker.call("siguientes_casos", size=CASES_CHUNK)
+                for caso in chunk["cases"]:
+                    yield Case(**caso)
+                if chunk["done"]:
+                    return
+        finally:
+            with self._stream_lock:
+                owned = self._streaming is worker
+                if owned:
+                    self._streaming = None
+                retired = owned and worker is not self._worker
+            if retired:
+                self._retire(worker)
+
+    def primer_caso(self, config: Dict[str, Any]) -> Optional[Case]:
+        """Sólo el primer caso (smoke test): el worker no recorre el resto"""
+        caso = self._call("primer_caso", config=config)
+        return Case(**caso) if caso is not None else None
+
+    def abort(self) -> None:
+        """Mata el worker actual: la llamada en curso termina con SandboxError (smoke test vencido)"""
+        worker = self._worker
+        if worker is not None and worker.alive:
+            worker.process.kill()
+
+    def ejecutar_test(self, caso: Case, config: Dict[str, Any]) -> Pred:
+        return self.ejecutar_batch([caso], config)[0]
+
+    def ejecutar_batch(self, casos: List[Case], config: Dict[str, Any]) -> List[Pred]:
+        result = self._call("ejecutar", cases=[caso.model_dump() for caso in casos], config=config)
+        preds = [Pred(**p) for p in result["preds"]]
+        for caso, pred, cmp in zip(casos, preds, result["compares"]):
+            self._compares[caso.id] = (pred, cmp)
+        self._worker.cases += len(casos)
+        if self._worker.cases >= self.pool.config.max_cases:
+            self._recycle()
+        return preds
+
+    def comparar_resultados(self, caso: Case, pred: Pred, config: Dict[str, Any]) -> Compare:
+        cached = self._compares.pop(caso.id, None)
+        if cached is not None and cached[0] is pred:
+            return Compare(**cached[1])
+        return Compare(**self._call("comparar", case=caso.model_dump(), pred=pred.model_dump(), config=config))
+
+    def _recycle(self) -> None:
+        """Cambia el worker por uno nuevo (libera memoria y el contador de CPU)"""
+        # El worker nuevo entra antes de soltar el viejo: la etapa de compare
+        # (otro thread) puede seguir usando el proxy mientras tanto
+        worker = self.pool.acquire()
+        worker.call("setup", config=self._config)
+        with self._stream_lock:
+            old, self._worker = self._worker, worker
+            # Si todavía entrega casos, lo libera obtener_casos al terminar
+            streaming = old is self._streaming
+        if not streaming:
+            self._retire(old)
+
+    def _retire(self, worker: SandboxWorker) -> None:
+        """teardown y devolución al pool de un worker que ya no usa el proxy"""
+        try:
+            if worker.alive:
+                worker.call("teardown")
+        finally:
+            self.pool.release(worker)
+
+
+_pools: Dict[str, SandboxPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name: str, code: str) -> SandboxPool:
+    """Pool del plugin; si el código cambió se reemplaza (los workers viejos se cierran).
+
+    Un pool nuevo arranca con un worker cargado: los errores de carga (sintaxis,
+    imports, clase faltante) se ven acá, igual que en modo inprocess.
+    """
+    code_hash = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    with _pools_lock:
+        old = _pools.get(name)
+        if old is not None and old.code_hash == code_hash:
+            return old
+        pool = _pools[name] = SandboxPool(name, code)
+    if old is not None:
+        old.close()
+
+    try:
+        pool.warm(1)
+    except Exception:
+        with _pools_lock:
+            if _pools.get(name) is pool:
+                del _pools[name]
+        pool.close()
+        raise
+    return pool
+
+
+def sandboxed_plugin(name: str, code: str) -> SandboxedPlugin:
+    """Instancia del proxy para un plugin dinámico"""
+    pool = get_pool(name, code)
+    plugin_class = type(f"Sandboxed_{name.replace('-', '_')}", (SandboxedPlugin,), {"pool": pool})
+    return plugin_class()
+
+
+def close_pool(name: str) -> None:
+    """Cierra los workers de un plugin (p.ej. al eliminarlo)"""
+    with _pools_lock:
+        pool = _pools.pop(name, None)
+    if pool is not None:
+        pool.close()
+
+
+def shutdown_pools() -> None:
+    """Cierra todos los workers (shutdown de la API)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Scheduler global de runs: cola con prioridad, fair share y límites de capacidad
+
+`POST /api/runs` ya no arranca el run en el momento: lo encola (status
+"queued") y el scheduler lo lanza cuando hay capacidad:
+- SCHEDULER_MAX_CONCURRENT_RUNS: runs ejecutándose a la vez en el server (default 4)
+- SCHEDULER_PLUGIN_LIMITS: límite por plugin, p. ej. "openai_assistant=1,demo=4"
+- SCHEDULER_DEFAULT_PLUGIN_LIMIT: límite para los plugins no listados (vacío = sólo el global)
+
+Orden de la cola: primero la prioridad del run (mayor primero); a igual
+prioridad, fair share entre dueños (`owner`, o el plugin si no se indica): el
+que tiene menos runs en ejecución y, entre esos, el que hace más que no lanza
+uno (round robin); después el más antiguo. Un run cuyo plugin está en su
+límite no bloquea a los que vienen detrás.
+
+La cola vive en memoria y es por proceso: al arrancar el server, los runs
+que quedaron "queued" de un proceso anterior se marcan como failed. Con varios
+procesos de API (p. ej. varios workers de uvicorn) cada uno aplicaría su
+propio límite "global" y al arrancar fallaría los runs en cola de los otros:
+el scheduler asume un único proceso de API.
+"""
+import itertools
+import os
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import update
+
+from app.models.db import Run
+from app.models.dto import RunConfig
+
+
+def parse_plugin_limits(value: str) -> Dict[str, int]:
+    """"a=1,b=2" -> {"a": 1, "b": 2}"""
+    limits = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, limit = item.partition("=")
+        if not sep or not limit.strip().isdigit() or int(limit) < 1:
+            raise ValueError(f"SCHEDULER_PLUGIN_LIMITS inválido: '{item}' (formato: plugin=N)")
+        limits[name.strip()] = int(limit)
+    return limits
+
+
+class SchedulerConfig:
+    """Capacidad global y por plugin"""
+
+    def __init__(self, max_concurrent_runs: int = 4, plugin_limits: Optional[Dict[str, int]] = None,
+                 default_plugin_limit: Optional[int] = None):
+        if max_concurrent_runs < 1:
+            raise ValueError("SCHEDULER_MAX_CONCURRENT_RUNS debe ser >= 1")
+        self.max_concurrent_runs = max_concurrent_runs
+        self.plugin_limits = plugin_limits or {}
+        self.default_plugin_limit = default_plugin_limit
+
+    @classmethod
+    def from_env(cls) -> "SchedulerConfig":
+        default_limit = os.getenv("SCHEDULER_DEFAULT_PLUGIN_LIMIT", "").strip()
+        return cls(
+            max_concurrent_runs=int(os.getenv("SCHEDULER_MAX_CONCURRENT_RUNS", "").strip() or 4),
+            plugin_limits=parse_plugin_limits(os.getenv("SCHEDULER_PLUGIN_LIMITS", "")),
+            default_plugin_limit=int(default_limit) if default_limit else None,
+        )
+
+    def plugin_limit(self, plugin_name: str) -> Optional[int]:
+        return self.plugin_limits.get(plugin_name, self.default_plugin_limit)
+
+
+class ScheduledRun:
+    """Entrada de la cola (o run en ejecución)"""
+
+    __slots__ = ("run_id", "config", "seq")
+
+    def __init__(self, run_id: str, config: RunConfig, seq: int):
+        self.run_id = run_id
+        self.config = config
+        self.seq = seq
+
+    @property
+    def plugin_name(self) -> str:
+        return self.config.plugin_name
+
+    @property
+    def owner(self) -> str:
+        return self.config.owner or self.config.plugin_name
+
+
+class RunScheduler:
+    """Cola de runs y despacho a threads según la capacidad disponible.
+
+    `execute(run_id, config)` corre el run completo (abre su sesión de DB y
+    marca el run como failed si algo falla); el scheduler sólo decide cuándo.
+    """
+
+    def __init__(self, execute: Callable[[str, RunConfig], None], config: Optional[SchedulerConfig] = None):
+        self.execute = execute
+        self.config = config or SchedulerConfig.from_env()
+        self._queue: List[ScheduledRun] = []
+        self._running: Dict[str, ScheduledRun] = {}
+        self._seq = itertools.count()
+        # Orden del último lanzamiento de cada dueño (round robin del fair share)
+        self._last_started: Dict[str, int] = {}
+        self._dispatches = itertools.count()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def submit(self, run_id: str, config: RunConfig) -> Optional[int]:
+        """Encola un run y despacha; devuelve su posición en la cola (None si ya arrancó)"""
+        with self._lock:
+            self._queue.append(ScheduledRun(run_id, config, next(self._seq)))
+            self._dispatch()
+            return self._positions().get(run_id)
+
+    def discard(self, run_id: str) -> bool:
+        """Saca un run de la cola si todavía no arrancó"""
+        with self._lock:
+            for i, entry in enumerate(self._queue):
+                if entry.run_id == run_id:
+                    del self._queue[i]
+                    return True
+            return False
+
+    def position(self, run_id: str) -> Optional[int]:
+        with self._lock:
+            return self._positions().get(run_id)
+
+    def snapshot(self) -> Dict[str, List[Dict[str, object]]]:
+        """Runs en ejecución y en cola (en orden de despacho)"""
+        with self._lock:
+            running = [self._describe(entry) for entry in sorted(self._running.values(), key=lambda e: e.seq)]
+            queued = [
+                dict(self._describe(entry), queue_position=i)
+                for i, entry in enumerate(self._ordered(), start=1)
+            ]
+        return {"running": running, "queued": queued}
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que no queden runs en cola ni en ejecución (tests / shutdown)"""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._queue and not self._running, timeout)
+
+    @staticmethod
+    def _describe(entry: ScheduledRun) -> Dict[str, object]:
+        return {
+            "run_id": entry.run_id,
+            "plugin_name": entry.plugin_name,
+            "owner": entry.owner,
+            "priority": entry.config.priority,
+        }
+
+    def _ordered(self) -> List[ScheduledRun]:
+        running_by_owner = Counter(entry.owner for entry in self._running.values())
+        return sorted(self._queue, key=lambda e: (
+            -e.config.priority, running_by_owner[e.owner], self._last_started.get(e.owner, -1), e.seq,
+        ))
+
+    def _positions(self) -> Dict[str, int]:
+        return {entry.run_id: i for i, entry in enumerate(self._ordered(), start=1)}
+
+    def _has_capacity(self, entry: ScheduledRun, running_by_plugin: Counter) -> bool:
+        limit = self.config.plugin_limit(entry.plugin_name)
+        return limit is None or running_by_plugin[entry.plugin_name] < limit
+
+    def _dispatch(self) -> None:
+        """Lanza runs mientras haya capacidad. Se llama con el lock tomado."""
+        while self._queue and len(self._running) < self.config.max_concurrent_runs:
+            running_by_plugin = Counter(entry.plugin_name for entry in self._running.values())
+            # El orden depende de lo que está corriendo (fair share): se recalcula en cada lanzamiento
+            entry = next((e for e in self._ordered() if self._has_capacity(e, running_by_plugin)), None)
+            if entry is None:
+                return
+            self._queue.remove(entry)
+            self._running[entry.run_id] = entry
+            self._last_started[entry.owner] = next(self._dispatches)
+            threading.Thread(target=self._run, args=(entry,), name=f"run-{entry.run_id}", daemon=True).start()
+
+    def _run(self, entry: ScheduledRun) -> None:
+        try:
+            self.execute(entry.run_id, entry.config)
+        except Exception as e:
+            print(f"Error en el scheduler para run {entry.run_id}: {str(e)}")
+        finally:
+            with self._lock:
+                self._running.pop(entry.run_id, None)
+                self._dispatch()
+                self._idle.notify_all()
+
+
+ORPHANED_QUEUE_REASON = "La cola del scheduler se perdió al reiniciar el server antes de que el run arrancara"
+
+
+def fail_orphaned_queued_runs(db) -> int:
+    """Runs "queued" de un proceso anterior: la cola en memoria se perdió"""
+    result = db.execute(
+        update(Run).where(Run.status == "queued")
+        .values(status="failed", stop_reason=ORPHANED_QUEUE_REASON, completed_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
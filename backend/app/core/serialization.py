@@ -0,0 +1,103 @@
+"""Serialización JSON rápida (orjson si está instalado, json de la stdlib si no)
+
+Se usa en dos lugares:
+- El engine de SQLAlchemy (`json_serializer`/`json_deserializer`) para las
+  columnas JSON de run_details (case_data, pred_meta, compare_detail) y runs.
+- `FastJSONResponse` en los endpoints de listado y detalles de la API.
+
+Configuración por variables de entorno:
+- JSON_SERIALIZER: "orjson", "json" o "" (default: orjson si está disponible)
+
+El hash de case_data (dedup en `cases`) no pasa por acá: sigue usando el JSON
+canónico de la stdlib para que los hashes existentes no cambien.
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+# Claves no-str (p.ej. ints en pred_meta) como en la stdlib, y además arrays
+# de numpy (comunes en plugins vectorizados)
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson is not None else 0
+
+
+def available_backends() -> List[str]:
+    return ["json", "orjson"] if orjson is not None else ["json"]
+
+
+def resolve_backend(name: Optional[str] = None) -> str:
+    """Backend a usar: el pedido (o JSON_SERIALIZER) si está disponible"""
+    name = (name if name is not None else os.getenv("JSON_SERIALIZER", "")).strip().lower()
+    if name == "json":
+        return "json"
+    if name in ("", "orjson"):
+        return "orjson" if orjson is not None else "json"
+    raise ValueError(f"JSON_SERIALIZER desconocido: '{name}' (usar 'orjson' o 'json')")
+
+
+class JSONSerializer:
+    """dumps/loads con el backend elegido"""
+
+    def __init__(self, backend: Optional[str] = None):
+        self.backend = resolve_backend(backend)
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        if self.backend == "orjson":
+            return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def dumps(self, obj: Any) -> str:
+        """Serializa a str (lo que esperan los drivers de SQLAlchemy)"""
+        if self.backend == "orjson":
+            return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode("utf-8")
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+    def loads(self, data: Any) -> Any:
+        if self.backend == "orjson":
+            return orjson.loads(data)
+        if isinstance(data, memoryview):
+            # json de la stdlib no acepta memoryview (p. ej. un slice de un mmap)
+            data = bytes(data)
+        return json.loads(data)
+
+    def engine_options(self) -> Dict[str, Any]:
+        """kwargs para create_engine"""
+        return {"json_serializer": self.dumps, "json_deserializer": self.loads}
+
+
+serializer = JSONSerializer()
+
+
+def dumps(obj: Any) -> str:
+    return serializer.dumps(obj)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    return serializer.dumps_bytes(obj)
+
+
+def loads(data: Any) -> Any:
+    return serializer.loads(data)
+
+
+def engine_options() -> Dict[str, Any]:
+    return serializer.engine_options()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse que renderiza con el serializer configurado
+
+    Con la stdlib se comporta igual que JSONResponse (NaN no permitido). orjson
+    serializa NaN/Infinity como null.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if serializer.backend == "orjson":
+            return orjson.dumps(content, option=_ORJSON_OPTIONS)
+        return super().render(content)
@@ -0,0 +1,255 @@
+"""Backends livianos de resultados para correr sin server ni PostgreSQL (CLI)
+
+El runner sólo usa una parte del ResultStore: create_run, update_run_progress,
+save_details (vía detail_writer), compute_metrics, close_run y fail_run. Acá
+están las alternativas para jobs de CI, que se eligen con una spec:
+
+- "memory": no guarda detalles; sólo los conteos para métricas y matriz de
+  confusión (resumen del run y nada más)
+- "jsonl:PATH": como memory, y además cada detalle es una línea JSON en
+  PATH (gzip si termina en .gz); la última línea es el resumen del run
+- "sqlite:PATH": el ResultStore de siempre sobre un archivo SQLite (se puede
+  abrir después con las mismas consultas que la API)
+
+Los runs son objetos `Run` del modelo ORM que no se agregan a ninguna sesión:
+tienen los mismos atributos que los de la base.
+"""
+import gzip
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Optional, Tuple, Union
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import serialization
+from app.core.store import DetailWriter, ResultStore, confusion_matrix_from_pairs, metrics_from_counts
+from app.models.db import Base, Run
+from app.models.dto import Metrics
+
+STORE_KINDS = ("memory", "jsonl", "sqlite")
+
+
+class _Counts:
+    """Conteos de un run con los mismos criterios que ResultStore.compute_metrics"""
+
+    __slots__ = ("total", "covered", "errors", "evaluados", "matches", "pairs")
+
+    def __init__(self):
+        self.total = self.covered = self.errors = self.evaluados = self.matches = 0
+        self.pairs: Counter = Counter()
+
+    def add(self, pred, cmp) -> None:
+        has_value = pred.value is not None
+        self.total += 1
+        self.covered += bool(pred.ok and has_value)
+        self.errors += pred.ok is False
+        if has_value:
+            self.evaluados += 1
+            self.matches += bool(cmp.match)
+            if cmp.truth is not None:
+                self.pairs[(cmp.truth, pred.value)] += 1
+
+    def metrics(self) -> Metrics:
+        if not self.total:
+            return Metrics(accuracy=0.0, coverage=0.0, error_rate=0.0)
+        confusion_matrix = confusion_matrix_from_pairs(
+            (truth, pred_value, count) for (truth, pred_value), count in self.pairs.items()
+        )
+        return metrics_from_counts(self.total, self.covered, self.errors, self.evaluados, self.matches,
+                                   confusion_matrix)
+
+
+class MemoryResultStore:
+    """Runs y métricas en memoria, sin detalles"""
+
+    def __init__(self):
+        self.runs: Dict[str, Run] = {}
+        self._counts: Dict[str, _Counts] = {}
+        self._lock = threading.Lock()
+
+    def create_run(self, plugin_name: str, config: Dict[str, Any], status: str = "running") -> str:
+        run_id = str(uuid.uuid4())
+        self.runs[run_id] = Run(
+            run_id=run_id, plugin_name=plugin_name, status=status, config=config,
+            created_at=datetime.utcnow(), total_cases=None, processed_cases=0, spool_offset=0,
+        )
+        self._counts[run_id] = _Counts()
+        return run_id
+
+    def start_run(self, run_id: str) -> bool:
+        run = self.runs.get(run_id)
+        if run is None or run.status != "queued":
+            return False
+        run.status = "running"
+        return True
+
+    def get_run(self, run_id: str) -> Optional[Run]:
+        return self.runs.get(run_id)
+
+    def update_run_progress(self, run_id: str, total_cases: Optional[int] = None,
+                            processed_cases: Optional[int] = None) -> None:
+        run = self.runs.get(run_id)
+        if run:
+            if total_cases is not None:
+                run.total_cases = total_cases
+            if processed_cases is not None:
+                run.processed_cases = processed_cases
+
+    def save_details(self, run_id: str, results: Iterable[Tuple[Any, Any, Any]],
+                     spool_offset: Optional[int] = None) -> int:
+        saved = 0
+        with self._lock:
+            counts = self._counts[run_id]
+            for caso, pred, cmp in results:
+                counts.add(pred, cmp)
+                self._write_detail(run_id, caso, pred, cmp)
+                saved += 1
+            self.runs[run_id].processed_cases += saved
+        return saved
+
+    def _write_detail(self, run_id: str, caso, pred, cmp) -> None:
+        """Los backends que guardan detalles los escriben acá"""
+
+    def detail_writer(self, run_id: str, flush_size: int = 500, flush_interval: float = 1.0) -> DetailWriter:
+        return DetailWriter(self, run_id, flush_size, flush_interval)
+
+    def compute_metrics(self, run_id: str) -> Metrics:
+        with self._lock:
+            return self._counts[run_id].metrics()
+
+    def close_run(self, run_id: str, metrics: Optional[Metrics] = None,
+                  pipeline_metrics: Optional[Dict[str, Any]] = None, status: str = "completed",
+                  stop_reason: Optional[str] = None, circuit_breaker: Optional[Dict[str, Any]] = None,
+                  sampling: Optional[Dict[str, Any]] = None) -> None:
+        run = self.runs.get(run_id)
+        if run:
+            metrics = metrics or self.compute_metrics(run_id)
+            run.status = status
+            run.completed_at = datetime.utcnow()
+            run.accuracy = metrics.accuracy
+            run.coverage = metrics.coverage
+            run.error_rate = metrics.error_rate
+            run.confusion_matrix = metrics.confusion_matrix
+            run.pipeline_metrics = pipeline_metrics
+            run.stop_reason = stop_reason
+            run.circuit_breaker = circuit_breaker
+            run.sampling = sampling
+            self._run_closed(run)
+
+    def fail_run(self, run_id: str, pipeline_metrics: Optional[Dict[str, Any]] = None,
+                 circuit_breaker: Optional[Dict[str, Any]] = None, sampling: Optional[Dict[str, Any]] = None) -> None:
+        run = self.runs.get(run_id)
+        if run:
+            run.status = "failed"
+            run.completed_at = datetime.utcnow()
+            run.pipeline_metrics = pipeline_metrics
+            run.circuit_breaker = circuit_breaker
+            run.sampling = sampling
+            self._run_closed(run)
+
+    def _run_closed(self, run: Run) -> None:
+        """Los backends que guardan el resumen lo escriben acá"""
+
+    def rollback(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class JsonlResultStore(MemoryResultStore):
+    """Como MemoryResultStore, y además los detalles y el resumen en un archivo JSONL (gzip si termina en .gz)"""
+
+    def __init__(self, path: Union[str, Path]):
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file: BinaryIO = gzip.open(self.path, "wb") if self.path.suffix == ".gz" else open(self.path, "wb")
+
+    def _write_line(self, record: Dict[str, Any]) -> None:
+        self._file.write(serialization.dumps_bytes(record) + b"\n")
+
+    def _write_detail(self, run_id: str, caso, pred, cmp) -> None:
+        # Mismos nombres que las columnas de run_details
+        self._write_line({
+            "type": "detail",
+            "run_id": run_id,
+            "case_id": caso.id,
+            "case_data": caso.data,
+            "truth": cmp.truth,
+            "pred_value": pred.value,
+            "pred_ok": pred.ok,
+            "pred_status": pred.status,
+            "pred_raw": pred.raw,
+            "pred_meta": pred.meta,
+            "match": cmp.match,
+            "mismatch_reason": cmp.reason if not cmp.match else None,
+            "compare_detail": cmp.detail,
+        })
+
+    def _run_closed(self, run: Run) -> None:
+        with self._lock:
+            self._write_line(dict(run_summary(run), type="run"))
+            self._file.flush()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+class SqliteResultStore(ResultStore):
+    """El ResultStore de siempre sobre un archivo SQLite (crea las tablas si no existen)"""
+
+    def __init__(self, path: Union[str, Path]):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.engine = create_engine(
+            f"sqlite:///{path}",
+            connect_args={"check_same_thread": False},
+            **serialization.engine_options(),
+        )
+        Base.metadata.create_all(bind=self.engine)
+        super().__init__(sessionmaker(autocommit=False, autoflush=False, bind=self.engine)())
+
+    def close(self) -> None:
+        self.db.close()
+        self.engine.dispose()
+
+
+def open_result_store(spec: str) -> Union[MemoryResultStore, SqliteResultStore]:
+    """"memory", "jsonl:PATH" o "sqlite:PATH" -> store para MassTestRunner"""
+    kind, _, path = spec.partition(":")
+    kind = kind.strip().lower()
+    if kind not in STORE_KINDS:
+        raise ValueError(f"Store inválido: '{spec}' (opciones: memory, jsonl:PATH, sqlite:PATH)")
+    if kind == "memory":
+        return MemoryResultStore()
+    if not path:
+        raise ValueError(f"El store '{kind}' necesita un archivo ({kind}:PATH)")
+    if kind == "jsonl":
+        return JsonlResultStore(path)
+    return SqliteResultStore(path)
+
+
+def run_summary(run: Run) -> Dict[str, Any]:
+    """Resumen serializable de un run (salida de la CLI y última línea del JSONL)"""
+    return {
+        "run_id": run.run_id,
+        "plugin_name": run.plugin_name,
+        "status": run.status,
+        "created_at": run.created_at.isoformat() if run.created_at else None,
+        "completed_at": run.completed_at.isoformat() if run.completed_at else None,
+        "total_cases": run.total_cases,
+        "processed_cases": run.processed_cases,
+        "accuracy": run.accuracy,
+        "coverage": run.coverage,
+        "error_rate": run.error_rate,
+        "confusion_matrix": run.confusion_matrix,
+        "stop_reason": run.stop_reason,
+        "circuit_breaker": run.circuit_breaker,
+        "sampling": run.sampling,
+        "pipeline_metrics": run.pipeline_metrics,
+    }
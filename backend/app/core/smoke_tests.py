@@ -0,0 +1,79 @@
+"""Smoke tests de plugins en background
+
+Crear o actualizar un plugin con `background_test=true` (o
+`POST /api/plugins/{name}/test?background=true`) no espera el smoke test: se
+lanza en un thread con su propia sesión de DB y el resultado se consulta con
+`GET /api/plugins/{name}/test/{job_id}`. El resultado es el mismo que el del
+smoke test sincrónico (PluginFactory.smoke_test), incluido el estado del
+plugin en la base.
+
+Un job corriendo sólo se reutiliza si es para el mismo código: después de un
+update se lanza uno nuevo, y el viejo no pisa el estado del plugin (ver
+PluginFactory.smoke_test).
+
+Los jobs viven en memoria (se pierden al reiniciar): se guardan los últimos
+`max_jobs` terminados.
+"""
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.plugin import PluginFactory
+from app.models.dto import SmokeTestJob, SmokeTestResult
+
+
+class SmokeTestJobs:
+    """Registro de smoke tests en background"""
+
+    def __init__(self, session_factory: Callable[[], Session], max_jobs: int = 200):
+        self.session_factory = session_factory
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, SmokeTestJob]" = OrderedDict()
+        self._code_hashes: dict = {}
+        self._lock = threading.Lock()
+
+    def submit(self, plugin_name: str, code: Optional[str] = None) -> SmokeTestJob:
+        """Lanza el smoke test; si ya hay uno corriendo para el plugin y el mismo código devuelve ése"""
+        code_hash = hashlib.sha256((code or "").encode("utf-8")).hexdigest()
+        with self._lock:
+            for job in self._jobs.values():
+                if (job.plugin_name == plugin_name and job.status == "running"
+                        and self._code_hashes.get(job.job_id) == code_hash):
+                    return job
+            job = SmokeTestJob(
+                job_id=str(uuid.uuid4()), plugin_name=plugin_name, status="running", created_at=datetime.utcnow()
+            )
+            self._jobs[job.job_id] = job
+            self._code_hashes[job.job_id] = code_hash
+            self._trim()
+        threading.Thread(target=self._run, args=(job,), name=f"smoke-test-job-{plugin_name}", daemon=True).start()
+        return job
+
+    def get(self, job_id: str) -> Optional[SmokeTestJob]:
+        return self._jobs.get(job_id)
+
+    def _run(self, job: SmokeTestJob) -> None:
+        db = self.session_factory()
+        try:
+            result = PluginFactory.smoke_test(job.plugin_name, db)
+        except Exception as e:
+            print(f"Error en smoke test de '{job.plugin_name}': {str(e)}")
+            result = SmokeTestResult(success=False, message=str(e))
+        finally:
+            db.close()
+        with self._lock:
+            job.result = result
+            job.completed_at = datetime.utcnow()
+            job.status = "completed"
+
+    def _trim(self) -> None:
+        # Los más viejos primero; los que siguen corriendo no se descartan
+        finished = [job_id for job_id, job in self._jobs.items() if job.status != "running"]
+        for job_id in finished[:max(len(self._jobs) - self.max_jobs, 0)]:
+            del self._jobs[job_id]
+            self._code_hashes.pop(job_id, None)
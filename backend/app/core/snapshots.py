@@ -0,0 +1,337 @@
+"""Snapshots locales de obtener_casos (cache de datasets entre runs)
+
+Muchos plugins arman sus casos desde FTP, SharePoint o una base remota en cada
+run, y eso suele tardar más que los tests. Con SNAPSHOT_DIR configurado, la
+primera vez el runner materializa lo que devuelve `obtener_casos` en un
+archivo local comprimido e indexado, con clave plugin + hash de la config del
+plugin. Los runs siguientes leen los casos del snapshot en streaming sin
+llamar a `obtener_casos`.
+
+Formato del archivo:
+- magic `CSNAP1\\n`
+- bloques de hasta `block_size` casos, cada uno comprimido por separado
+  (zstd o gzip, como el almacenamiento frío) con el JSON de [[id, data], ...]
+- índice JSON: cantidad de casos y (offset, largo, casos) de cada bloque
+- footer `>Q` con el offset del índice
+
+El índice permite saber el total sin descomprimir nada y leer el caso i-ésimo
+descomprimiendo un solo bloque. Los archivos se escriben en un temporal y se
+renombran al final: un snapshot a medio escribir nunca se lee.
+
+Cada materializado es una generación nueva (`<plugin>-<hash>.<generación>.snap`)
+y nunca se reemplaza un archivo existente: un run puede estar leyéndolo (en
+Windows un archivo abierto no se puede reemplazar ni borrar). Las generaciones
+viejas se borran cuando se puede; las que siguen abiertas quedan para la
+próxima pasada de evict.
+
+Vencimiento y tamaño:
+- SNAPSHOT_TTL_SECONDS: edad máxima (desde que se materializó) antes de volver
+  a llamar a `obtener_casos` (default 86400)
+- SNAPSHOT_MAX_MB: tamaño total del directorio; al pasarlo se eliminan los
+  vencidos y después los usados hace más tiempo (default 2048)
+- SNAPSHOT_BLOCK_SIZE: casos por bloque (default 1000)
+
+`RunConfig.refresh_snapshot` fuerza a volver a materializar (p. ej. si
+cambió el origen de los datos o el código del plugin).
+"""
+import bisect
+import glob
+import hashlib
+import json
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from app.core import serialization
+from app.core.blobstore import compress, decompress, default_codec
+from app.models.dto import Case
+
+SNAPSHOT_SUFFIX = ".snap"
+MAGIC = b"CSNAP1\n"
+
+_FOOTER = struct.Struct(">Q")
+# <plugin>-<hash de config>.<generación>.snap
+_GENERATION = re.compile(r"^(?P<stem>.+)\.(?P<generation>\d{20})" + re.escape(SNAPSHOT_SUFFIX) + "$")
+
+# Un solo materializado a la vez por clave (los demás runs esperan y lo reusan).
+# Locks fijos repartidos por hash de la clave: no crecen con cada plugin + config
+_KEY_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name, "").strip()
+    return float(value) if value else default
+
+
+def config_hash(config: Dict[str, Any]) -> str:
+    """Hash estable de la config del plugin (JSON canónico)"""
+    canonical = json.dumps(config, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SnapshotConfig:
+    """Directorio, vencimiento y límite de tamaño de los snapshots"""
+
+    def __init__(self, directory: str = "", ttl_seconds: float = 86400.0, max_bytes: int = 2048 * 1024 * 1024,
+                 block_size: int = 1000, codec: Optional[str] = None):
+        if block_size < 1:
+            raise ValueError("SNAPSHOT_BLOCK_SIZE debe ser >= 1")
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self.codec = codec or default_codec()
+
+    @classmethod
+    def from_env(cls) -> "SnapshotConfig":
+        return cls(
+            directory=os.getenv("SNAPSHOT_DIR", "").strip(),
+            ttl_seconds=_env_float("SNAPSHOT_TTL_SECONDS", 86400.0),
+            max_bytes=int(_env_float("SNAPSHOT_MAX_MB", 2048) * 1024 * 1024),
+            block_size=int(_env_float("SNAPSHOT_BLOCK_SIZE", 1000)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+
+class SnapshotReader:
+    """Lee un snapshot: iteración en streaming (bloque a bloque) y acceso por índice.
+
+    El archivo queda abierto desde que se crea el reader: si otro run lo
+    reemplaza o lo elimina mientras tanto, éste sigue leyendo su versión.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        # Sin os.pread (Windows) las lecturas son seek + read bajo este lock
+        self._read_lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            size = os.fstat(self._fd).st_size
+            if self._read(len(MAGIC), 0) != MAGIC or size < len(MAGIC) + _FOOTER.size:
+                raise ValueError(f"Snapshot inválido: {path}")
+            (index_offset,) = _FOOTER.unpack(self._read(_FOOTER.size, size - _FOOTER.size))
+            index = serialization.loads(self._read(size - _FOOTER.size - index_offset, index_offset))
+        except BaseException:
+            self.close()
+            raise
+        self.count: int = index["count"]
+        self.created_at: float = index["created_at"]
+        self._blocks: List[List[int]] = index["blocks"]
+        # Primer caso de cada bloque (para ubicar el bloque del caso i)
+        self._starts: List[int] = []
+        start = 0
+        for _, _, count in self._blocks:
+            self._starts.append(start)
+            start += count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[Case]:
+        for block in range(len(self._blocks)):
+            yield from self._read_block(block)
+
+    def case(self, i: int) -> Case:
+        """El caso i-ésimo (descomprime sólo su bloque)"""
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        block = bisect.bisect_right(self._starts, i) - 1
+        return self._read_block(block)[i - self._starts[block]]
+
+    def _read(self, length: int, offset: int) -> bytes:
+        if hasattr(os, "pread"):
+            return os.pread(self._fd, length, offset)
+        with self._read_lock:
+            os.lseek(self._fd, offset, os.SEEK_SET)
+            chunks = []
+            while length > 0:
+                chunk = os.read(self._fd, length)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                length -= len(chunk)
+            return b"".join(chunks)
+
+    def _read_block(self, block: int) -> List[Case]:
+        offset, length, _ = self._blocks[block]
+        records = serialization.loads(decompress(self._read(length, offset)))
+        # Los casos se validaron al materializar: sin validación de pydantic
+        return [Case.model_construct(id=case_id, data=data) for case_id, data in records]
+
+    def close(self) -> None:
+        if getattr(self, "_fd", None) is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "SnapshotReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        self.close()
+
+
+def write_snapshot(path: Path, casos: Iterable[Case], block_size: int = 1000,
+                   codec: Optional[str] = None) -> None:
+    """Materializa `casos` en `path` (escribe en un temporal y renombra al final)"""
+    codec = codec or default_codec()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            blocks: List[List[int]] = []
+            count = 0
+            block: List[List[Any]] = []
+
+            def flush() -> None:
+                payload = compress(serialization.dumps_bytes(block), codec)
+                blocks.append([f.tell(), len(payload), len(block)])
+                f.write(payload)
+                block.clear()
+
+            for caso in casos:
+                block.append([caso.id, caso.data])
+                count += 1
+                if len(block) >= block_size:
+                    flush()
+            if block:
+                flush()
+            index_offset = f.tell()
+            f.write(serialization.dumps_bytes({"count": count, "created_at": time.time(), "blocks": blocks}))
+            f.write(_FOOTER.pack(index_offset))
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class SnapshotCache:
+    """Snapshots de obtener_casos por plugin + config, con TTL y eviction por tamaño"""
+
+    def __init__(self, config: Optional[SnapshotConfig] = None):
+        self.config = config or SnapshotConfig.from_env()
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.enabled
+
+    def _stem(self, plugin_name: str, plugin_config: Dict[str, Any]) -> str:
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", plugin_name)
+        return f"{safe_name}-{config_hash(plugin_config)[:32]}"
+
+    def _generations(self, stem: str) -> List[Path]:
+        """Archivos del snapshot, de la generación más vieja a la más nueva"""
+        paths = []
+        for path in Path(self.config.directory).glob(f"{glob.escape(stem)}.*{SNAPSHOT_SUFFIX}"):
+            match = _GENERATION.match(path.name)
+            if match and match["stem"] == stem:
+                paths.append(path)
+        return sorted(paths, key=lambda path: path.name)
+
+    def path(self, plugin_name: str, plugin_config: Dict[str, Any]) -> Path:
+        """Archivo vigente del snapshot (la última generación, o la primera si todavía no hay)"""
+        stem = self._stem(plugin_name, plugin_config)
+        generations = self._generations(stem)
+        return generations[-1] if generations else Path(self.config.directory) / f"{stem}.{0:020d}{SNAPSHOT_SUFFIX}"
+
+    def cases(self, plugin_name: str, plugin_config: Dict[str, Any],
+              source: Callable[[], Iterable[Case]], refresh: bool = False) -> SnapshotReader:
+        """Reader del snapshot vigente; si no hay (o `refresh`) lo materializa con `source()`"""
+        stem = self._stem(plugin_name, plugin_config)
+        requested = time.time()
+        with _key_lock(stem):
+            current = self.path(plugin_name, plugin_config)
+            reader = self._open_fresh(current, newer_than=requested if refresh else None)
+            if reader is not None:
+                return reader
+            # Generación nueva: el archivo vigente puede estar abierto por otro run
+            generation = max(time.time_ns(), int(_GENERATION.match(current.name)["generation"]) + 1)
+            path = current.with_name(f"{stem}.{generation:020d}{SNAPSHOT_SUFFIX}")
+            write_snapshot(path, source(), self.config.block_size, self.config.codec)
+            reader = SnapshotReader(path)
+            for old in self._generations(stem)[:-1]:
+                _unlink(old)
+        self.evict(keep=path)
+        return reader
+
+    def _open_fresh(self, path: Path, newer_than: Optional[float] = None) -> Optional[SnapshotReader]:
+        try:
+            reader = SnapshotReader(path)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            print(f"Error al leer snapshot, se vuelve a materializar: {str(e)}")
+            return None
+        age = time.time() - reader.created_at
+        # Con refresh sólo sirve uno materializado después del pedido (otro run que esperaba lo mismo)
+        if age > self.config.ttl_seconds or (newer_than is not None and reader.created_at < newer_than):
+            reader.close()
+            return None
+        # atime = último uso (para el LRU); mtime queda como está
+        try:
+            os.utime(path, (time.time(), path.stat().st_mtime))
+        except OSError:
+            pass
+        return reader
+
+    def evict(self, keep: Optional[Path] = None) -> int:
+        """Elimina snapshots vencidos y, si el directorio pasa max_bytes, los menos usados"""
+        directory = Path(self.config.directory)
+        if not directory.is_dir():
+            return 0
+        now = time.time()
+        entries = []
+        removed = 0
+        paths = sorted(directory.glob(f"*{SNAPSHOT_SUFFIX}"), key=lambda path: path.name)
+        latest = {}
+        for path in paths:
+            match = _GENERATION.match(path.name)
+            latest[match["stem"] if match else path.name] = path
+        for path in paths:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            match = _GENERATION.match(path.name)
+            superseded = latest[match["stem"] if match else path.name] != path
+            if path != keep and (superseded or now - stat.st_mtime > self.config.ttl_seconds):
+                removed += _unlink(path)
+                continue
+            entries.append((stat.st_atime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.config.max_bytes:
+                break
+            if path == keep:
+                continue
+            removed += _unlink(path)
+            total -= size
+        return removed
+
+
+def _key_lock(key: str) -> threading.Lock:
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    return _KEY_LOCKS[int.from_bytes(digest[:4], "big") % len(_KEY_LOCKS)]
+
+
+def _unlink(path: Path) -> int:
+    # PermissionError en Windows si otro run lo tiene abierto: se reintenta en el próximo evict
+    try:
+        path.unlink()
+        return 1
+    except OSError:
+        return 0
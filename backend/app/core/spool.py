@@ -0,0 +1,468 @@
+"""Spool local (write-ahead) de resultados entre la ejecución y la base
+
+Con SPOOL_DIR configurado, el runner no escribe los detalles directo en
+run_details: los agrega a un archivo append-only por run y un thread drainer
+los vuelca a la base en lotes. Si PostgreSQL está lento o se cae un rato, la
+ejecución sigue (los resultados ya pagados quedan en disco) y el drainer
+reintenta hasta poder escribir.
+
+Formato: registros con prefijo de largo (`>I`) y payload JSON:
+- ["d", case_id, case_data, pred..., compare...]: un detalle
+- ["t", total]: total de casos del run
+- ["e", cierre]: el run terminó bien; `cierre` es el estado final y los datos
+  de close_run (status, stop_reason, circuit breaker, muestreo), así el replay
+  lo cierra igual que el runner (cancelado, abortado por el breaker, ...)
+
+El offset ya volcado se guarda en runs.spool_offset en la misma transacción
+que los detalles, así un replay después de un reinicio no duplica filas (el
+offset nunca pasa el registro de fin: un replay siempre lo vuelve a leer). El
+writer tiene un lock exclusivo sobre su archivo mientras el run está vivo
+(flock, o msvcrt.locking en Windows): el drainer del server (SpoolDrainer)
+sólo toma archivos huérfanos, p. ej. de un proceso que murió, y los termina
+de volcar. Si no hay forma de tomar el lock, el drainer no toma spools de
+otros procesos (sólo vuelca los que encuentra al arrancar el server).
+
+Variables de entorno:
+- SPOOL_DIR: directorio de los archivos (vacío = deshabilitado)
+- SPOOL_FSYNC: "always" (cada detalle), "batch" (cada flush, default) o "never"
+- SPOOL_FLUSH_SIZE: detalles por flush del writer (default 500)
+- SPOOL_DRAIN_BATCH: registros por INSERT del drainer (default 1000)
+- SPOOL_DRAIN_INTERVAL_SECONDS: espera entre reintentos del drainer (default 0.5)
+- SPOOL_DRAIN_TIMEOUT_SECONDS: cuánto espera el run a que se vacíe su spool (default 60)
+- SPOOL_REPLAY_INTERVAL_SECONDS: cada cuánto se buscan spools huérfanos (default 30)
+"""
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - sin flock (Windows)
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core import serialization
+from app.core.store import ResultStore
+from app.models.dto import Case, Pred
+from app.models.records import CompareRecord
+
+FSYNC_POLICIES = ("always", "batch", "never")
+SPOOL_SUFFIX = ".spool"
+
+_HEADER = struct.Struct(">I")
+_DETAIL, _TOTAL, _END = "d", "t", "e"
+# Datos de cierre que acepta el registro de fin (kwargs de ResultStore.close_run)
+_END_FIELDS = ("status", "stop_reason", "pipeline_metrics", "circuit_breaker", "sampling")
+
+
+class SpoolPending(Exception):
+    """El run terminó pero su spool no se volcó a tiempo (lo termina el drainer)"""
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name, "").strip()
+    return float(value) if value else default
+
+
+class SpoolConfig:
+    """Directorio, política de fsync y tiempos del drainer"""
+
+    def __init__(self, directory: str = "", fsync: str = "batch", flush_size: int = 500,
+                 drain_batch: int = 1000, drain_interval: float = 0.5, drain_timeout: float = 60.0,
+                 replay_interval: float = 30.0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"SPOOL_FSYNC inválido: {fsync} (opciones: {', '.join(FSYNC_POLICIES)})")
+        self.directory = directory
+        self.fsync = fsync
+        self.flush_size = flush_size
+        self.drain_batch = drain_batch
+        self.drain_interval = drain_interval
+        self.drain_timeout = drain_timeout
+        self.replay_interval = replay_interval
+
+    @classmethod
+    def from_env(cls) -> "SpoolConfig":
+        return cls(
+            directory=os.getenv("SPOOL_DIR", "").strip(),
+            fsync=os.getenv("SPOOL_FSYNC", "").strip().lower() or "batch",
+            flush_size=int(_env_float("SPOOL_FLUSH_SIZE", 500)),
+            drain_batch=int(_env_float("SPOOL_DRAIN_BATCH", 1000)),
+            drain_interval=_env_float("SPOOL_DRAIN_INTERVAL_SECONDS", 0.5),
+            drain_timeout=_env_float("SPOOL_DRAIN_TIMEOUT_SECONDS", 60.0),
+            replay_interval=_env_float("SPOOL_REPLAY_INTERVAL_SECONDS", 30.0),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def path(self, run_id: str) -> Path:
+        return Path(self.directory) / f"{run_id}{SPOOL_SUFFIX}"
+
+    def pending_run_ids(self) -> List[str]:
+        """Runs con un spool todavía sin volcar"""
+        directory = Path(self.directory)
+        if not self.enabled or not directory.is_dir():
+            return []
+        return [path.name[:-len(SPOOL_SUFFIX)] for path in directory.glob(f"*{SPOOL_SUFFIX}")]
+
+
+def encode_record(record: List[Any]) -> bytes:
+    payload = serialization.dumps_bytes(record)
+    return _HEADER.pack(len(payload)) + payload
+
+
+def read_records(path: Path, offset: int, limit: int) -> List[Tuple[int, List[Any]]]:
+    """Hasta `limit` registros desde `offset`, cada uno con el offset donde termina.
+
+    Un registro incompleto al final (se está escribiendo, o el proceso murió a
+    mitad de un write) se ignora.
+    """
+    records = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while len(records) < limit:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                break
+            (length,) = _HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                break
+            offset += _HEADER.size + length
+            records.append((offset, serialization.loads(payload)))
+    return records
+
+
+def _ends_at(path: Path, offset: int) -> bool:
+    """Si el registro que termina en `offset` es el de fin"""
+    end = encode_record([_END])
+    if offset < len(end):
+        return False
+    with open(path, "rb") as f:
+        f.seek(offset - len(end))
+        return f.read(len(end)) == end
+
+
+def _detail_record(caso, pred, cmp) -> List[Any]:
+    return [
+        _DETAIL, caso.id, caso.data,
+        pred.ok, pred.value, pred.status, pred.raw, pred.meta,
+        cmp.match, cmp.truth, cmp.pred, cmp.reason, cmp.detail,
+    ]
+
+
+def _detail_from_record(record: List[Any]) -> Tuple[Case, Pred, CompareRecord]:
+    (_, case_id, data, ok, value, status, raw, meta, match, truth, pred_value, reason, detail) = record
+    # Los valores ya se validaron al ejecutar: sin validación de pydantic
+    caso = Case.model_construct(id=case_id, data=data)
+    pred = Pred.model_construct(ok=ok, value=value, status=status, raw=raw, meta=meta)
+    return caso, pred, CompareRecord(match, truth, pred_value, reason, detail)
+
+
+class DrainResult:
+    """Hasta dónde se volcó un spool y el cierre del registro de fin (si se llegó)"""
+
+    __slots__ = ("offset", "size", "end")
+
+    def __init__(self, offset: int, size: int, end: Optional[Dict[str, Any]]):
+        self.offset = offset
+        self.size = size
+        self.end = end
+
+    @property
+    def ended(self) -> bool:
+        return self.end is not None
+
+    @property
+    def complete(self) -> bool:
+        return self.ended or self.offset >= self.size
+
+
+def drain(store: ResultStore, run_id: str, path: Path, batch: int = 1000) -> DrainResult:
+    """Vuelca a la base todo lo que haya en el spool desde runs.spool_offset.
+
+    Cada lote de detalles se guarda junto con el nuevo offset (una transacción).
+    Si la base falla, la excepción sube y el offset queda donde estaba.
+    """
+    run = store.get_run(run_id)
+    if run is None:
+        # El run se eliminó: no hay dónde volcar
+        size = path.stat().st_size
+        return DrainResult(size, size, {})
+    offset = run.spool_offset or 0
+    end = None
+    while end is None:
+        records = read_records(path, offset, batch)
+        if not records:
+            break
+        details = []
+        for end_offset, record in records:
+            kind = record[0]
+            if kind == _DETAIL:
+                details.append(_detail_from_record(record))
+            elif details:
+                # Los detalles anteriores van primero (el offset avanza en orden)
+                store.save_details(run_id, details, spool_offset=offset)
+                details = []
+            if kind == _END:
+                # El offset queda antes del fin: un replay lo vuelve a leer
+                end = record[1] if len(record) > 1 else {}
+                break
+            if kind == _TOTAL:
+                store.advance_spool(run_id, end_offset, total_cases=record[1])
+            offset = end_offset
+        if details:
+            store.save_details(run_id, details, spool_offset=offset)
+    if end is None and _ends_at(path, offset):
+        # Spool de una versión anterior, con el offset ya pasado el fin
+        end = {}
+    return DrainResult(offset, path.stat().st_size, end)
+
+
+# Si hay forma de tomar un lock exclusivo sobre un spool (si no, el replay no
+# distingue los spools de runs vivos y no toma los de otros procesos)
+CAN_LOCK = fcntl is not None or msvcrt is not None
+_MSVCRT_LOCK_OFFSET = 1 << 62
+
+
+def _lock(fd: int, blocking: bool = True) -> bool:
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            return True
+        except BlockingIOError:
+            return False
+    if msvcrt is not None:
+        # Los locks de Windows son obligatorios: se bloquea un byte muy lejos del
+        # fin (marca de dueño) para no impedir la lectura de los registros
+        os.lseek(fd, _MSVCRT_LOCK_OFFSET, os.SEEK_SET)
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.05)
+    return True
+
+
+class SpoolWriter:
+    """Reemplazo de DetailWriter que escribe al spool y vuelca en background.
+
+    Mismo uso que DetailWriter (add / set_total / with). El drainer usa su
+    propia sesión de DB: mientras el writer está abierto, el thread del run no
+    debe usar la suya. Al salir espera hasta `drain_timeout` a que el spool se
+    vacíe y borra el archivo; si la base sigue sin responder, lanza
+    SpoolPending y el archivo queda para el SpoolDrainer del server.
+    """
+
+    def __init__(self, store: ResultStore, run_id: str, config: SpoolConfig,
+                 flush_interval: float = 1.0, outcome: Optional[Callable[[], Dict[str, Any]]] = None):
+        self.store = store
+        self.run_id = run_id
+        self.config = config
+        self.flush_interval = flush_interval
+        # Cierre del run (kwargs de close_run) para el registro de fin
+        self.outcome = outcome
+        self.path = config.path(run_id)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "ab")
+        _lock(self._file.fileno())
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._wakeup = threading.Event()
+        self._closing = threading.Event()
+        # Si el run deja de esperar, el drainer cierra el archivo (y suelta el flock) al salir
+        self._state_lock = threading.Lock()
+        self._finished = False
+        self._abandoned = False
+        self.result: Optional[DrainResult] = None
+        self.error: Optional[BaseException] = None
+        self._drainer = threading.Thread(target=self._drain_loop, name=f"spool-drainer-{run_id}", daemon=True)
+        self._drainer.start()
+
+    def _append(self, record: List[Any]) -> None:
+        self._file.write(encode_record(record))
+        if self.config.fsync == "always":
+            self._sync()
+
+    def _sync(self) -> None:
+        self._file.flush()
+        if self.config.fsync != "never":
+            os.fsync(self._file.fileno())
+
+    def add(self, caso, pred, cmp) -> None:
+        self._append(_detail_record(caso, pred, cmp))
+        self._pending += 1
+        if self._pending >= self.config.flush_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def set_total(self, total: int) -> None:
+        self._append([_TOTAL, total])
+        self.flush()
+
+    def flush(self) -> None:
+        self._sync()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._wakeup.set()
+
+    def _drain_loop(self) -> None:
+        db = sessionmaker(bind=self.store.db.get_bind(), autocommit=False, autoflush=False)()
+        store = ResultStore(db)
+        try:
+            while not self._abandoned:
+                closing = self._closing.is_set()
+                try:
+                    self.result = drain(store, self.run_id, self.path, self.config.drain_batch)
+                    self.error = None
+                    if closing and self.result.complete:
+                        return
+                except Exception as e:
+                    db.rollback()
+                    if self.error is None:
+                        print(f"Spool del run {self.run_id}: la base no responde, se reintenta ({str(e)})")
+                    self.error = e
+                    if closing:
+                        # Al cerrar se reintenta con pausa (no busy-loop si la base sigue caída)
+                        time.sleep(self.config.drain_interval)
+                        continue
+                self._wakeup.wait(self.config.drain_interval)
+                self._wakeup.clear()
+        finally:
+            db.close()
+            with self._state_lock:
+                self._finished = True
+                if self._abandoned:
+                    self._file.close()
+
+    def __enter__(self) -> "SpoolWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                self._append([_END, self.outcome() if self.outcome else {}])
+            self.flush()
+        finally:
+            self._closing.set()
+            self._wakeup.set()
+            self._drainer.join(self.config.drain_timeout)
+            with self._state_lock:
+                drained = self._finished
+                self._abandoned = not drained
+            if drained:
+                self.path.unlink()
+                self._file.close()
+            # Si no, el archivo se cierra cuando el drainer termina su intento actual:
+            # recién ahí se suelta el flock y el spool queda para el SpoolDrainer
+        if not drained and exc_type is None:
+            raise SpoolPending(
+                f"El spool del run {self.run_id} no se pudo volcar en {self.config.drain_timeout}s "
+                f"({str(self.error)}); se completa en background"
+            )
+
+
+class SpoolDrainer:
+    """Thread del server que vuelca spools huérfanos (replay después de un reinicio).
+
+    Un spool con registro de fin cierra el run con sus métricas y el cierre
+    que guardó el runner; uno sin fin (el proceso murió durante el run) se
+    vuelca y el run queda como failed.
+
+    Sin lock de archivos disponible, sólo el primer replay (al arrancar el
+    server, cuando no hay runs vivos de este proceso) toma spools: los
+    periódicos podrían volcar el de un run que todavía escribe y duplicar filas.
+    """
+
+    def __init__(self, session_factory, config: SpoolConfig):
+        self.session_factory = session_factory
+        self.config = config
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._replayed_once = False
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="spool-replay", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                replayed = self.replay()
+                if replayed:
+                    print(f"Spool: {len(replayed)} runs recuperados")
+            except Exception as e:
+                print(f"Error en replay del spool: {str(e)}")
+            self._stop.wait(self.config.replay_interval)
+
+    def replay(self) -> Dict[str, str]:
+        """Vuelca los spools sin dueño; devuelve {run_id: estado final}"""
+        directory = Path(self.config.directory)
+        if not directory.is_dir():
+            return {}
+        if not CAN_LOCK:
+            if self._replayed_once:
+                return {}
+            self._replayed_once = True
+            print("Spool: sin lock de archivos; sólo se recuperan los spools encontrados al arrancar")
+        replayed = {}
+        for run_id in sorted(self.config.pending_run_ids()):
+            status = self._replay_file(self.config.path(run_id))
+            if status is not None:
+                replayed[run_id] = status
+        return replayed
+
+    def _replay_file(self, path: Path) -> Optional[str]:
+        run_id = path.name[:-len(SPOOL_SUFFIX)]
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            if not _lock(f.fileno(), blocking=False):
+                return None  # un writer vivo lo está usando
+            db = self.session_factory()
+            try:
+                store = ResultStore(db)
+                result = drain(store, run_id, path, self.config.drain_batch)
+                status = self._finish_run(store, run_id, result.end)
+            except Exception as e:
+                db.rollback()
+                print(f"Error volcando el spool del run {run_id}: {str(e)}")
+                return None
+            finally:
+                db.close()
+            path.unlink()
+            return status
+
+    @staticmethod
+    def _finish_run(store: ResultStore, run_id: str, end: Optional[Dict[str, Any]]) -> Optional[str]:
+        run = store.get_run(run_id)
+        if run is None:
+            return None
+        if run.status == "running":
+            if end is not None:
+                store.close_run(run_id, **{key: end[key] for key in _END_FIELDS if key in end})
+            else:
+                store.fail_run(run_id)
+        return run.status
@@ -1,26 +1,85 @@
 """ResultStore: implementación SQL para persistencia"""
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import Optional, List, Dict, Any
-from app.models.db import Run, RunDetail
-from app.models.dto import Metrics
-from datetime import datetime
+from sqlalchemy.orm import Session, aliased, joinedload
+from sqlalchemy import and_, case, delete, exists, func, insert, select, update
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+from app.models.db import Run, RunDetail, CasePayload
+from app.models.dto import Metrics, RunComparison, FlippedCase
+from app.db.upsert import insert_or_touch
+from app.core import blobstore
+from datetime import datetime, timedelta
+import hashlib
+import json
+import os
+import time
 import uuid
 
+# Payloads de casos sin referencias más nuevos que esto no se eliminan
+CASES_GC_GRACE_PERIOD = timedelta(hours=1)
+
+# Columnas opcionales de run_details: todas las filas de un INSERT multi-fila
+# tienen que traer las mismas claves
+_OPTIONAL_DETAIL_COLUMNS = ("case_hash", "case_data_ref", "pred_raw_ref")
+
+
+def metrics_from_counts(total: int, covered: int, errors: int, evaluados: int, matches: int,
+                        confusion_matrix: Optional[Dict[str, Any]] = None) -> Metrics:
+    """Métricas a partir de los conteos (los calcula SQL o un store en memoria)"""
+    if not total:
+        return Metrics(accuracy=0.0, coverage=0.0, error_rate=0.0)
+    return Metrics(
+        accuracy=matches / evaluados if evaluados else 0.0,
+        coverage=covered / total,
+        error_rate=errors / total,
+        confusion_matrix=confusion_matrix
+    )
+
+
+def confusion_matrix_from_pairs(pairs: Iterable[Tuple[Optional[str], Optional[str], int]]) -> Optional[Dict[str, Any]]:
+    """Matriz de confusión a partir de (truth, pred_value, cantidad) de los casos evaluados"""
+    pairs = list(pairs)
+    if not pairs:
+        return None
+    
+    # Construir matriz de confusión
+    labels = set()
+    for truth, pred_value, _ in pairs:
+        if truth:
+            labels.add(truth)
+        if pred_value:
+            labels.add(pred_value)
+    
+    labels = sorted(list(labels))
+    matrix = {label: {label2: 0 for label2 in labels} for label in labels}
+    
+    for truth, pred_value, count in pairs:
+        truth_label = truth or "unknown"
+        pred_label = pred_value or "unknown"
+        if truth_label in matrix and pred_label in matrix[truth_label]:
+            matrix[truth_label][pred_label] += count
+    
+    return {
+        "labels": labels,
+        "matrix": matrix
+    }
+
 
 class ResultStore:
     """Implementación de ResultStore usando SQLAlchemy"""
     
     def __init__(self, db: Session):
         self.db = db
+        self.cold_config = blobstore.ColdStorageConfig.from_env()
+        self.blobs = blobstore.get_blob_store(db, self.cold_config)
+        # case_data deduplicado en la tabla `cases` (CASE_DEDUP=0 para guardarlo inline)
+        self.case_dedup = os.getenv("CASE_DEDUP", "1") == "1"
     
-    def create_run(self, plugin_name: str, config: Dict[str, Any]) -> str:
-        """Crea un nuevo run y devuelve su ID"""
+    def create_run(self, plugin_name: str, config: Dict[str, Any], status: str = "running") -> str:
+        """Crea un nuevo run y devuelve su ID ("queued" si lo lanza el scheduler)"""
         run_id = str(uuid.uuid4())
         run = Run(
             run_id=run_id,
             plugin_name=plugin_name,
-            status="running",
+            status=status,
             config=config,
             created_at=datetime.utcnow(),
             processed_cases=0
@@ -29,6 +88,41 @@ class ResultStore:
         self.db.commit()
         return run_id
     
+    def cancel_queued_run(self, run_id: str, stop_reason: str) -> bool:
+        """Cancela un run que todavía no arrancó; False si ya arrancó o terminó"""
+        result = self.db.execute(
+            update(Run)
+            .where(Run.run_id == run_id, Run.status == "queued")
+            .values(status="cancelled", stop_reason=stop_reason, completed_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount == 1
+    
+    def fail_running_runs(self, exclude: Iterable[str], stop_reason: str) -> int:
+        """Marca como failed los runs "running" (salvo `exclude`); devuelve cuántos"""
+        query = update(Run).where(Run.status == "running")
+        exclude = list(exclude)
+        if exclude:
+            query = query.where(Run.run_id.notin_(exclude))
+        result = self.db.execute(
+            query.values(status="failed", stop_reason=stop_reason, completed_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount
+    
+    def start_run(self, run_id: str) -> bool:
+        """Pasa un run de "queued" a "running"; False si ya no está en cola"""
+        result = self.db.execute(
+            update(Run)
+            .where(Run.run_id == run_id, Run.status == "queued")
+            .values(status="running")
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount == 1
+    
     def update_run_progress(self, run_id: str, total_cases: Optional[int] = None, processed_cases: Optional[int] = None) -> None:
         """Actualiza el progreso de un run"""
         run = self.db.query(Run).filter(Run.run_id == run_id).first()
@@ -39,108 +133,314 @@ class ResultStore:
                 run.processed_cases = processed_cases
             self.db.commit()
     
+    def _detail_values(self, run_id: str, caso, pred, cmp,
+                       cold: List[Tuple[Dict[str, Any], str, bytes]]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """Arma los valores de una fila de run_details.
+
+        Los payloads que van a almacenamiento frío se agregan a `cold` como
+        (valores, columna de la referencia, datos) y se guardan por lote.
+        
+        Returns:
+            (valores del detalle, fila para `cases` o None si case_data no se deduplica)
+        """
+        values = {
+            "run_id": run_id,
+            "case_id": caso.id,
+            "case_data": caso.data,
+            "truth": cmp.truth,
+            "pred_value": pred.value,
+            "pred_ok": pred.ok,
+            "pred_status": pred.status,
+            "pred_raw": pred.raw,
+            "pred_meta": pred.meta,
+            "match": cmp.match,
+            "mismatch_reason": cmp.reason if not cmp.match else None,
+            "compare_detail": cmp.detail,
+        }
+        case_row = None
+        min_bytes = self.cold_config.min_bytes
+        
+        if self.case_dedup or (self.blobs is not None and self.cold_config.case_data):
+            data = json.dumps(caso.data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+            if self.case_dedup:
+                case_hash = hashlib.sha256(data).hexdigest()
+                values["case_data"] = None
+                values["case_hash"] = case_hash
+                case_row = {"case_hash": case_hash, "data": caso.data}
+            elif len(data) >= min_bytes:
+                values["case_data"] = None
+                cold.append((values, "case_data_ref", data))
+        
+        if self.blobs is not None and pred.raw is not None:
+            raw = pred.raw.encode("utf-8")
+            if len(raw) >= min_bytes:
+                values["pred_raw"] = None
+                cold.append((values, "pred_raw_ref", raw))
+        
+        return values, case_row
+    
+    def _save_case_payloads(self, case_rows: List[Dict[str, Any]]) -> None:
+        """Inserta los payloads de casos que todavía no existen. No hace commit."""
+        insert_or_touch(
+            self.db, CasePayload, case_rows, key="case_hash",
+            touch_column="last_used_at", touch_after=CASES_GC_GRACE_PERIOD / 2,
+        )
+    
     def save_detail(self, run_id: str, caso, pred, cmp) -> None:
         """Guarda un detalle de caso y actualiza el progreso"""
-        detail = RunDetail(
-            run_id=run_id,
-            case_id=caso.id,
-            case_data=caso.data,
-            truth=cmp.truth,
-            pred_value=pred.value,
-            pred_ok=pred.ok,
-            pred_status=pred.status,
-            pred_raw=pred.raw,
-            pred_meta=pred.meta,
-            match=cmp.match,
-            mismatch_reason=cmp.reason if not cmp.match else None,
-            compare_detail=cmp.detail
+        self.save_details(run_id, [(caso, pred, cmp)])
+    
+    def save_details(self, run_id: str, results: Iterable[Tuple[Any, Any, Any]],
+                     spool_offset: Optional[int] = None) -> int:
+        """Guarda un lote de (caso, pred, cmp) con un solo INSERT y un commit.
+        
+        Acepta DTOs de pydantic o registros livianos con los mismos atributos.
+        Los detalles van por un INSERT de Core (sin objetos ORM por fila) y el
+        progreso se incrementa en la misma transacción (sin COUNT(*) por caso).
+        `spool_offset` (ver app.core.spool) se guarda en esa misma transacción.
+        Devuelve la cantidad de detalles guardados.
+        """
+        rows = []
+        case_rows = []
+        cold = []
+        for caso, pred, cmp in results:
+            values, case_row = self._detail_values(run_id, caso, pred, cmp, cold)
+            for column in _OPTIONAL_DETAIL_COLUMNS:
+                values.setdefault(column, None)
+            rows.append(values)
+            if case_row is not None:
+                case_rows.append(case_row)
+        if not rows:
+            return 0
+        
+        if cold:
+            refs = self.blobs.put_many([data for _, _, data in cold])
+            for (values, column, _), ref in zip(cold, refs):
+                values[column] = ref
+        self._save_case_payloads(case_rows)
+        self.db.execute(insert(RunDetail), rows)
+        progress = {"processed_cases": Run.processed_cases + len(rows)}
+        if spool_offset is not None:
+            progress["spool_offset"] = spool_offset
+        self.db.execute(
+            update(Run)
+            .where(Run.run_id == run_id)
+            .values(**progress)
+            .execution_options(synchronize_session=False)
         )
-        self.db.add(detail)
         self.db.commit()
-        
-        # Actualizar progreso: contar casos procesados después del commit
-        run = self.db.query(Run).filter(Run.run_id == run_id).first()
-        if run:
-            run.processed_cases = self.db.query(RunDetail).filter(RunDetail.run_id == run_id).count()
-            self.db.commit()
+        return len(rows)
+    
+    def advance_spool(self, run_id: str, spool_offset: int, total_cases: Optional[int] = None) -> None:
+        """Registra hasta dónde se volcó el spool de un run (y el total, si vino en él)"""
+        values: Dict[str, Any] = {"spool_offset": spool_offset}
+        if total_cases is not None:
+            values["total_cases"] = total_cases
+        self.db.execute(
+            update(Run).where(Run.run_id == run_id).values(**values).execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+    
+    def detail_writer(self, run_id: str, flush_size: int = 500, flush_interval: float = 1.0) -> "DetailWriter":
+        """Writer con buffer para el loop del runner (ver DetailWriter)"""
+        return DetailWriter(self, run_id, flush_size, flush_interval)
     
     def compute_metrics(self, run_id: str) -> Metrics:
-        """Calcula métricas para un run"""
-        details = self.db.query(RunDetail).filter(RunDetail.run_id == run_id).all()
+        """Calcula métricas para un run (agregados en SQL, sin cargar los detalles)"""
+        has_value = RunDetail.pred_value.isnot(None)
+        totals = self.db.execute(
+            select(
+                func.count(),
+                # Coverage: pred.ok && pred.value != null / total
+                func.sum(case((and_(RunDetail.pred_ok.is_(True), has_value), 1), else_=0)),
+                # Error rate: pred.ok == False / total
+                func.sum(case((RunDetail.pred_ok.is_(False), 1), else_=0)),
+                # Accuracy: matches / evaluados (solo donde pred.value exista)
+                func.sum(case((has_value, 1), else_=0)),
+                func.sum(case((and_(has_value, RunDetail.match.is_(True)), 1), else_=0)),
+            ).where(RunDetail.run_id == run_id)
+        ).one()
+        total, covered, errors, evaluados, matches = (value or 0 for value in totals)
         
-        if not details:
+        if not total:
             return Metrics(accuracy=0.0, coverage=0.0, error_rate=0.0)
         
-        total = len(details)
-        
-        # Coverage: pred.ok && pred.value != null / total
-        covered = sum(1 for d in details if d.pred_ok and d.pred_value is not None)
-        coverage = covered / total if total > 0 else 0.0
-        
-        # Error rate: pred.ok == False / total
-        errors = sum(1 for d in details if not d.pred_ok)
-        error_rate = errors / total if total > 0 else 0.0
-        
-        # Accuracy: matches / evaluados (solo donde pred.value exista)
-        evaluados = [d for d in details if d.pred_value is not None]
-        if evaluados:
-            matches = sum(1 for d in evaluados if d.match)
-            accuracy = matches / len(evaluados)
-        else:
-            accuracy = 0.0
-        
         # Confusion matrix (si hay labels binarias o multiclass)
-        confusion_matrix = self._compute_confusion_matrix(details)
+        confusion_matrix = self._compute_confusion_matrix(run_id)
         
-        return Metrics(
-            accuracy=accuracy,
-            coverage=coverage,
-            error_rate=error_rate,
-            confusion_matrix=confusion_matrix
-        )
+        return metrics_from_counts(total, covered, errors, evaluados, matches, confusion_matrix)
     
-    def _compute_confusion_matrix(self, details: List[RunDetail]) -> Optional[Dict[str, Any]]:
-        """Calcula matriz de confusión para casos evaluados"""
-        evaluados = [d for d in details if d.pred_value is not None and d.truth is not None]
-        
-        if not evaluados:
-            return None
-        
-        # Construir matriz de confusión
-        labels = set()
-        for d in evaluados:
-            if d.truth:
-                labels.add(d.truth)
-            if d.pred_value:
-                labels.add(d.pred_value)
-        
-        labels = sorted(list(labels))
-        matrix = {label: {label2: 0 for label2 in labels} for label in labels}
-        
-        for d in evaluados:
-            truth_label = d.truth or "unknown"
-            pred_label = d.pred_value or "unknown"
-            if truth_label in matrix and pred_label in matrix[truth_label]:
-                matrix[truth_label][pred_label] += 1
-        
-        return {
-            "labels": labels,
-            "matrix": matrix
-        }
+    def _compute_confusion_matrix(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Calcula matriz de confusión para casos evaluados (un GROUP BY por truth/pred)"""
+        pairs = self.db.execute(
+            select(RunDetail.truth, RunDetail.pred_value, func.count())
+            .where(
+                RunDetail.run_id == run_id,
+                RunDetail.pred_value.isnot(None),
+                RunDetail.truth.isnot(None),
+            )
+            .group_by(RunDetail.truth, RunDetail.pred_value)
+        ).all()
+        return confusion_matrix_from_pairs(pairs)
     
-    def close_run(self, run_id: str) -> None:
-        """Marca un run como completado"""
+    def close_run(self, run_id: str, metrics: Optional[Metrics] = None,
+                  pipeline_metrics: Optional[Dict[str, Any]] = None, status: str = "completed",
+                  stop_reason: Optional[str] = None, circuit_breaker: Optional[Dict[str, Any]] = None,
+                  sampling: Optional[Dict[str, Any]] = None) -> None:
+        """Cierra un run con sus métricas (se recalculan si no se pasan).
+        
+        `status` es "completed", o "cancelled"/"failed" si se detuvo antes (con `stop_reason`;
+        también en un "completed" que cortó el modo muestreo).
+        """
         run = self.db.query(Run).filter(Run.run_id == run_id).first()
         if run:
-            metrics = self.compute_metrics(run_id)
-            run.status = "completed"
+            metrics = metrics or self.compute_metrics(run_id)
+            run.status = status
             run.completed_at = datetime.utcnow()
             run.accuracy = metrics.accuracy
             run.coverage = metrics.coverage
             run.error_rate = metrics.error_rate
             run.confusion_matrix = metrics.confusion_matrix
+            if pipeline_metrics is not None:
+                run.pipeline_metrics = pipeline_metrics
+            if stop_reason is not None:
+                run.stop_reason = stop_reason
+            if circuit_breaker is not None:
+                run.circuit_breaker = circuit_breaker
+            if sampling is not None:
+                run.sampling = sampling
+            self.db.commit()
+    
+    def fail_run(self, run_id: str, pipeline_metrics: Optional[Dict[str, Any]] = None,
+                 circuit_breaker: Optional[Dict[str, Any]] = None, sampling: Optional[Dict[str, Any]] = None) -> None:
+        """Marca un run como failed (con lo que se sepa de la ejecución para diagnosticar)"""
+        self.db.rollback()
+        run = self.get_run(run_id)
+        if run:
+            run.status = "failed"
+            if pipeline_metrics is not None:
+                run.pipeline_metrics = pipeline_metrics
+            if circuit_breaker is not None:
+                run.circuit_breaker = circuit_breaker
+            if sampling is not None:
+                run.sampling = sampling
             self.db.commit()
     
+    def rollback(self) -> None:
+        """Descarta lo que no se llegó a guardar (p. ej. un lote que falló)"""
+        self.db.rollback()
+    
+    def compare_runs(self, base_run_id: str, head_run_id: str, kind: Optional[str] = None,
+                     limit: int = 100, offset: int = 0) -> RunComparison:
+        """Compara dos runs haciendo join de sus detalles por case_id en SQL.
+        
+        kind filtra la lista de casos: "regressions", "fixes" o None (ambos).
+        """
+        base = aliased(RunDetail, name="base")
+        head = aliased(RunDetail, name="head")
+        # Una fila por case_id en cada run (la primera): si un case_id se repite
+        # el join multiplicaría filas y los conteos no cerrarían
+        joined = and_(
+            base.run_id == base_run_id, head.run_id == head_run_id, head.case_id == base.case_id,
+            base.id.in_(self._first_detail_ids(base_run_id)),
+            head.id.in_(self._first_detail_ids(head_run_id)),
+        )
+        
+        regression = and_(base.match == True, head.match == False)
+        fix = and_(base.match == False, head.match == True)
+        
+        # Una sola pasada agregada sobre el join: los grupos son pocos
+        # (labels^2 x combinaciones de match), el resto se combina en Python
+        groups = self.db.execute(
+            select(
+                base.truth, base.pred_value, base.match,
+                head.truth, head.pred_value, head.match,
+                func.count(),
+            )
+            .select_from(base).join(head, joined)
+            .group_by(
+                base.truth, base.pred_value, base.match,
+                head.truth, head.pred_value, head.match,
+            )
+        ).all()
+        
+        common = regressions = fixes = 0
+        cells: Dict[tuple, int] = {}
+        for b_truth, b_pred, b_match, h_truth, h_pred, h_match, count in groups:
+            common += count
+            if b_match and not h_match:
+                regressions += count
+            elif h_match and not b_match:
+                fixes += count
+            # Matriz de confusión de cada run sobre los casos comunes: head - base
+            for truth, pred, sign in ((b_truth, b_pred, -1), (h_truth, h_pred, 1)):
+                if truth is not None and pred is not None:
+                    cells[(truth, pred)] = cells.get((truth, pred), 0) + sign * count
+        
+        base_total = self._distinct_case_count(base_run_id)
+        head_total = self._distinct_case_count(head_run_id)
+        
+        confusion_delta = None
+        if cells:
+            labels = sorted({label for key in cells for label in key})
+            matrix = {t: {p: cells.get((t, p), 0) for p in labels} for t in labels}
+            confusion_delta = {"labels": labels, "matrix": matrix}
+        
+        # Casos que cambiaron de resultado (paginados)
+        if kind == "regressions":
+            flipped_filter = regression
+        elif kind == "fixes":
+            flipped_filter = fix
+        else:
+            flipped_filter = base.match != head.match
+        
+        flipped_total = regressions if kind == "regressions" else fixes if kind == "fixes" else regressions + fixes
+        flipped_rows = self.db.execute(
+            select(base.case_id, head.truth, base.pred_value, head.pred_value, base.match, head.match)
+            .select_from(base).join(head, joined)
+            .where(flipped_filter)
+            .order_by(base.id)
+            .limit(limit)
+            .offset(offset)
+        ).all()
+        
+        return RunComparison(
+            base_run_id=base_run_id,
+            head_run_id=head_run_id,
+            common_cases=common,
+            only_in_base=base_total - common,
+            only_in_head=head_total - common,
+            regressions=regressions,
+            fixes=fixes,
+            confusion_matrix_delta=confusion_delta,
+            flipped_total=flipped_total,
+            flipped=[
+                FlippedCase(
+                    case_id=case_id,
+                    truth=truth,
+                    base_pred=base_pred,
+                    head_pred=head_pred,
+                    base_match=base_match,
+                    head_match=head_match,
+                )
+                for case_id, truth, base_pred, head_pred, base_match, head_match in flipped_rows
+            ],
+        )
+    
+    @staticmethod
+    def _first_detail_ids(run_id: str):
+        """Subquery con el id del primer detalle de cada case_id de un run"""
+        return (
+            select(func.min(RunDetail.id))
+            .where(RunDetail.run_id == run_id)
+            .group_by(RunDetail.case_id)
+        )
+    
+    def _distinct_case_count(self, run_id: str) -> int:
+        return self.db.execute(
+            select(func.count(func.distinct(RunDetail.case_id))).where(RunDetail.run_id == run_id)
+        ).scalar() or 0
+    
     def save_comment(self, run_id: str, case_id: str, comment: Optional[str] = None,
                      tag: Optional[str] = None, reviewed: bool = False) -> None:
         """Guarda comentario/tag/reviewed para un caso"""
@@ -156,6 +456,35 @@ class ResultStore:
             detail.reviewed = reviewed
             self.db.commit()
     
+    def delete_run(self, run_id: str, chunk_size: int = 5000) -> None:
+        """Elimina un run y todos sus detalles sin cargarlos en memoria.
+
+        DELETE por chunks de `chunk_size` filas, con un commit por chunk para
+        acotar los locks (con particionado HASH cada chunk toca una sola
+        partición; no hay DDL).
+        """
+        ids = (
+            select(RunDetail.id)
+            .where(RunDetail.run_id == run_id)
+            .limit(chunk_size)
+        )
+        while True:
+            result = self.db.execute(
+                delete(RunDetail)
+                .where(RunDetail.run_id == run_id, RunDetail.id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+            self.db.commit()
+            if result.rowcount < chunk_size:
+                break
+        
+        self.db.execute(
+            delete(Run)
+            .where(Run.run_id == run_id)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+    
     def get_run(self, run_id: str) -> Optional[Run]:
         """Obtiene un run por ID"""
         return self.db.query(Run).filter(Run.run_id == run_id).first()
@@ -175,7 +504,50 @@ class ResultStore:
             query = query.filter(RunDetail.pred_ok == False)
         # filter_type == "all" o None: sin filtro adicional
         
-        return query.order_by(RunDetail.id).limit(limit).offset(offset).all()
+        return (
+            query.options(joinedload(RunDetail.case_payload))
+            .order_by(RunDetail.id)
+            .limit(limit)
+            .offset(offset)
+            .all()
+        )
+    
+    def get_run_detail(self, run_id: str, case_id: str) -> Optional[RunDetail]:
+        """Obtiene el detalle de un caso"""
+        return self.db.query(RunDetail).filter(
+            and_(RunDetail.run_id == run_id, RunDetail.case_id == case_id)
+        ).first()
+    
+    def load_pred_raw(self, detail: RunDetail) -> Optional[str]:
+        """pred_raw del detalle, descomprimiéndolo si está en almacenamiento frío"""
+        if detail.pred_raw_ref:
+            return blobstore.read_blob(self.db, detail.pred_raw_ref, self.cold_config).decode("utf-8")
+        return detail.pred_raw
+    
+    def load_case_data(self, detail: RunDetail, include_cold: bool = True) -> Dict[str, Any]:
+        """case_data del detalle, desde `cases`, inline o almacenamiento frío.
+
+        Con include_cold=False no se descomprime nada (devuelve {} para payloads en frío).
+        """
+        if detail.case_hash:
+            return detail.case_payload.data if detail.case_payload else {}
+        if detail.case_data_ref:
+            if not include_cold:
+                return {}
+            return json.loads(blobstore.read_blob(self.db, detail.case_data_ref, self.cold_config))
+        return detail.case_data or {}
+    
+    def collect_case_garbage(self) -> int:
+        """Elimina payloads de `cases` que ya no referencia ningún detalle"""
+        cutoff = datetime.utcnow() - CASES_GC_GRACE_PERIOD
+        referenced = exists().where(RunDetail.case_hash == CasePayload.case_hash)
+        result = self.db.execute(
+            delete(CasePayload)
+            .where(and_(CasePayload.last_used_at < cutoff, ~referenced))
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount
     
     def get_run_details_count(self, run_id: str, filter_type: Optional[str] = None) -> int:
         """Cuenta detalles de un run con filtros"""
@@ -187,3 +559,47 @@ class ResultStore:
             query = query.filter(RunDetail.pred_ok == False)
         
         return query.count()
+
+
+class DetailWriter:
+    """Acumula detalles y los persiste con ResultStore.save_details.
+    
+    Se vacía cada `flush_size` casos o cuando pasaron `flush_interval` segundos
+    desde el último flush (para que el progreso visible no se atrase). Al salir
+    del bloque `with` guarda lo pendiente, también si hubo un error: los casos
+    ya procesados quedan persistidos como antes.
+    """
+    
+    def __init__(self, store: ResultStore, run_id: str, flush_size: int = 500, flush_interval: float = 1.0):
+        self.store = store
+        self.run_id = run_id
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._pending: List[Tuple[Any, Any, Any]] = []
+        self._last_flush = time.monotonic()
+    
+    def add(self, caso, pred, cmp) -> None:
+        self._pending.append((caso, pred, cmp))
+        if len(self._pending) >= self.flush_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+    
+    def set_total(self, total: int) -> None:
+        self.store.update_run_progress(self.run_id, total_cases=total)
+    
+    def flush(self) -> None:
+        if self._pending:
+            pending, self._pending = self._pending, []
+            self.store.save_details(self.run_id, pending)
+        self._last_flush = time.monotonic()
+    
+    def __enter__(self) -> "DetailWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            self.flush()
+        except Exception:
+            if exc_type is None:
+                raise
+            # Ya hay un error en curso: no taparlo con el del flush
+            self.store.rollback()
@@ -0,0 +1,100 @@
+"""Comparación vectorizada (hook `comparar_vectorizado` de TestPlugin)
+
+Para plugins tabulares (truth tables en pandas) la comparación caso por caso
+en Python es una parte visible del CPU en runs de 1M de casos. Con el hook, el
+runner arma un DataFrame de casos y otro de predicciones por micro-batch y el
+plugin devuelve match y reason en bloque, con unas pocas operaciones
+vectoriales.
+
+pandas se importa recién cuando un plugin usa el hook.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.models.dto import Case, Pred
+from app.models.records import CompareRecord
+
+
+def cases_frame(casos: Sequence[Case], fields: Optional[Sequence[str]] = None):
+    """DataFrame con `case_id` y las claves de primer nivel de case.data
+
+    `fields` limita las columnas a las que usa el plugin (None = todas). Se arma
+    por columnas (más rápido que from_records); las claves que faltan en algún
+    caso quedan en None.
+    """
+    import pandas as pd
+
+    if fields is None:
+        keys: Dict[str, None] = {}
+        for caso in casos:
+            keys.update(dict.fromkeys(caso.data))
+    else:
+        keys = dict.fromkeys(fields)
+    columns: Dict[str, List[Any]] = {key: [caso.data.get(key) for caso in casos] for key in keys}
+    columns["case_id"] = [caso.id for caso in casos]
+    return pd.DataFrame(columns)
+
+
+def preds_frame(preds: Sequence[Pred]):
+    """DataFrame con ok, value, status y meta de cada predicción (sin raw)"""
+    import pandas as pd
+
+    return pd.DataFrame({
+        "ok": [pred.ok for pred in preds],
+        "value": [pred.value for pred in preds],
+        "status": [pred.status for pred in preds],
+        "meta": [pred.meta for pred in preds],
+    })
+
+
+def _column(result: Any, name: str, size: int) -> List[Any]:
+    if name not in result:
+        return [None] * size
+    values = result[name]
+    if hasattr(values, "notna"):
+        # Series de pandas: NaN (claves faltantes, joins sin match) -> None
+        values = values.astype(object).where(values.notna(), None)
+    values = values.tolist() if hasattr(values, "tolist") else list(values)
+    if len(values) != size:
+        raise ValueError(f"comparar_vectorizado devolvió {len(values)} valores de '{name}' para {size} casos")
+    return values
+
+
+def compares_from_result(result: Any, preds: Sequence[Pred]) -> List[CompareRecord]:
+    """Convierte el resultado del hook en registros de comparación.
+
+    `result` es un DataFrame o un dict de columnas (listas, arrays o Series).
+    `match` y `reason` son obligatorias; `truth`, `pred` y `detail` opcionales
+    (si falta `pred` se usa pred.value de las predicciones ok).
+    """
+    size = len(preds)
+    if "match" not in result or "reason" not in result:
+        raise ValueError("comparar_vectorizado debe devolver las columnas 'match' y 'reason'")
+
+    matches = _column(result, "match", size)
+    reasons = _column(result, "reason", size)
+    truths = _column(result, "truth", size)
+    pred_values = (
+        _column(result, "pred", size) if "pred" in result
+        else [pred.value if pred.ok else None for pred in preds]
+    )
+    details = _column(result, "detail", size)
+
+    # Registros livianos: construir un Compare de pydantic por caso costaría más
+    # que la comparación vectorizada en sí
+    return [
+        CompareRecord(
+            bool(match),
+            truth,
+            pred_value,
+            str(reason),
+            detail if isinstance(detail, dict) else {},
+        )
+        for match, reason, truth, pred_value, detail in zip(matches, reasons, truths, pred_values, details)
+    ]
+
+
+def compare_vectorized(plugin, casos: Sequence[Case], preds: Sequence[Pred], config: Dict[str, Any]) -> List[CompareRecord]:
+    """Ejecuta comparar_vectorizado del plugin sobre un lote"""
+    frame = cases_frame(casos, getattr(plugin, "vectorized_case_fields", None))
+    result = plugin.comparar_vectorizado(frame, preds_frame(preds), config)
+    return compares_from_result(result, preds)
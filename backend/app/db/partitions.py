@@ -0,0 +1,58 @@
+"""Particionado de run_details en PostgreSQL
+
+Con la migración 011, `run_details` es una tabla particionada por HASH (run_id)
+en un conjunto fijo de `HASH_PARTITIONS` particiones (`run_details_p00`...).
+Esto permite:
+- Partition pruning en todas las consultas que filtran por run_id.
+- Tablas e índices más chicos para vacuum y para los DELETE por chunks.
+
+El conjunto es fijo: crear o borrar un run no hace DDL (no se toma ningún
+ACCESS EXCLUSIVE sobre run_details en el camino de los requests) y el
+planner no se degrada con la cantidad de runs. Borrar un run es un DELETE
+por chunks (ResultStore.delete_run).
+
+Si la base no está particionada (SQLite, o Postgres creado con init_db sin
+migraciones) el layout no cambia nada para el store.
+"""
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+PARENT_TABLE = "run_details"
+
+# Debe coincidir con la migración 011
+HASH_PARTITIONS = 16
+
+# Cache por URL de engine: el layout sólo cambia con migraciones
+_partitioned_cache: Dict[str, bool] = {}
+
+
+def partition_names() -> List[str]:
+    """Nombres de las particiones HASH de run_details"""
+    return [f"{PARENT_TABLE}_p{remainder:02d}" for remainder in range(HASH_PARTITIONS)]
+
+
+def is_partitioned(db: Session) -> bool:
+    """Indica si run_details es una tabla particionada en la base actual"""
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return False
+
+    key = str(bind.engine.url)
+    if key not in _partitioned_cache:
+        relkind = db.execute(
+            text(
+                "SELECT c.relkind FROM pg_class c "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE c.relname = :name AND n.nspname = current_schema()"
+            ),
+            {"name": PARENT_TABLE},
+        ).scalar()
+        _partitioned_cache[key] = relkind == "p"
+    return _partitioned_cache[key]
+
+
+def reset_cache() -> None:
+    """Olvida el layout cacheado (p.ej. después de correr migraciones)"""
+    _partitioned_cache.clear()
@@ -0,0 +1,51 @@
+"""INSERT idempotente para tablas direccionadas por contenido (blobs, cases)"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+
+def insert_or_touch(db: Session, model, rows: List[Dict[str, Any]], key: str,
+                    touch_column: Optional[str] = None,
+                    touch_after: Optional[timedelta] = None) -> None:
+    """Inserta filas ignorando las que ya existen por `key`. No hace commit.
+
+    Si se indica `touch_column`, a las filas existentes se les actualiza esa
+    columna a "ahora", pero sólo si es más vieja que `touch_after`: así el GC
+    no las elimina mientras se usan, sin escribir la fila en cada uso.
+    """
+    if not rows:
+        return
+
+    now = datetime.utcnow()
+    if touch_column:
+        for row in rows:
+            row.setdefault(touch_column, now)
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        for row in rows:
+            existing = db.get(model, row[key])
+            if existing is None:
+                db.add(model(**row))
+            elif touch_column:
+                setattr(existing, touch_column, now)
+        return
+
+    # Mismo key repetido dentro de un INSERT multi-fila no está permitido. Se
+    # ordena por key: dos lotes concurrentes con las mismas filas en otro orden
+    # tomarían los locks de fila en orden inverso (deadlock en PostgreSQL).
+    by_key = {row[key]: row for row in rows}
+    unique_rows = [by_key[k] for k in sorted(by_key)]
+    stmt = insert(model).values(unique_rows)
+    if touch_column:
+        column = getattr(model, touch_column)
+        stale = column < now - (touch_after or timedelta(0))
+        stmt = stmt.on_conflict_do_update(index_elements=[key], set_={touch_column: now}, where=stale)
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[key])
+    db.execute(stmt)
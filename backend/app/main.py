@@ -3,7 +3,15 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router
 from app.api.plugin_routes import router as plugin_router
-from app.db.session import init_db
+from app.api.dataset_routes import router as dataset_router
+from app.db.session import init_db, SessionLocal
+from app.core.retention import RetentionPolicy, RetentionSweeper
+from app.core.runner import fail_orphaned_running_runs
+from app.core.sandbox import shutdown_pools
+from app.core.scheduler import fail_orphaned_queued_runs
+from app.core.spool import SpoolConfig, SpoolDrainer
+from app.core.store import ResultStore
+import os
 
 app = FastAPI(
     title="Mass Test Runner API",
@@ -22,13 +30,54 @@ app.add_middleware(
 
 app.include_router(router)
 app.include_router(plugin_router)
+app.include_router(dataset_router)
+
+retention_sweeper = None
+spool_drainer = None
 
 
 @app.on_event("startup")
 def startup_event():
     """Inicializa la base de datos al arrancar"""
+    global retention_sweeper, spool_drainer
     init_db()
 
+    # La cola del scheduler es en memoria: los runs en cola de un proceso anterior no van a arrancar
+    # (y los que estaban corriendo sólo se cierran si dejaron un spool pendiente)
+    spool_config = SpoolConfig.from_env()
+    db = SessionLocal()
+    try:
+        orphaned = fail_orphaned_queued_runs(db)
+        if orphaned:
+            print(f"Scheduler: {orphaned} runs en cola de un proceso anterior marcados como failed")
+        orphaned = fail_orphaned_running_runs(ResultStore(db), spool_config)
+        if orphaned:
+            print(f"Runner: {orphaned} runs en ejecución de un proceso anterior marcados como failed")
+    finally:
+        db.close()
+
+    # Sweeper de retención (sólo si hay política configurada)
+    policy = RetentionPolicy.from_env()
+    if policy.enabled:
+        interval = float(os.getenv("RETENTION_SWEEP_INTERVAL_SECONDS", "3600"))
+        retention_sweeper = RetentionSweeper(SessionLocal, policy, interval_seconds=interval)
+        retention_sweeper.start()
+
+    # Replay de spools que quedaron sin volcar (p. ej. después de un reinicio)
+    if spool_config.enabled:
+        spool_drainer = SpoolDrainer(SessionLocal, spool_config)
+        spool_drainer.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Detiene los procesos en background"""
+    if retention_sweeper is not None:
+        retention_sweeper.stop()
+    if spool_drainer is not None:
+        spool_drainer.stop()
+    shutdown_pools()
+
 
 @app.get("/")
 def root():
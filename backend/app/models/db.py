@@ -1,5 +1,5 @@
 """Modelos de base de datos SQLAlchemy"""
-from sqlalchemy import Column, String, Boolean, Float, Integer, DateTime, Text, JSON, ForeignKey
+from sqlalchemy import Column, String, Boolean, Float, Integer, BigInteger, DateTime, Text, JSON, ForeignKey, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -10,10 +10,10 @@ Base = declarative_base()
 class Run(Base):
     """Tabla de ejecuciones (runs)"""
     __tablename__ = "runs"
-
+    
     run_id = Column(String, primary_key=True)
     plugin_name = Column(String, nullable=False)
-    status = Column(String, nullable=False, default="running")  # running, completed, failed
+    status = Column(String, nullable=False, default="running")  # queued, running, completed, failed, cancelled
     config = Column(JSON, nullable=False, default={})
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
@@ -21,6 +21,7 @@ class Run(Base):
     # Progreso
     total_cases = Column(Integer, nullable=True)  # Total de casos estimados (None si no se conoce)
     processed_cases = Column(Integer, nullable=False, default=0)  # Casos procesados
+    spool_offset = Column(BigInteger, nullable=False, default=0)  # Bytes del spool ya volcados (ver app.core.spool)
     
     # Métricas calculadas
     accuracy = Column(Float, nullable=True)
@@ -28,20 +29,38 @@ class Run(Base):
     error_rate = Column(Float, nullable=True)
     confusion_matrix = Column(JSON, nullable=True)
     
+    # Métricas del pipeline por etapa y por cola (ver app.core.pipeline)
+    pipeline_metrics = Column(JSON, nullable=True)
+    
+    # Por qué terminó antes de procesar todos los casos, y aperturas del circuit breaker
+    stop_reason = Column(Text, nullable=True)
+    circuit_breaker = Column(JSON, nullable=True)
+    
+    # Modo muestreo: tamaño de la muestra, estratos e intervalo de confianza de la accuracy
+    sampling = Column(JSON, nullable=True)
+    
     # Relación con detalles
     details = relationship("RunDetail", back_populates="run", cascade="all, delete-orphan")
 
 
 class RunDetail(Base):
-    """Tabla de detalles de casos dentro de un run"""
-    __tablename__ = "run_details"
+    """Tabla de detalles de casos dentro de un run
 
+    En PostgreSQL (migración 004) la tabla está particionada por LIST (run_id),
+    una partición por run, con PK (run_id, id). El mapeo ORM mantiene `id` como
+    identidad porque es único por sí solo (sale de una secuencia).
+    """
+    __tablename__ = "run_details"
+    
     id = Column(Integer, primary_key=True, autoincrement=True)
     run_id = Column(String, ForeignKey("runs.run_id"), nullable=False, index=True)
     case_id = Column(String, nullable=False, index=True)
     
-    # Datos del caso
-    case_data = Column(JSON, nullable=False)
+    # Datos del caso: deduplicados en `cases` (case_hash), inline (case_data)
+    # o en almacenamiento frío (case_data_ref)
+    case_data = Column(JSON(none_as_null=True), nullable=True)
+    case_data_ref = Column(String, nullable=True, index=True)
+    case_hash = Column(String, nullable=True, index=True)
     
     # Truth y Pred
     truth = Column(String, nullable=True)
@@ -49,6 +68,7 @@ class RunDetail(Base):
     pred_ok = Column(Boolean, nullable=False)
     pred_status = Column(String, nullable=False)
     pred_raw = Column(Text, nullable=True)
+    pred_raw_ref = Column(String, nullable=True, index=True)  # "<backend>:<sha256>" si está en frío
     pred_meta = Column(JSON, nullable=False, default={})
     
     # Comparación
@@ -63,12 +83,39 @@ class RunDetail(Base):
     
     # Relación con run
     run = relationship("Run", back_populates="details")
+    
+    # Payload deduplicado del caso (sin FK para no encarecer los inserts)
+    case_payload = relationship(
+        "CasePayload",
+        primaryjoin="foreign(RunDetail.case_hash) == CasePayload.case_hash",
+        uselist=False,
+        viewonly=True,
+    )
+
+
+class CasePayload(Base):
+    """Tabla de case_data deduplicados, direccionados por contenido"""
+    __tablename__ = "cases"
+    
+    case_hash = Column(String, primary_key=True)  # sha256 del JSON canónico de case_data
+    data = Column(JSON, nullable=False)
+    last_used_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class Blob(Base):
+    """Payloads comprimidos direccionados por contenido (almacenamiento frío)"""
+    __tablename__ = "blobs"
+    
+    blob_hash = Column(String, primary_key=True)  # sha256 del valor sin comprimir
+    size = Column(Integer, nullable=False)  # Tamaño sin comprimir
+    data = Column(LargeBinary, nullable=False)  # zstd o gzip (se detecta por magic bytes)
+    last_used_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
 
 class Plugin(Base):
     """Tabla de plugins registrados"""
     __tablename__ = "plugins"
-
+    
     plugin_name = Column(String, primary_key=True)
     display_name = Column(String, nullable=False)
     code = Column(Text, nullable=False)  # Código Python del plugin
@@ -1,6 +1,6 @@
 """DTOs (Data Transfer Objects) basados en el diseño de diagramas-clase.md"""
-from typing import Optional, Dict, Any
-from pydantic import BaseModel
+from typing import Optional, Dict, Any, List, Literal
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 
@@ -42,10 +42,41 @@ class RunResult(BaseModel):
     metrics: Metrics
 
 
+class CircuitBreakerConfig(BaseModel):
+    """Circuit breaker por tasa de errores (Pred.ok == False) de un run"""
+    window: int = Field(default=100, ge=1)  # Casos de la ventana deslizante
+    min_cases: int = Field(default=20, ge=1)  # Casos en la ventana antes de evaluar la tasa
+    max_error_rate: float = Field(default=0.5, ge=0, lt=1)  # Se abre si la tasa la supera
+    action: Literal["abort", "pause"] = "abort"  # Abortar el run o pausar y probar (half-open)
+    pause_seconds: float = Field(default=60, ge=0)  # Pausa antes de la unidad de prueba
+    max_trips: int = Field(default=5, ge=1)  # Con "pause": aperturas antes de abortar igual
+
+
+class SamplingConfig(BaseModel):
+    """Modo muestreo: evalúa una muestra aleatoria y corta cuando el intervalo de confianza es angosto"""
+    sample_size: int = Field(default=10000, ge=1)  # Casos de la muestra (reservoir sobre obtener_casos)
+    stratify_by: Optional[str] = None  # Clave de case.data para estratificar (p. ej. la etiqueta esperada)
+    target_width: float = Field(default=0.01, gt=0, le=1)  # Ancho del IC de accuracy para cortar (0.01 = ±0.5%)
+    confidence: float = Field(default=0.95, gt=0, lt=1)  # Nivel de confianza del intervalo de Wilson
+    min_cases: int = Field(default=100, ge=1)  # Casos evaluados antes de mirar el intervalo
+    seed: Optional[int] = None  # Semilla para una muestra reproducible
+
+
 class RunConfig(BaseModel):
     """Configuración para ejecutar un test run"""
     plugin_name: str
     config: Dict[str, Any] = {}  # Configuración específica del plugin (assistant_id, conexiones, etc.)
+    batch_size: Optional[int] = Field(default=None, ge=1)  # Micro-batch para plugins con ejecutar_batch (None = default, 1 = desactivado)
+    batch_max_wait_ms: float = Field(default=50, ge=0)  # Espera máxima para completar un micro-batch
+    concurrency: int = Field(default=16, ge=1)  # Casos (o micro-batches) en vuelo para plugins async
+    workers: int = Field(default=1, ge=1)  # Threads de ejecución para plugins sync (cada uno con su instancia y setup)
+    compare_workers: int = Field(default=1, ge=1)  # Threads de comparación (pipeline de plugins sync)
+    queue_size: int = Field(default=16, ge=1)  # Unidades (casos o micro-batches) por cola entre etapas del pipeline
+    priority: int = 0  # Prioridad en la cola del scheduler (mayor primero)
+    owner: Optional[str] = None  # Para el fair share entre usuarios/equipos (default: el plugin)
+    circuit_breaker: Optional[CircuitBreakerConfig] = None  # Corta el run si la tasa de errores se dispara
+    sampling: Optional[SamplingConfig] = None  # Evalúa una muestra y corta por intervalo de confianza
+    refresh_snapshot: bool = False  # Vuelve a materializar el snapshot de obtener_casos (con SNAPSHOT_DIR)
 
 
 class RunSummary(BaseModel):
@@ -61,6 +92,11 @@ class RunSummary(BaseModel):
     mismatches: int
     errors: int
     processed_cases: Optional[int] = None  # Casos procesados (para progreso)
+    pipeline_metrics: Optional[Dict[str, Any]] = None  # Métricas por etapa/cola del pipeline (sólo en el detalle del run)
+    queue_position: Optional[int] = None  # Posición en la cola del scheduler (sólo runs "queued")
+    stop_reason: Optional[str] = None  # Por qué terminó antes (cancelación o circuit breaker)
+    circuit_breaker: Optional[Dict[str, Any]] = None  # Estado final y aperturas del circuit breaker
+    sampling: Optional[Dict[str, Any]] = None  # Muestra e intervalo de confianza de la accuracy (modo muestreo)
 
 
 class RunProgress(BaseModel):
@@ -87,6 +123,31 @@ class RunDetail(BaseModel):
     comment: Optional[str] = None
     tag: Optional[str] = None
     reviewed: bool = False
+    cold_storage: bool = False  # raw/case_data en almacenamiento frío: pedir el detalle del caso
+
+
+class FlippedCase(BaseModel):
+    """Caso cuyo resultado cambió entre dos runs"""
+    case_id: str
+    truth: Optional[str] = None
+    base_pred: Optional[str] = None
+    head_pred: Optional[str] = None
+    base_match: bool
+    head_match: bool
+
+
+class RunComparison(BaseModel):
+    """Comparación entre dos runs (base -> head) por case_id"""
+    base_run_id: str
+    head_run_id: str
+    common_cases: int  # Casos presentes en ambos runs
+    only_in_base: int
+    only_in_head: int
+    regressions: int  # match en base, mismatch en head
+    fixes: int  # mismatch en base, match en head
+    confusion_matrix_delta: Optional[Dict[str, Any]] = None  # head - base, sobre casos comunes
+    flipped_total: int  # Total de casos en la lista filtrada (para paginar)
+    flipped: List[FlippedCase] = []
 
 
 class CommentRequest(BaseModel):
@@ -96,6 +157,16 @@ class CommentRequest(BaseModel):
     reviewed: bool = False
 
 
+class DatasetInfo(BaseModel):
+    """Dataset subido (ver app.core.datasets)"""
+    dataset_id: str
+    name: str
+    format: str  # csv o jsonl (formato de origen)
+    num_cases: int
+    size_bytes: int  # Tamaño de records.bin
+    created_at: datetime
+
+
 class PluginCreate(BaseModel):
     """Request para crear un plugin"""
     plugin_name: str
@@ -122,3 +193,24 @@ class PluginInfo(BaseModel):
     created_at: datetime
     updated_at: datetime
     last_test_at: Optional[datetime] = None
+    test_job_id: Optional[str] = None  # smoke test en background (create/update con background_test)
+
+
+class SmokeTestResult(BaseModel):
+    """Resultado del smoke test de un plugin"""
+    success: bool
+    message: Optional[str] = None
+    timed_out: bool = False
+    phase: Optional[str] = None  # fase que falló o que seguía corriendo al vencer el timeout
+    timings_ms: Dict[str, float] = {}  # duración de cada fase terminada
+    total_ms: float = 0.0
+
+
+class SmokeTestJob(BaseModel):
+    """Smoke test en background"""
+    job_id: str
+    plugin_name: str
+    status: str  # running, completed
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    result: Optional[SmokeTestResult] = None
@@ -0,0 +1,26 @@
+"""Registros livianos (__slots__) para el camino caliente del runner
+
+Tienen los mismos atributos que los DTOs de pydantic equivalentes, así el
+store y las métricas los aceptan indistintamente, pero se construyen sin
+validación (los valores ya vienen normalizados por quien los arma).
+"""
+from typing import Any, Dict, Optional
+
+from app.models.dto import Compare
+
+
+class CompareRecord:
+    """Equivalente liviano de dto.Compare"""
+
+    __slots__ = ("match", "truth", "pred", "reason", "detail")
+
+    def __init__(self, match: bool, truth: Optional[str], pred: Optional[str], reason: str,
+                 detail: Optional[Dict[str, Any]] = None):
+        self.match = match
+        self.truth = truth
+        self.pred = pred
+        self.reason = reason
+        self.detail = detail if detail is not None else {}
+
+    def to_dto(self) -> Compare:
+        return Compare(match=self.match, truth=self.truth, pred=self.pred, reason=self.reason, detail=self.detail)
@@ -0,0 +1,87 @@
+"""Plugins sintéticos para benchmarks"""
+import random
+from typing import Any, Dict, Iterable
+
+import numpy as np
+
+from app.core.plugin import DemoPlugin
+from app.models.dto import Case, Compare, Pred
+
+LABELS = ["T1", "T2", "T3", "T4"]
+
+
+class SyntheticPlugin(DemoPlugin):
+    """Variante de DemoPlugin para alto volumen.
+
+    - Genera los casos de forma lazy (no arma la lista completa en memoria).
+    - Es determinístico por `seed`, para comparar corridas entre sí.
+    - `raw_bytes` controla el tamaño de pred.raw (simula respuestas de LLM).
+
+    Config: num_casos, error_rate, accuracy, raw_bytes, seed
+    """
+
+    def obtener_casos(self, config: Dict[str, Any]) -> Iterable[Case]:
+        num_casos = config.get("num_casos", 10000)
+        rng = random.Random(config.get("seed", 42))
+        for i in range(num_casos):
+            yield Case(
+                id=f"synthetic_{i}",
+                data={
+                    "label": rng.choice(LABELS),
+                    "input_text": f"Texto sintético {i}",
+                    "metadata": {"source": "benchmark", "index": i},
+                },
+            )
+
+    def ejecutar_test(self, caso: Case, config: Dict[str, Any]) -> Pred:
+        # RNG derivado del caso: el resultado no depende del orden de ejecución
+        rng = random.Random(f"{config.get('seed', 42)}:{caso.id}")
+        if rng.random() < config.get("error_rate", 0.05):
+            return Pred(ok=False, value=None, status="error", raw=None, meta={"error": "Synthetic error"})
+
+        truth = caso.data.get("label", "T1")
+        if rng.random() < config.get("accuracy", 0.8):
+            value = truth
+        else:
+            value = rng.choice([l for l in LABELS if l != truth])
+
+        raw_bytes = config.get("raw_bytes", 256)
+        raw = f'{{"prediction": "{value}", "text": "{"x" * raw_bytes}"}}'
+        return Pred(ok=True, value=value, status="success", raw=raw, meta={"model": "synthetic"})
+
+
+class TruthTablePlugin(SyntheticPlugin):
+    """Plugin tabular: el truth sale de una tabla de pandas cargada en setup.
+
+    comparar_resultados busca el truth caso por caso (lo habitual en plugins
+    que cargan un Excel/CSV de respuestas esperadas) y comparar_vectorizado
+    hace lo mismo con un join por lote.
+    """
+
+    vectorized_case_fields = ["label"]
+
+    def setup(self, config: Dict[str, Any]) -> None:
+        import pandas as pd
+
+        casos = list(self.obtener_casos(config))
+        self.truth = pd.DataFrame(
+            {"label": [c.data["label"] for c in casos]}, index=[c.id for c in casos]
+        )
+
+    def comparar_resultados(self, caso: Case, pred: Pred, config: Dict[str, Any]) -> Compare:
+        truth = self.truth.at[caso.id, "label"]
+        if not pred.ok:
+            return Compare(match=False, truth=truth, reason="Error en ejecución: pred.ok = False")
+        match = truth == pred.value
+        reason = "Match" if match else f"Truth: {truth}, Pred: {pred.value}"
+        return Compare(match=match, truth=truth, pred=pred.value, reason=reason)
+
+    def comparar_vectorizado(self, casos, preds, config: Dict[str, Any]):
+        truth = casos["case_id"].map(self.truth["label"])
+        match = preds["ok"] & (truth == preds["value"])
+        reason = np.where(
+            match, "Match",
+            np.where(preds["ok"], "Truth: " + truth + ", Pred: " + preds["value"].fillna(""),
+                     "Error en ejecución: pred.ok = False"),
+        )
+        return {"match": match, "reason": reason, "truth": truth}
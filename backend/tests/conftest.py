@@ -0,0 +1,26 @@
+"""Fixtures compartidas para los tests"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import serialization
+from app.models.db import Base
+
+
+@pytest.fixture
+def db():
+    """Sesión sobre una base SQLite en memoria con todas las tablas creadas"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+        **serialization.engine_options(),
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
@@ -0,0 +1,82 @@
+"""Tests para plugins async en el runner"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.plugin import DemoPlugin, PluginFactory, is_async_plugin
+from app.core.runner import MassTestRunner
+from app.core.store import ResultStore
+from app.models.dto import Case, Compare, Pred, RunConfig
+
+
+class AsyncPlugin(DemoPlugin):
+    """Plugin async con latencia de I/O y registro de concurrencia"""
+
+    in_flight = 0
+    peak = 0
+
+    def obtener_casos(self, config):
+        return [Case(id=f"c{i}", data={"label": "T1"}) for i in range(config.get("num_casos", 10))]
+
+    async def ejecutar_test(self, caso, config):
+        AsyncPlugin.in_flight += 1
+        AsyncPlugin.peak = max(AsyncPlugin.peak, AsyncPlugin.in_flight)
+        try:
+            await asyncio.sleep(0.05)
+            if caso.id == config.get("fail_on"):
+                raise RuntimeError("backend caído")
+            return Pred(ok=True, value="T1", status="success")
+        finally:
+            AsyncPlugin.in_flight -= 1
+
+    async def comparar_resultados(self, caso, pred, config):
+        return Compare(match=pred.value == "T1", truth="T1", pred=pred.value, reason="Match")
+
+
+@pytest.fixture
+def async_plugin():
+    AsyncPlugin.in_flight = AsyncPlugin.peak = 0
+    original_session = PluginFactory._db_session
+    PluginFactory.register("test_async", AsyncPlugin)
+    try:
+        yield AsyncPlugin
+    finally:
+        PluginFactory._plugins.pop("test_async", None)
+        PluginFactory._db_session = original_session
+
+
+def test_is_async_plugin():
+    assert is_async_plugin(AsyncPlugin())
+    assert not is_async_plugin(DemoPlugin())
+
+
+def test_runner_runs_async_plugin_with_bounded_concurrency(db, async_plugin):
+    """40 casos de 50 ms con concurrency=10 tardan ~4 rondas, no 40"""
+    store = ResultStore(db)
+    started = time.perf_counter()
+    result = MassTestRunner(store).run(
+        RunConfig(plugin_name="test_async", config={"num_casos": 40}, concurrency=10), db
+    )
+    elapsed = time.perf_counter() - started
+
+    assert async_plugin.peak == 10
+    assert elapsed < 1.5
+    assert store.get_run(result.run_id).processed_cases == 40
+    assert result.metrics.accuracy == 1.0
+
+
+def test_runner_async_failure_marks_run_failed(db, async_plugin):
+    store = ResultStore(db)
+    with pytest.raises(RuntimeError, match="backend caído"):
+        MassTestRunner(store).run(
+            RunConfig(plugin_name="test_async", config={"num_casos": 30, "fail_on": "c3"}, concurrency=4), db
+        )
+
+    assert store.get_runs()[0].status == "failed"
+    assert async_plugin.in_flight == 0
+
+
+def test_plugin_smoke_test_accepts_async_plugin(db, async_plugin):
+    """PluginFactory.test_plugin espera las corrutinas de un plugin async"""
+    assert PluginFactory.test_plugin("test_async", db) == (True, None)
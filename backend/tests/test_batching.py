@@ -0,0 +1,84 @@
+"""Tests para la ejecución en micro-batches (ejecutar_batch)"""
+import time
+
+import pytest
+
+from app.core.plugin import DemoPlugin, PluginFactory, supports_batch
+from app.core.runner import MassTestRunner, iter_micro_batches
+from app.core.store import ResultStore
+from app.models.dto import Case, Pred, RunConfig
+
+
+class BatchPlugin(DemoPlugin):
+    """Plugin batch que cuenta llamadas y siempre acierta"""
+
+    calls = []
+
+    def obtener_casos(self, config):
+        return [Case(id=f"c{i}", data={"label": "T1"}) for i in range(config.get("num_casos", 10))]
+
+    def ejecutar_test(self, caso, config):
+        raise AssertionError("No debería llamarse caso por caso")
+
+    def ejecutar_batch(self, casos, config):
+        BatchPlugin.calls.append(len(casos))
+        return [Pred(ok=True, value="T1", status="success") for _ in casos]
+
+
+@pytest.fixture
+def batch_plugin():
+    BatchPlugin.calls = []
+    original_session = PluginFactory._db_session
+    PluginFactory.register("test_batch", BatchPlugin)
+    try:
+        yield BatchPlugin
+    finally:
+        PluginFactory._plugins.pop("test_batch", None)
+        PluginFactory._db_session = original_session
+
+
+def test_iter_micro_batches_by_size_and_wait():
+    """Corta por tamaño y entrega lotes incompletos cuando vence la espera"""
+    casos = [Case(id=str(i), data={}) for i in range(10)]
+    assert [len(b) for b in iter_micro_batches(casos, 4, 1000)] == [4, 4, 2]
+
+    def slow():
+        for caso in casos[:3]:
+            time.sleep(0.02)
+            yield caso
+
+    # El primer caso espera al segundo (20 ms > 5 ms) y el lote sale con 2
+    assert [len(b) for b in iter_micro_batches(slow(), 10, 5)] == [2, 1]
+
+
+def test_supports_batch_detects_override():
+    assert supports_batch(BatchPlugin())
+    assert not supports_batch(DemoPlugin())
+
+
+def test_runner_uses_batches(db, batch_plugin):
+    """25 casos con batch_size=10 son 3 llamadas y se guardan todos"""
+    store = ResultStore(db)
+    result = MassTestRunner(store).run(
+        RunConfig(plugin_name="test_batch", config={"num_casos": 25}, batch_size=10), db
+    )
+
+    assert batch_plugin.calls == [10, 10, 5]
+    assert store.get_run(result.run_id).processed_cases == 25
+    assert result.metrics.accuracy == 1.0
+
+
+def test_runner_rejects_wrong_batch_length(db, batch_plugin):
+    """Un ejecutar_batch que pierde casos marca el run como failed"""
+    def short_batch(self, casos, config):
+        return [Pred(ok=True, value="T1", status="success")]
+
+    store = ResultStore(db)
+    original = BatchPlugin.ejecutar_batch
+    BatchPlugin.ejecutar_batch = short_batch
+    try:
+        with pytest.raises(ValueError, match="predicciones"):
+            MassTestRunner(store).run(RunConfig(plugin_name="test_batch", config={"num_casos": 3}), db)
+    finally:
+        BatchPlugin.ejecutar_batch = original
+    assert store.get_runs()[0].status == "failed"
@@ -0,0 +1,37 @@
+"""Smoke test de la suite de benchmarks"""
+import json
+
+from benchmarks import run_benchmarks
+from benchmarks.plugins import SyntheticPlugin
+
+
+def test_synthetic_plugin_is_deterministic():
+    """Mismo seed, mismos casos y predicciones"""
+    plugin = SyntheticPlugin()
+    config = {"num_casos": 20, "seed": 3}
+
+    first = [(c.id, plugin.ejecutar_test(c, config).value) for c in plugin.obtener_casos(config)]
+    second = [(c.id, plugin.ejecutar_test(c, config).value) for c in plugin.obtener_casos(config)]
+
+    assert first == second
+    assert len(first) == 20
+
+
+def test_benchmarks_write_json_report(tmp_path):
+    """La suite corre en SQLite y deja un reporte JSON legible"""
+    output = tmp_path / "bench.json"
+
+    run_benchmarks.main([
+        "--sizes", "50", "--runner-cases", "20", "--save-cases", "20",
+        "--flush-size", "10", "--repeat", "2", "--compare-cases", "50", "--compare-batch", "16",
+        "--serialize-rows", "30",
+        "--output", str(output),
+    ])
+
+    report = json.loads(output.read_text())
+    names = {r["name"] for r in report["results"]}
+    assert report["meta"]["database"] == "sqlite"
+    assert {"runner_throughput", "save_detail_latency", "flush_latency",
+            "compute_metrics", "details_page", "export_csv",
+            "compare_per_case", "compare_vectorized",
+            "serialize_details_page", "serialize_detail_columns"} <= names
@@ -0,0 +1,124 @@
+"""Tests para el almacenamiento frío comprimido"""
+import asyncio
+import csv
+import io
+import os
+import time
+
+import pytest
+from sqlalchemy import event
+
+from app.api import routes
+from app.core import blobstore
+from app.core.store import ResultStore
+from app.models.db import Blob
+from app.models.dto import Case, Pred, Compare
+
+
+@pytest.mark.parametrize("codec", ["zstd", "gzip"])
+def test_compress_roundtrip(codec):
+    """decompress detecta el codec por magic bytes"""
+    data = b"respuesta " * 100
+
+    assert blobstore.decompress(blobstore.compress(data, codec)) == data
+
+
+def test_disk_blob_store_is_content_addressed(tmp_path):
+    """Valores iguales comparten el mismo archivo"""
+    store = blobstore.DiskBlobStore(str(tmp_path))
+
+    ref1 = store.put(b"payload")
+    ref2 = store.put(b"payload")
+
+    assert ref1 == ref2
+    assert ref1.startswith("disk:")
+    assert store.get(ref1) == b"payload"
+    assert len(list(tmp_path.glob("??/*"))) == 1
+
+
+def test_store_saves_pred_raw_in_cold_storage(db, monkeypatch):
+    """pred_raw grande se guarda comprimido y se rehidrata al abrir el detalle"""
+    monkeypatch.setenv("COLD_STORAGE", "db")
+    monkeypatch.setenv("CASE_DEDUP", "0")
+    monkeypatch.setenv("COLD_STORAGE_CASE_DATA", "1")
+    monkeypatch.setenv("COLD_STORAGE_MIN_BYTES", "16")
+    store = ResultStore(db)
+    run_id = store.create_run("demo", {})
+    raw = '{"prediction": "T1", "text": "' + "x" * 1000 + '"}'
+
+    for case_id in ("c1", "c2"):
+        store.save_detail(
+            run_id,
+            Case(id=case_id, data={"label": "T1", "input_text": "mismo texto de entrada"}),
+            Pred(ok=True, value="T1", status="success", raw=raw),
+            Compare(match=True, truth="T1", reason="Match"),
+        )
+
+    detail = store.get_run_detail(run_id, "c1")
+    assert detail.pred_raw is None
+    assert detail.case_data is None
+    assert store.load_pred_raw(detail) == raw
+    assert store.load_case_data(detail)["input_text"] == "mismo texto de entrada"
+    # Un blob para raw y otro para case_data, compartidos por ambos casos
+    assert db.query(Blob).count() == 2
+
+    # El export no descomprime payloads en frío (uno por fila)
+    def no_cold_reads(*args, **kwargs):
+        raise AssertionError("el export leyó un blob")
+
+    monkeypatch.setattr(blobstore, "read_blob", no_cold_reads)
+    response = routes.export_csv(run_id, store)
+    chunks = []
+
+    async def read():
+        async for chunk in response.body_iterator:
+            chunks.append(chunk)
+
+    asyncio.run(read())
+    rows = list(csv.reader(io.StringIO("".join(chunks))))
+    assert rows[0][-1] == "case_data" and [row[-1] for row in rows[1:]] == ["{}", "{}"]
+
+
+def test_disk_gc_keeps_blob_reused_during_sweep(db, tmp_path, monkeypatch):
+    """Un put() que reusa un blob después del snapshot del GC lo protege"""
+    store = blobstore.DiskBlobStore(str(tmp_path), db=db)
+    reused, stale = store.put(b"reusado"), store.put(b"viejo")
+    old = time.time() - blobstore.GC_GRACE_PERIOD.total_seconds() - 60
+    for path in tmp_path.glob("??/*"):
+        os.utime(path, (old, old))
+
+    remove = blobstore.DiskBlobStore._remove_if_stale
+
+    def concurrent_put(path, cutoff):
+        if f"disk:{path.name}" == reused:
+            store.put(b"reusado")  # su detalle todavía no hizo commit
+        return remove(path, cutoff)
+
+    monkeypatch.setattr(blobstore.DiskBlobStore, "_remove_if_stale", staticmethod(concurrent_put))
+
+    assert store.collect_garbage() == 1
+    assert store.get(reused) == b"reusado"
+    with pytest.raises(KeyError):
+        store.get(stale)
+    assert not list(tmp_path.glob("??/.gc-*"))
+
+
+def test_put_many_writes_in_hash_order(db):
+    """Un lote se escribe ordenado por hash (locks en orden fijo entre transacciones)"""
+    store = blobstore.DbBlobStore(db)
+    values = [b"c" * 10, b"a" * 10, b"b" * 10, b"a" * 10]
+    params = []
+
+    def capture(conn, cursor, statement, parameters, *args):
+        if statement.lstrip().upper().startswith("INSERT INTO BLOBS"):
+            params.extend(p for p in parameters if isinstance(p, str) and len(p) == 64)
+
+    event.listen(db.get_bind(), "before_cursor_execute", capture)
+    try:
+        refs = store.put_many(values)
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", capture)
+
+    assert refs == [f"db:{blobstore.content_hash(v)}" for v in values]
+    assert params == sorted({blobstore.content_hash(v) for v in values})
+    assert [store.get(ref) for ref in refs] == values
@@ -0,0 +1,71 @@
+"""Tests para la escritura en bulk de detalles (save_details / DetailWriter)"""
+import pytest
+
+from app.core.store import ResultStore
+from app.models.dto import Case, Compare, Pred
+from app.models.records import CompareRecord
+
+
+def _triplet(i: int, raw: str = None):
+    return (
+        Case(id=f"c{i}", data={"label": "T1", "i": i}),
+        Pred(ok=True, value="T1", status="success", raw=raw),
+        CompareRecord(True, "T1", "T1", "Match"),
+    )
+
+
+def test_save_details_inserts_batch_and_updates_progress(db):
+    store = ResultStore(db)
+    run_id = store.create_run("demo", {})
+
+    assert store.save_details(run_id, [_triplet(i) for i in range(10)]) == 10
+    assert store.save_details(run_id, []) == 0
+    store.save_detail(run_id, *_triplet(10))
+
+    assert store.get_run(run_id).processed_cases == 11
+    details = store.get_run_details(run_id, limit=100)
+    assert len(details) == 11
+    assert store.load_case_data(details[3]) == {"label": "T1", "i": 3}
+
+
+def test_save_details_accepts_mixed_optional_columns(db, monkeypatch):
+    """Filas con y sin pred_raw en frío van en el mismo INSERT"""
+    monkeypatch.setenv("COLD_STORAGE", "db")
+    monkeypatch.setenv("COLD_STORAGE_MIN_BYTES", "10")
+    store = ResultStore(db)
+    run_id = store.create_run("demo", {})
+
+    store.save_details(run_id, [_triplet(0, raw="x" * 100), _triplet(1, raw="y")])
+
+    details = {d.case_id: d for d in store.get_run_details(run_id)}
+    assert details["c0"].pred_raw_ref is not None
+    assert details["c1"].pred_raw == "y" and details["c1"].pred_raw_ref is None
+
+
+def test_detail_writer_flushes_by_size_and_on_exit(db):
+    store = ResultStore(db)
+    run_id = store.create_run("demo", {})
+
+    with store.detail_writer(run_id, flush_size=4, flush_interval=60) as writer:
+        for i in range(6):
+            writer.add(*_triplet(i))
+        assert store.get_run(run_id).processed_cases == 4
+
+    assert store.get_run(run_id).processed_cases == 6
+
+
+def test_detail_writer_keeps_processed_cases_on_error(db):
+    store = ResultStore(db)
+    run_id = store.create_run("demo", {})
+
+    with pytest.raises(RuntimeError):
+        with store.detail_writer(run_id, flush_size=100) as writer:
+            writer.add(*_triplet(0))
+            raise RuntimeError("plugin falló")
+
+    assert store.get_run(run_id).processed_cases == 1
+
+
+def test_compare_record_matches_dto():
+    record = CompareRecord(False, "T1", "T2", "Mismatch")
+    assert record.to_dto() == Compare(match=False, truth="T1", pred="T2", reason="Mismatch")
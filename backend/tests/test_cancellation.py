@@ -0,0 +1,132 @@
+"""Tests para la cancelación cooperativa de runs"""
+import asyncio
+import threading
+
+import pytest
+
+from app.api import routes
+from app.core.plugin import DemoPlugin, PluginFactory
+from app.core.retention import FINISHED_STATUSES
+from app.core import runner
+from app.core.runner import MassTestRunner, fail_orphaned_running_runs, request_cancel
+from app.core.scheduler import RunScheduler, SchedulerConfig
+from app.core.spool import SpoolConfig
+from app.core.store import ResultStore
+from app.models.dto import Case, Compare, Pred, RunConfig
+
+
+class CancellingPlugin(DemoPlugin):
+    """Pide cancelar su propio run al ejecutar el caso `cancel_on`"""
+
+    run_id = None
+    executed = []
+
+    def obtener_casos(self, config):
+        return [Case(id=f"c{i}", data={"label": "T1"}) for i in range(config.get("num_casos", 100))]
+
+    def ejecutar_test(self, caso, config):
+        CancellingPlugin.executed.append(caso.id)
+        if caso.id == config.get("cancel_on"):
+            request_cancel(CancellingPlugin.run_id)
+        return Pred(ok=True, value="T1", status="success")
+
+
+class AsyncCancellingPlugin(CancellingPlugin):
+    async def ejecutar_test(self, caso, config):
+        await asyncio.sleep(0.001)
+        return CancellingPlugin.ejecutar_test(self, caso, config)
+
+    async def comparar_resultados(self, caso, pred, config):
+        return Compare(match=True, truth="T1", pred=pred.value, reason="Match")
+
+
+@pytest.fixture
+def plugins():
+    CancellingPlugin.executed = []
+    original_session = PluginFactory._db_session
+    PluginFactory.register("test_cancel", CancellingPlugin)
+    PluginFactory.register("test_cancel_async", AsyncCancellingPlugin)
+    try:
+        yield
+    finally:
+        PluginFactory._plugins.pop("test_cancel", None)
+        PluginFactory._plugins.pop("test_cancel_async", None)
+        PluginFactory._db_session = original_session
+
+
+def _run(db, config):
+    store = ResultStore(db)
+    CancellingPlugin.run_id = store.create_run(config.plugin_name, config.config)
+    result = MassTestRunner(store).run_existing(CancellingPlugin.run_id, config, db)
+    return store.get_run(result.run_id), result
+
+
+@pytest.mark.parametrize("plugin_name", ["test_cancel", "test_cancel_async"])
+def test_cancel_running_run(db, plugins, plugin_name):
+    config = RunConfig(plugin_name=plugin_name, config={"cancel_on": "c10"}, batch_size=1, queue_size=2, concurrency=2)
+
+    run, result = _run(db, config)
+
+    assert run.status == "cancelled" and run.stop_reason == "Cancelado por el usuario"
+    # Lo que ya estaba en vuelo se termina y se guarda; no se ejecuta el resto
+    assert 11 <= run.processed_cases == len(CancellingPlugin.executed) < 20
+    assert run.total_cases == 100
+    assert result.metrics.accuracy == 1.0 and run.accuracy == 1.0
+
+
+def test_cancel_is_per_run(db, plugins):
+    config = RunConfig(plugin_name="test_cancel", config={"num_casos": 30})
+
+    run, _ = _run(db, config)
+
+    assert run.status == "completed" and run.processed_cases == 30
+
+
+def test_cancel_endpoint(db, monkeypatch):
+    store = ResultStore(db)
+    busy = threading.Event()
+    scheduler = RunScheduler(lambda run_id, config: busy.wait(5), SchedulerConfig(max_concurrent_runs=1))
+    monkeypatch.setattr(routes, "scheduler", scheduler)
+    # Capacidad ocupada: el run queda en cola
+    scheduler.submit("otro", RunConfig(plugin_name="demo"))
+    run_id = store.create_run("demo", {}, status="queued")
+    scheduler.submit(run_id, RunConfig(plugin_name="demo"))
+
+    assert routes.cancel_run(run_id, store)["status"] == "cancelled"
+    assert store.get_run(run_id).status == "cancelled"
+    assert scheduler.position(run_id) is None
+
+    with pytest.raises(routes.HTTPException) as exc:
+        routes.cancel_run(run_id, store)
+    assert exc.value.status_code == 409
+    busy.set()
+
+
+def test_cancel_run_not_executing_here(db):
+    """Un run "running" que este proceso no ejecuta no queda "cancelling" para siempre"""
+    store = ResultStore(db)
+    run_id = store.create_run("demo", {})
+
+    assert request_cancel(run_id) is False
+    with pytest.raises(routes.HTTPException) as exc:
+        routes.cancel_run(run_id, store)
+    assert exc.value.status_code == 409
+    assert run_id not in runner._cancel_events
+
+
+def test_fail_orphaned_running_runs(db, tmp_path):
+    """Al arrancar se cierran los runs "running" sin spool pendiente"""
+    store = ResultStore(db)
+    orphan, pending = store.create_run("demo", {}), store.create_run("demo", {})
+    config = SpoolConfig(directory=str(tmp_path))
+    config.path(pending).write_bytes(b"")
+
+    assert fail_orphaned_running_runs(store, config) == 1
+
+    run = store.get_run(orphan)
+    assert run.status == "failed" and run.stop_reason and run.completed_at is not None
+    assert store.get_run(pending).status == "running"
+
+
+def test_cancelled_runs_are_finished():
+    assert "cancelled" in FINISHED_STATUSES
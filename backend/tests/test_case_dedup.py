@@ -0,0 +1,49 @@
+"""Tests para la deduplicación de case_data entre runs"""
+from datetime import datetime
+
+from app.core.store import ResultStore
+from app.models.db import CasePayload, RunDetail
+from app.models.dto import Case, Pred, Compare
+
+
+def _save_suite(store: ResultStore, num_cases: int) -> str:
+    run_id = store.create_run("demo", {})
+    for i in range(num_cases):
+        store.save_detail(
+            run_id,
+            Case(id=f"case_{i}", data={"label": "T1", "input_text": f"Texto {i}"}),
+            Pred(ok=True, value="T1", status="success"),
+            Compare(match=True, truth="T1", reason="Match"),
+        )
+    return run_id
+
+
+def test_case_data_is_stored_once_across_runs(db):
+    """Correr la misma suite dos veces no duplica los payloads de los casos"""
+    store = ResultStore(db)
+
+    first = _save_suite(store, 3)
+    second = _save_suite(store, 3)
+
+    assert db.query(CasePayload).count() == 3
+    assert db.query(RunDetail).filter(RunDetail.case_data.isnot(None)).count() == 0
+
+    details = store.get_run_details(second)
+    assert [store.load_case_data(d)["input_text"] for d in details] == ["Texto 0", "Texto 1", "Texto 2"]
+    assert store.get_run_details(first)[0].case_hash == details[0].case_hash
+
+
+def test_case_payload_garbage_collection(db):
+    """Los payloads sin referencias se eliminan pasado el período de gracia"""
+    store = ResultStore(db)
+    run_id = _save_suite(store, 2)
+    store.get_run(run_id).status = "completed"
+    db.commit()
+
+    store.delete_run(run_id)
+    # Dentro del período de gracia no se elimina nada
+    assert store.collect_case_garbage() == 0
+
+    db.query(CasePayload).update({CasePayload.last_used_at: datetime(2000, 1, 1)})
+    db.commit()
+    assert store.collect_case_garbage() == 2
@@ -0,0 +1,155 @@
+"""Tests para el circuit breaker por tasa de errores"""
+import asyncio
+import threading
+
+import pytest
+
+from app.core.breaker import ABORTED, CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.core.plugin import DemoPlugin, PluginFactory
+from app.core.runner import MassTestRunner
+from app.core.store import ResultStore
+from app.models.dto import Case, CircuitBreakerConfig, Compare, Pred, RunConfig
+
+OK = Pred(ok=True, value="T1", status="success")
+ERROR = Pred(ok=False, status="error")
+
+
+class FlakyPlugin(DemoPlugin):
+    """Devuelve errores desde `fail_from` (credenciales vencidas), `failures` veces o para siempre"""
+
+    executed = 0
+    failures = None
+
+    def obtener_casos(self, config):
+        return [Case(id=f"c{i}", data={"label": "T1"}) for i in range(config.get("num_casos", 100))]
+
+    def ejecutar_test(self, caso, config):
+        FlakyPlugin.executed += 1
+        if int(caso.id[1:]) >= config.get("fail_from", 10 ** 9):
+            if FlakyPlugin.failures is None:
+                return ERROR
+            if FlakyPlugin.failures > 0:
+                FlakyPlugin.failures -= 1
+                return ERROR
+        return OK
+
+
+class AsyncFlakyPlugin(FlakyPlugin):
+    async def ejecutar_test(self, caso, config):
+        await asyncio.sleep(0)
+        return FlakyPlugin.ejecutar_test(self, caso, config)
+
+    async def comparar_resultados(self, caso, pred, config):
+        return Compare(match=pred.ok, truth="T1", pred=pred.value, reason="Match")
+
+
+@pytest.fixture
+def flaky():
+    FlakyPlugin.executed = 0
+    FlakyPlugin.failures = None
+    original_session = PluginFactory._db_session
+    PluginFactory.register("test_flaky", FlakyPlugin)
+    PluginFactory.register("test_flaky_async", AsyncFlakyPlugin)
+    try:
+        yield FlakyPlugin
+    finally:
+        PluginFactory._plugins.pop("test_flaky", None)
+        PluginFactory._plugins.pop("test_flaky_async", None)
+        PluginFactory._db_session = original_session
+
+
+def test_trips_over_sliding_window():
+    stop = threading.Event()
+    breaker = CircuitBreaker(CircuitBreakerConfig(window=10, min_cases=4, max_error_rate=0.5), stop)
+
+    ticket, _ = breaker.acquire()
+    breaker.record(ticket, [ERROR, ERROR, OK])  # menos de min_cases: no se evalúa
+    assert breaker.state == CLOSED
+    breaker.record(ticket, [OK] * 7)
+    breaker.record(ticket, [ERROR] * 5)  # la ventana descarta los más viejos: 5/10
+    assert breaker.state == CLOSED
+    breaker.record(ticket, [ERROR])
+
+    assert breaker.state == ABORTED and stop.is_set()
+    assert "60% de errores en los últimos 10 casos" in breaker.reason
+    assert breaker.acquire() == (None, pytest.approx(0.05))
+
+
+def test_half_open_probe():
+    breaker = CircuitBreaker(
+        CircuitBreakerConfig(window=4, min_cases=4, max_error_rate=0.5, action="pause", pause_seconds=0, max_trips=2),
+        threading.Event(),
+    )
+    stale, _ = breaker.acquire()
+    breaker.record(stale, [ERROR] * 4)
+    assert breaker.state == OPEN
+
+    probe, _ = breaker.acquire()
+    assert breaker.state == HALF_OPEN and probe is not None
+    # Mientras el probe está en vuelo no pasa nada más, y los resultados viejos no cuentan
+    assert breaker.acquire()[0] is None
+    breaker.record(stale, [OK])
+    assert breaker.state == HALF_OPEN
+
+    breaker.record(probe, [ERROR])
+    assert breaker.state == OPEN and len(breaker.trips) == 2
+
+    probe, _ = breaker.acquire()
+    breaker.record(probe, [OK])
+    assert breaker.state == CLOSED
+    ticket, wait = breaker.acquire()
+    assert ticket is not None and wait == 0
+
+
+def test_too_many_trips_abort():
+    stop = threading.Event()
+    breaker = CircuitBreaker(
+        CircuitBreakerConfig(window=1, min_cases=1, max_error_rate=0.5, action="pause", pause_seconds=0, max_trips=1),
+        stop,
+    )
+    ticket, _ = breaker.acquire()
+    breaker.record(ticket, [ERROR])
+    probe, _ = breaker.acquire()
+    breaker.record(probe, [ERROR])
+
+    assert breaker.aborted and stop.is_set()
+    assert "2 aperturas (máximo 1)" in breaker.reason
+
+
+@pytest.mark.parametrize("plugin_name", ["test_flaky", "test_flaky_async"])
+def test_abort_run_on_error_spike(db, flaky, plugin_name):
+    store = ResultStore(db)
+    config = RunConfig(
+        plugin_name=plugin_name, config={"fail_from": 30}, batch_size=1, queue_size=2, concurrency=2,
+        circuit_breaker=CircuitBreakerConfig(window=10, min_cases=10, max_error_rate=0.5),
+    )
+
+    result = MassTestRunner(store).run(config, db)
+
+    run = store.get_run(result.run_id)
+    assert run.status == "failed"
+    assert run.stop_reason.startswith("Circuit breaker:")
+    assert run.circuit_breaker["state"] == "aborted" and len(run.circuit_breaker["trips"]) == 1
+    # Se corta a los pocos errores en lugar de procesar los 100 casos
+    assert 36 <= run.processed_cases == flaky.executed < 45
+    assert run.error_rate is not None
+
+
+def test_pause_and_resume(db, flaky):
+    flaky.failures = 6
+    store = ResultStore(db)
+    config = RunConfig(
+        plugin_name="test_flaky", config={"fail_from": 10, "num_casos": 40}, batch_size=1,
+        circuit_breaker=CircuitBreakerConfig(
+            window=5, min_cases=5, max_error_rate=0.5, action="pause", pause_seconds=0.01, max_trips=10,
+        ),
+    )
+
+    result = MassTestRunner(store).run(config, db)
+
+    run = store.get_run(result.run_id)
+    assert run.status == "completed" and run.stop_reason is None
+    assert run.processed_cases == 40
+    assert run.circuit_breaker["state"] == "closed"
+    assert len(run.circuit_breaker["trips"]) >= 2
+    assert any(trip["probe"] for trip in run.circuit_breaker["trips"])
@@ -0,0 +1,120 @@
+"""Tests para la CLI y los stores livianos"""
+import gzip
+import json
+
+import pytest
+
+from app import cli
+from app.core.plugin import PluginFactory
+from app.core.sinks import JsonlResultStore, MemoryResultStore, SqliteResultStore, open_result_store
+from app.core.store import ResultStore
+from app.models.dto import Case, Compare, Pred
+
+PLUGIN_CODE = '''
+class FilePlugin(TestPlugin):
+    def obtener_casos(self, config):
+        for i in range(config.get("num_casos", 20)):
+            yield Case(id=f"c{i}", data={"label": "T1" if i % 2 else "T2"})
+
+    def ejecutar_test(self, caso, config):
+        i = int(caso.id[1:])
+        if i % 7 == 6:
+            return Pred(ok=False, status="error")
+        return Pred(ok=True, value="T1" if i % 3 else "T2", status="success")
+
+    def comparar_resultados(self, caso, pred, config):
+        truth = caso.data["label"]
+        return Compare(match=pred.value == truth, truth=truth, pred=pred.value, reason="x")
+'''
+
+
+@pytest.fixture
+def plugin_file(tmp_path):
+    path = tmp_path / "file_plugin.py"
+    path.write_text(PLUGIN_CODE)
+    try:
+        yield str(path)
+    finally:
+        PluginFactory._plugins.pop("test_file", None)
+
+
+def run_cli(capsys, *argv):
+    code = cli.main(list(argv))
+    return code, json.loads(capsys.readouterr().out)
+
+
+def test_memory_store_matches_sql_metrics(capsys, plugin_file, tmp_path):
+    code, summary = run_cli(capsys, "test_file", "--plugin-file", plugin_file, "--config", '{"num_casos": 50}')
+    assert code == 0
+    assert summary["status"] == "completed" and summary["processed_cases"] == 50
+
+    db_path = tmp_path / "runs.db"
+    code, sqlite_summary = run_cli(
+        capsys, "test_file", "--plugin-file", plugin_file, "--config", '{"num_casos": 50}',
+        "--store", f"sqlite:{db_path}",
+    )
+    assert code == 0
+    # Mismas métricas que calcula SQL sobre run_details
+    for key in ("accuracy", "coverage", "error_rate", "confusion_matrix"):
+        assert summary[key] == sqlite_summary[key]
+    store = SqliteResultStore(db_path)
+    try:
+        assert store.get_run_details_count(sqlite_summary["run_id"]) == 50
+    finally:
+        store.close()
+
+
+def test_jsonl_store(capsys, plugin_file, tmp_path):
+    path = tmp_path / "out" / "run.jsonl.gz"
+    code, summary = run_cli(
+        capsys, "test_file", "--plugin-file", plugin_file, "--store", f"jsonl:{path}",
+        "--run-config", '{"workers": 2, "batch_size": 4}',
+    )
+
+    assert code == 0
+    with gzip.open(path, "rt") as f:
+        lines = [json.loads(line) for line in f]
+    details = [line for line in lines if line["type"] == "detail"]
+    assert len(details) == 20 and {d["case_id"] for d in details} == {f"c{i}" for i in range(20)}
+    assert lines[-1]["type"] == "run" and lines[-1]["accuracy"] == summary["accuracy"]
+
+
+def test_min_accuracy_and_failures(capsys, plugin_file):
+    code, summary = run_cli(capsys, "test_file", "--plugin-file", plugin_file, "--min-accuracy", "0.99")
+    assert code == 1 and summary["status"] == "completed"
+
+    code, summary = run_cli(capsys, "no_existe")
+    assert code == 1 and summary["status"] == "failed" and "no encontrado" in summary["error"]
+
+
+def test_invalid_arguments(capsys):
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["demo", "--store", "postgres:x"])
+    assert exc.value.code == 2
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["demo", "--run-config", '{"workers": 0}'])
+    assert exc.value.code == 2
+
+
+def test_open_result_store(tmp_path):
+    assert isinstance(open_result_store("memory"), MemoryResultStore)
+    store = open_result_store(f"jsonl:{tmp_path / 'a.jsonl'}")
+    assert isinstance(store, JsonlResultStore)
+    store.close()
+    with pytest.raises(ValueError):
+        open_result_store("sqlite")
+
+
+def test_memory_store_counts_like_compute_metrics(db):
+    results = [
+        (Case(id="a", data={}), Pred(ok=True, value="T1", status="success"), Compare(match=True, truth="T1", pred="T1", reason="")),
+        (Case(id="b", data={}), Pred(ok=True, value="T2", status="success"), Compare(match=False, truth="T1", pred="T2", reason="")),
+        (Case(id="c", data={}), Pred(ok=False, status="error"), Compare(match=False, truth="T1", reason="")),
+        (Case(id="d", data={}), Pred(ok=False, value="T1", status="error"), Compare(match=True, reason="")),
+    ]
+    memory, sql = MemoryResultStore(), ResultStore(db)
+    for store in (memory, sql):
+        run_id = store.create_run("x", {})
+        store.save_details(run_id, results)
+        store.metrics = store.compute_metrics(run_id)
+    assert memory.metrics == sql.metrics
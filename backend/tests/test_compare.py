@@ -0,0 +1,69 @@
+"""Tests para la comparación entre runs"""
+from app.core.store import ResultStore
+from app.models.dto import Case, Pred, Compare
+
+
+def _save_run(store: ResultStore, preds: dict, truth: str = "T1") -> str:
+    run_id = store.create_run("demo", {})
+    for case_id, value in preds.items():
+        store.save_detail(
+            run_id,
+            Case(id=case_id, data={"label": truth}),
+            Pred(ok=True, value=value, status="success"),
+            Compare(match=value == truth, truth=truth, reason="Match" if value == truth else "Mismatch"),
+        )
+    return run_id
+
+
+def test_compare_runs_counts_regressions_and_fixes(db):
+    """Regresiones, fixes y casos presentes en un solo run"""
+    store = ResultStore(db)
+    base = _save_run(store, {"a": "T1", "b": "T1", "c": "T2", "only_base": "T1"})
+    head = _save_run(store, {"a": "T1", "b": "T3", "c": "T1", "only_head": "T1"})
+
+    result = store.compare_runs(base, head)
+
+    assert result.common_cases == 3
+    assert result.only_in_base == 1
+    assert result.only_in_head == 1
+    assert result.regressions == 1
+    assert result.fixes == 1
+    assert result.flipped_total == 2
+    assert {c.case_id for c in result.flipped} == {"b", "c"}
+
+
+def test_compare_runs_confusion_delta_and_filter(db):
+    """El delta es head - base y el filtro limita la lista"""
+    store = ResultStore(db)
+    base = _save_run(store, {"a": "T1", "b": "T1"})
+    head = _save_run(store, {"a": "T1", "b": "T2"})
+
+    result = store.compare_runs(base, head, kind="regressions")
+
+    matrix = result.confusion_matrix_delta["matrix"]
+    assert matrix["T1"]["T1"] == -1
+    assert matrix["T1"]["T2"] == 1
+    assert [c.case_id for c in result.flipped] == ["b"]
+    assert result.flipped[0].base_pred == "T1"
+    assert result.flipped[0].head_pred == "T2"
+    assert store.compare_runs(base, head, kind="fixes").flipped == []
+
+
+def test_compare_runs_with_duplicate_case_ids(db):
+    """Un case_id repetido cuenta una sola vez (se usa su primer detalle)"""
+    store = ResultStore(db)
+    base = _save_run(store, {"a": "T1", "b": "T1"})
+    head = _save_run(store, {"a": "T2", "b": "T1", "c": "T1"})
+    for run_id, value in ((base, "T1"), (base, "T1"), (head, "T1")):
+        store.save_detail(
+            run_id, Case(id="a", data={}), Pred(ok=True, value=value, status="success"),
+            Compare(match=value == "T1", truth="T1", reason="dup"),
+        )
+
+    result = store.compare_runs(base, head)
+
+    assert result.common_cases == 2
+    assert result.only_in_base == 0
+    assert result.only_in_head == 1
+    assert result.regressions == 1 and result.fixes == 0
+    assert [c.case_id for c in result.flipped] == ["a"]
@@ -0,0 +1,136 @@
+"""Tests para los datasets subidos (índice de offsets + mmap)"""
+import io
+import json
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import UploadFile
+
+from app.api import dataset_routes
+from app.core import serialization
+from app.core.datasets import Dataset, import_dataset, open_dataset
+from app.core.plugin import PluginFactory
+from app.core.runner import MassTestRunner
+from app.core.store import ResultStore
+from app.models.dto import Case, RunConfig, SamplingConfig
+
+PLUGIN_CODE = '''
+class DatasetPlugin(TestPlugin):
+    def obtener_casos(self, config):
+        return open_dataset(config["dataset_id"])
+
+    def ejecutar_test(self, caso, config):
+        return Pred(ok=True, value=caso.data["label"], status="success")
+
+    def comparar_resultados(self, caso, pred, config):
+        return Compare(match=True, truth=caso.data["label"], pred=pred.value, reason="Match")
+'''
+
+
+def jsonl(rows):
+    return io.BytesIO("".join(json.dumps(row) + "\n" for row in rows).encode("utf-8"))
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATASETS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_jsonl_random_access(root):
+    rows = [{"id": f"c{i}", "text": f"caso {i}", "label": "T1"} for i in range(10000)]
+    rows.append({"id": "exported", "data": {"text": "como un Case"}})
+    rows.append({"text": "sin id"})
+    meta = import_dataset(jsonl(rows), "demo", "jsonl")
+
+    assert meta["num_cases"] == 10002
+    with open_dataset(meta["dataset_id"]) as dataset:
+        assert len(dataset) == 10002
+        assert dataset[0] == Case(id="c0", data=rows[0])
+        assert dataset[9999].id == "c9999"
+        assert dataset[-2] == Case(id="exported", data={"text": "como un Case"})
+        # Sin id_field: el número de fila
+        assert dataset[-1] == Case(id="10001", data={"text": "sin id"})
+        raw = dataset.raw(5)
+        assert isinstance(raw, memoryview) and json.loads(bytes(raw)) == ["c5", rows[5]]
+        del raw
+        assert [caso.id for caso in dataset[3:6]] == ["c3", "c4", "c5"]
+        with pytest.raises(IndexError):
+            dataset[10002]
+
+        shards = [dataset.shard_bounds(i, 3) for i in range(3)]
+        assert shards == [(0, 3334), (3334, 6668), (6668, 10002)]
+        assert [caso.id for caso in dataset.shard(2, 3)][-1] == "10001"
+        assert sum(1 for _ in dataset) == 10002
+
+
+def test_csv_upload(root):
+    data = "\ufeffid,text,label\na1,hola,T1\na2,\"chau, che\",T2\n".encode("utf-8")
+    upload = UploadFile(io.BytesIO(data), filename="casos.csv")
+
+    info = dataset_routes.upload_dataset(file=upload, name=None, format=None, id_field="id")
+
+    assert info.name == "casos.csv" and info.format == "csv" and info.num_cases == 2
+    cases = dataset_routes.get_dataset_cases(info.dataset_id, offset=1, limit=10)
+    assert cases == [{"id": "a2", "data": {"id": "a2", "text": "chau, che", "label": "T2"}}]
+    assert [d.dataset_id for d in dataset_routes.list_datasets()] == [info.dataset_id]
+    assert dataset_routes.get_dataset(info.dataset_id).num_cases == 2
+
+    dataset_routes.delete_dataset(info.dataset_id)
+    with pytest.raises(HTTPException) as exc:
+        dataset_routes.get_dataset(info.dataset_id)
+    assert exc.value.status_code == 404
+
+
+def test_invalid_upload_leaves_nothing(root):
+    data = io.BytesIO(b'{"id": 1}\nno es json\n')
+    with pytest.raises(HTTPException) as exc:
+        dataset_routes.upload_dataset(
+            file=UploadFile(data, filename="casos.jsonl"), name="x", format=None, id_field="id",
+        )
+    assert exc.value.status_code == 400 and "Línea 2" in exc.value.detail
+    with pytest.raises(HTTPException):
+        dataset_routes.upload_dataset(
+            file=UploadFile(io.BytesIO(b""), filename="casos.xlsx"), name="x", format=None, id_field="id",
+        )
+    assert list(root.iterdir()) == []
+
+
+def test_rejects_path_like_ids(root):
+    with pytest.raises(KeyError):
+        open_dataset("../etc")
+    with pytest.raises(HTTPException) as exc:
+        dataset_routes.delete_dataset("..")
+    assert exc.value.status_code == 404
+
+
+def test_empty_dataset(root):
+    meta = import_dataset(jsonl([]), "vacío", "jsonl")
+    with open_dataset(meta["dataset_id"]) as dataset:
+        assert len(dataset) == 0 and list(dataset) == []
+
+
+def test_stdlib_json_reads_memoryview():
+    assert serialization.JSONSerializer("json").loads(memoryview(b'["a", {}]')) == ["a", {}]
+
+
+def test_dynamic_plugin_reads_dataset(db, root):
+    rows = [{"id": f"c{i}", "label": "T1"} for i in range(500)]
+    meta = import_dataset(jsonl(rows), "demo", "jsonl")
+    plugin = PluginFactory._load_plugin_from_code(PLUGIN_CODE, "test_dataset")
+    original_session = PluginFactory._db_session
+    PluginFactory.register("test_dataset", type(plugin))
+    try:
+        store = ResultStore(db)
+        config = RunConfig(
+            plugin_name="test_dataset", config={"dataset_id": meta["dataset_id"]},
+            sampling=SamplingConfig(sample_size=50, seed=1),
+        )
+        result = MassTestRunner(store).run(config, db)
+    finally:
+        PluginFactory._plugins.pop("test_dataset", None)
+        PluginFactory._db_session = original_session
+
+    run = store.get_run(result.run_id)
+    assert run.status == "completed" and run.processed_cases == 50
+    assert run.sampling["population"] == 500 and isinstance(plugin.obtener_casos(config.config), Dataset)
@@ -0,0 +1,71 @@
+"""Tests para la validación de imports de plugins y sus caches"""
+import pytest
+
+from app.core import deps
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    deps.invalidate_caches()
+    yield
+    deps.invalidate_caches()
+
+
+def test_validate_plugin_imports():
+    assert deps.validate_plugin_imports("import json\nfrom pandas import DataFrame\n") == (True, None)
+
+    ok, error = deps.validate_plugin_imports("import json\nimport numpy\nimport zzz_no_existe\n")
+    assert not ok and error.startswith("Dependency not allowed: numpy")
+
+    ok, error = deps.validate_plugin_imports("def f(:\n")
+    assert not ok and "sintaxis" in error
+
+
+def test_missing_allowed_dependency(monkeypatch):
+    monkeypatch.setattr(deps, "ALLOWED_PACKAGES", deps.ALLOWED_PACKAGES | {"zzz_no_existe"})
+
+    ok, error = deps.validate_plugin_imports("import zzz_no_existe.sub\n")
+
+    assert not ok and error.startswith("Missing dependency: zzz_no_existe")
+
+
+def test_module_availability_is_memoized(monkeypatch):
+    calls = []
+    real_find = deps._find_module
+    monkeypatch.setattr(deps, "_find_module", lambda name: calls.append(name) or real_find(name))
+
+    assert deps.is_module_available("pandas")
+    assert deps.is_module_available("pandas")
+    assert deps.probe_modules(["pandas", "json", "zzz_no_existe"]) == {
+        "json": True, "pandas": True, "zzz_no_existe": False,
+    }
+    assert sorted(calls) == ["json", "pandas", "zzz_no_existe"]
+
+    deps.invalidate_caches()
+    deps.is_module_available("pandas")
+    assert calls.count("pandas") == 2
+
+
+def test_validation_cached_by_code_hash(monkeypatch):
+    code = "import pandas\n"
+    calls = []
+    real_validate = deps._validate_imports
+    monkeypatch.setattr(deps, "_validate_imports", lambda c: calls.append(c) or real_validate(c))
+
+    for _ in range(3):
+        assert deps.validate_plugin_imports(code) == (True, None)
+    deps.validate_plugin_imports(code + "import json\n")
+    assert len(calls) == 2
+
+    deps.invalidate_caches()
+    deps.validate_plugin_imports(code)
+    assert len(calls) == 3
+
+
+def test_validation_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(deps, "VALIDATION_CACHE_SIZE", 4)
+
+    for i in range(10):
+        deps.validate_plugin_imports(f"x = {i}\n")
+
+    assert len(deps._validation_cache) == 4
@@ -0,0 +1,74 @@
+"""Tests para el plugin de carga y el servidor stand-in"""
+import random
+
+import pytest
+
+from app.core.loadtest import LatencyModel, StandInServer
+from app.core.plugin import LoadTestPlugin, PluginFactory
+
+
+def test_latency_distributions():
+    """fixed es constante, heavy_tail nunca baja del mínimo y todas respetan el tope"""
+    rng = random.Random(1)
+    assert LatencyModel("fixed", 20).sample_ms(rng) == 20
+
+    lognormal = [LatencyModel("lognormal", 20, sigma=0.5).sample_ms(rng) for _ in range(2000)]
+    assert 15 < sorted(lognormal)[1000] < 25  # mediana ~ latency_ms
+
+    tail = [LatencyModel("heavy_tail", 10, tail_alpha=1.1, max_ms=500).sample_ms(rng) for _ in range(2000)]
+    assert min(tail) >= 10
+    assert max(tail) <= 500
+
+    with pytest.raises(ValueError):
+        LatencyModel("uniform")
+
+
+def test_loadtest_plugin_is_registered_and_deterministic():
+    """Con seed, los mismos casos dan las mismas predicciones"""
+    plugin = PluginFactory.get("loadtest")
+    assert isinstance(plugin, LoadTestPlugin)
+
+    config = {"num_casos": 30, "seed": 7, "latency_ms": 0, "error_rate": 0.2, "raw_bytes": 1000}
+    first = [plugin.ejecutar_test(c, config) for c in plugin.obtener_casos(config)]
+    second = [plugin.ejecutar_test(c, config) for c in plugin.obtener_casos(config)]
+
+    assert [(p.status, p.value) for p in first] == [(p.status, p.value) for p in second]
+    assert any(p.status == "error" for p in first)
+    assert all(len(p.raw) > 1000 for p in first if p.ok)
+
+
+def test_loadtest_plugin_local_timeouts():
+    """timeout_rate=1 devuelve status timeout luego de timeout_ms"""
+    plugin = LoadTestPlugin()
+    config = {"num_casos": 1, "timeout_rate": 1.0, "timeout_ms": 5}
+    caso = next(iter(plugin.obtener_casos(config)))
+
+    pred = plugin.ejecutar_test(caso, config)
+    cmp = plugin.comparar_resultados(caso, pred, config)
+
+    assert pred.ok is False and pred.status == "timeout"
+    assert cmp.match is False
+
+
+def test_loadtest_plugin_http_mode_against_stand_in_server():
+    """El plugin en modo http usa el servidor: ok, errores y timeouts del cliente"""
+    server = StandInServer(defaults={"latency_ms": 1, "accuracy": 1.0, "raw_bytes": 64})
+    url = server.start()
+    plugin = LoadTestPlugin()
+    try:
+        config = {"num_casos": 3, "mode": "http", "server_url": url, "timeout_ms": 2000}
+        preds = [(c, plugin.ejecutar_test(c, config)) for c in plugin.obtener_casos(config)]
+        assert all(p.ok and p.value == c.data["label"] for c, p in preds)
+        assert preds[0][1].meta["latency_ms"] > 0
+
+        batch = plugin.ejecutar_batch([c for c, _ in preds], config)
+        assert [p.value for p in batch] == [c.data["label"] for c, _ in preds]
+
+        server.defaults["error_rate"] = 1.0
+        caso = preds[0][0]
+        assert plugin.ejecutar_test(caso, config).status == "error"
+
+        server.defaults.update({"error_rate": 0.0, "timeout_rate": 1.0, "timeout_ms": 100})
+        assert plugin.ejecutar_test(caso, {**config, "timeout_ms": 50}).status == "timeout"
+    finally:
+        server.stop()
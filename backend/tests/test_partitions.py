@@ -0,0 +1,41 @@
+"""Tests para el particionado de run_details"""
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.core.store import ResultStore
+from app.db import partitions
+
+
+def test_hash_partition_names():
+    """El conjunto de particiones es fijo (no depende de los runs)"""
+    names = partitions.partition_names()
+
+    assert len(names) == partitions.HASH_PARTITIONS
+    assert names[0] == "run_details_p00" and names[-1] == "run_details_p15"
+
+
+def test_not_partitioned_on_sqlite():
+    """Sin PostgreSQL no hay particionado"""
+    db = sessionmaker(bind=create_engine("sqlite://"))()
+
+    assert partitions.is_partitioned(db) is False
+
+
+def test_create_and_delete_run_without_ddl(db):
+    """Crear y borrar un run sólo toca filas (no crea ni borra tablas)"""
+    statements = []
+    engine = db.get_bind()
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        store = ResultStore(db)
+        run_id = store.create_run("demo", {})
+        store.delete_run(run_id)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert store.get_run(run_id) is None
+    assert not [s for s in statements if s.lstrip().upper().startswith(("CREATE", "DROP", "ALTER"))]
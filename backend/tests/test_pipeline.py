@@ -0,0 +1,159 @@
+"""Tests para el pipeline por etapas del runner (colas acotadas y métricas)"""
+import threading
+import time
+
+import pytest
+
+from app.core.pipeline import END, Pipeline, PipelineAborted
+from app.core.plugin import DemoPlugin, PluginFactory
+from app.core.runner import MassTestRunner
+from app.core.store import ResultStore
+from app.models.dto import Case, Compare, Pred, RunConfig
+
+
+class SlowComparePlugin(DemoPlugin):
+    """Ejecuta rápido y compara lento: la cola executed se llena"""
+
+    def obtener_casos(self, config):
+        return [Case(id=f"c{i}", data={"label": "T1"}) for i in range(config.get("num_casos", 10))]
+
+    def ejecutar_test(self, caso, config):
+        if caso.id == config.get("fail_execute_on"):
+            raise RuntimeError("falló execute")
+        return Pred(ok=True, value="T1", status="success")
+
+    def comparar_resultados(self, caso, pred, config):
+        if caso.id == config.get("fail_compare_on"):
+            raise RuntimeError("falló compare")
+        time.sleep(config.get("compare_sleep", 0))
+        return Compare(match=True, truth="T1", pred=pred.value, reason="Match")
+
+
+@pytest.fixture
+def slow_plugin():
+    original_session = PluginFactory._db_session
+    PluginFactory.register("test_pipeline", SlowComparePlugin)
+    try:
+        yield
+    finally:
+        PluginFactory._plugins.pop("test_pipeline", None)
+        PluginFactory._db_session = original_session
+
+
+def test_metrics_are_persisted(db, slow_plugin):
+    store = ResultStore(db)
+    config = RunConfig(plugin_name="test_pipeline", config={"num_casos": 30}, workers=2, compare_workers=2)
+
+    result = MassTestRunner(store).run(config, db)
+
+    run = store.get_run(result.run_id)
+    assert run.status == "completed" and run.processed_cases == 30
+    stages = run.pipeline_metrics["stages"]
+    assert set(stages) == {"produce", "execute", "compare", "persist"}
+    assert stages["execute"]["workers"] == 2 and stages["compare"]["workers"] == 2
+    assert all(stage["items"] == 30 for stage in stages.values())
+    assert set(run.pipeline_metrics["queues"]) == {"units", "executed", "compared"}
+
+
+def test_backpressure_bounds_queues(db, slow_plugin):
+    store = ResultStore(db)
+    config = RunConfig(
+        plugin_name="test_pipeline", config={"num_casos": 40, "compare_sleep": 0.005}, queue_size=3,
+    )
+
+    result = MassTestRunner(store).run(config, db)
+
+    queues = store.get_run(result.run_id).pipeline_metrics["queues"]
+    assert all(q["max_depth"] <= 3 for q in queues.values())
+    # El compare lento frena a execute: sus puts esperan a que haya lugar
+    assert queues["executed"]["max_depth"] == 3
+    assert queues["executed"]["put_wait_seconds"] > 0
+
+
+@pytest.mark.parametrize("failure", ["fail_execute_on", "fail_compare_on"])
+def test_stage_error_fails_run(db, slow_plugin, failure):
+    store = ResultStore(db)
+    config = RunConfig(plugin_name="test_pipeline", config={"num_casos": 20, failure: "c10"}, batch_size=1)
+
+    with pytest.raises(RuntimeError, match="falló"):
+        MassTestRunner(store).run(config, db)
+
+    run = store.get_runs()[0]
+    assert run.status == "failed"
+    assert run.pipeline_metrics is not None
+    # Lo ya ejecutado y comparado antes de la falla se guarda igual
+    assert run.processed_cases == 10
+    # Ningún thread del pipeline queda vivo
+    assert not any(t.name.startswith("pipeline-") for t in threading.enumerate())
+
+
+def test_abort_unblocks_waiting_stages():
+    pipeline = Pipeline()
+    full = pipeline.queue("q", 1)
+    full.put(1)
+    blocked = []
+
+    def producer():
+        try:
+            full.put(2)
+        except PipelineAborted:
+            blocked.append("aborted")
+
+    pipeline.spawn("producer", producer)
+    pipeline.fail(RuntimeError("boom"))
+    pipeline.join()
+
+    assert blocked == ["aborted"]
+    assert isinstance(pipeline.errors[0], RuntimeError)
+    with pytest.raises(PipelineAborted):
+        full.get()
+
+
+def test_last_worker_sends_end_per_consumer():
+    pipeline = Pipeline()
+    downstream = pipeline.queue("out", 4)
+    stage = pipeline.stage("s", workers=2)
+
+    stage.worker_finished(downstream, consumers=3)
+    assert not stage.done.is_set() and downstream.puts == 0
+
+    stage.worker_finished(downstream, consumers=3)
+    assert stage.done.is_set()
+    assert [downstream.get() for _ in range(3)] == [END, END, END]
+
+
+class StreamingPlugin(SlowComparePlugin):
+    """obtener_casos como generador: registra cuánto se adelanta la lectura a la ejecución"""
+
+    produced = executed = max_ahead = 0
+
+    def obtener_casos(self, config):
+        for i in range(config.get("num_casos", 10)):
+            cls = StreamingPlugin
+            cls.produced += 1
+            cls.max_ahead = max(cls.max_ahead, cls.produced - cls.executed)
+            yield Case(id=f"c{i}", data={"label": "T1"})
+
+    def ejecutar_test(self, caso, config):
+        StreamingPlugin.executed += 1
+        return super().ejecutar_test(caso, config)
+
+
+def test_generator_source_is_streamed(db):
+    """Un generador no se materializa: las colas acotan la lectura y el total se guarda al final"""
+    StreamingPlugin.produced = StreamingPlugin.executed = StreamingPlugin.max_ahead = 0
+    original_session = PluginFactory._db_session
+    PluginFactory.register("test_streaming", StreamingPlugin)
+    try:
+        store = ResultStore(db)
+        result = MassTestRunner(store).run(
+            RunConfig(plugin_name="test_streaming", config={"num_casos": 2000}, queue_size=4), db
+        )
+    finally:
+        PluginFactory._plugins.pop("test_streaming", None)
+        PluginFactory._db_session = original_session
+
+    run = store.get_run(result.run_id)
+    assert run.status == "completed"
+    assert run.total_cases == run.processed_cases == 2000
+    assert StreamingPlugin.max_ahead < 100
@@ -1,6 +1,10 @@
 """Tests para PluginFactory"""
 import pytest
+from fastapi import HTTPException
+
+from app.api import plugin_routes
 from app.core.plugin import PluginFactory, DemoPlugin
+from app.models.dto import PluginUpdate
 
 
 def test_plugin_factory_get_demo():
@@ -14,3 +18,21 @@ def test_plugin_factory_invalid_plugin():
     """Test que PluginFactory lanza error para plugin inválido"""
     with pytest.raises(ValueError, match="no encontrado"):
         PluginFactory.get("invalid_plugin")
+
+
+def test_builtin_plugins_listed_from_factory(db):
+    """Un built-in registrado aparece en la API con los metadatos de su clase y no se edita"""
+    class OtherBuiltin(DemoPlugin):
+        display_name = "Otro"
+        config_schema = {"umbral": "float"}
+
+    PluginFactory.register("test_builtin", OtherBuiltin)
+    try:
+        info = plugin_routes.get_plugin("test_builtin", db)
+        assert info.display_name == "Otro" and info.config_schema == {"umbral": "float"}
+        assert "test_builtin" in [p.plugin_name for p in plugin_routes.list_plugins(db)]
+        assert plugin_routes.get_plugin("demo", db).config_schema == DemoPlugin.config_schema
+        with pytest.raises(HTTPException):
+            plugin_routes.update_plugin("test_builtin", PluginUpdate(display_name="x"), db=db)
+    finally:
+        PluginFactory._plugins.pop("test_builtin", None)
@@ -0,0 +1,101 @@
+"""Tests para setup/teardown de plugins y workers con instancia propia"""
+import threading
+
+import pytest
+
+from app.core.loadtest import StandInServer
+from app.core.plugin import DemoPlugin, LoadTestPlugin, PluginFactory
+from app.core.runner import MassTestRunner
+from app.core.store import ResultStore
+from app.models.dto import Case, Pred, RunConfig
+
+
+class ResourcePlugin(DemoPlugin):
+    """Plugin que abre un "recurso" en setup y registra su uso por thread"""
+
+    events = []
+    lock = threading.Lock()
+
+    def setup(self, config):
+        self.resource = {"thread": threading.get_ident(), "uses": 0}
+        with self.lock:
+            ResourcePlugin.events.append(("setup", self.resource["thread"]))
+        if config.get("fail_setup"):
+            raise RuntimeError("no hay conexión")
+
+    def teardown(self):
+        with self.lock:
+            ResourcePlugin.events.append(("teardown", threading.get_ident()))
+
+    def obtener_casos(self, config):
+        return [Case(id=f"c{i}", data={"label": "T1"}) for i in range(config.get("num_casos", 10))]
+
+    def ejecutar_test(self, caso, config):
+        # El recurso se usa siempre desde el thread que lo abrió
+        assert self.resource["thread"] == threading.get_ident()
+        self.resource["uses"] += 1
+        return Pred(ok=True, value="T1", status="success")
+
+
+@pytest.fixture
+def resource_plugin():
+    ResourcePlugin.events = []
+    original_session = PluginFactory._db_session
+    PluginFactory.register("test_resource", ResourcePlugin)
+    try:
+        yield ResourcePlugin
+    finally:
+        PluginFactory._plugins.pop("test_resource", None)
+        PluginFactory._db_session = original_session
+
+
+def test_setup_and_teardown_once_per_run(db, resource_plugin):
+    store = ResultStore(db)
+    result = MassTestRunner(store).run(RunConfig(plugin_name="test_resource", config={"num_casos": 20}), db)
+
+    assert [e for e, _ in resource_plugin.events] == ["setup", "teardown"]
+    assert store.get_run(result.run_id).processed_cases == 20
+
+
+def test_workers_get_their_own_instance(db, resource_plugin):
+    """Con workers=4: un setup por worker (más el de obtener_casos), todos con teardown"""
+    store = ResultStore(db)
+    result = MassTestRunner(store).run(
+        RunConfig(plugin_name="test_resource", config={"num_casos": 50}, workers=4), db
+    )
+
+    setups = [t for e, t in resource_plugin.events if e == "setup"]
+    teardowns = [t for e, t in resource_plugin.events if e == "teardown"]
+    assert len(setups) == 5
+    assert sorted(setups) == sorted(teardowns)
+    assert store.get_run(result.run_id).processed_cases == 50
+    assert result.metrics.accuracy == 1.0
+
+
+def test_teardown_runs_when_setup_fails(db, resource_plugin):
+    store = ResultStore(db)
+    with pytest.raises(RuntimeError, match="no hay conexión"):
+        MassTestRunner(store).run(RunConfig(plugin_name="test_resource", config={"fail_setup": True}), db)
+
+    assert [e for e, _ in resource_plugin.events] == ["setup", "teardown"]
+    assert store.get_runs()[0].status == "failed"
+
+
+def test_loadtest_plugin_reuses_connection():
+    """En modo http setup abre una conexión keep-alive que se reusa entre casos"""
+    server = StandInServer(defaults={"latency_ms": 0})
+    server.start()
+    plugin = LoadTestPlugin()
+    config = {"num_casos": 5, "mode": "http", "server_url": server.url}
+    try:
+        plugin.setup(config)
+        preds = [plugin.ejecutar_test(c, config) for c in plugin.obtener_casos(config)]
+        sock = plugin._connection.sock
+        plugin.ejecutar_test(Case(id="x", data={"label": "T1"}), config)
+
+        assert all(p.ok for p in preds)
+        assert sock is not None and plugin._connection.sock is sock
+    finally:
+        plugin.teardown()
+        server.stop()
+    assert plugin._connection is None
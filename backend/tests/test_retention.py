@@ -0,0 +1,66 @@
+"""Tests para borrado de runs y política de retención"""
+from datetime import datetime, timedelta
+
+from app.core.retention import RetentionPolicy, sweep
+from app.core.store import ResultStore
+from app.models.db import Run, RunDetail
+from app.models.dto import Case, Pred, Compare
+
+
+def _create_run(store: ResultStore, plugin_name: str, num_details: int, age_days: float = 0) -> str:
+    run_id = store.create_run(plugin_name, {})
+    for i in range(num_details):
+        store.save_detail(
+            run_id,
+            Case(id=f"case_{i}", data={"label": "T1"}),
+            Pred(ok=True, value="T1", status="success"),
+            Compare(match=True, truth="T1", reason="Match"),
+        )
+    run = store.get_run(run_id)
+    run.status = "completed"
+    run.created_at = datetime.utcnow() - timedelta(days=age_days)
+    store.db.commit()
+    return run_id
+
+
+def test_delete_run_in_chunks(db):
+    """delete_run elimina el run y sus detalles en chunks"""
+    store = ResultStore(db)
+    run_id = _create_run(store, "demo", num_details=7)
+    other_id = _create_run(store, "demo", num_details=2)
+
+    store.delete_run(run_id, chunk_size=3)
+
+    assert store.get_run(run_id) is None
+    assert db.query(RunDetail).filter(RunDetail.run_id == run_id).count() == 0
+    assert db.query(RunDetail).filter(RunDetail.run_id == other_id).count() == 2
+
+
+def test_retention_keep_last_per_plugin(db):
+    """Se conservan los últimos N runs de cada plugin"""
+    store = ResultStore(db)
+    old_demo = _create_run(store, "demo", 1, age_days=3)
+    new_demo = _create_run(store, "demo", 1, age_days=1)
+    other = _create_run(store, "other", 1, age_days=5)
+
+    deleted = sweep(db, RetentionPolicy(keep_last=1))
+
+    assert deleted == 1
+    assert store.get_run(old_demo) is None
+    assert store.get_run(new_demo) is not None
+    assert store.get_run(other) is not None
+
+
+def test_retention_max_age_skips_running(db):
+    """La edad máxima no elimina runs en ejecución"""
+    store = ResultStore(db)
+    old = _create_run(store, "demo", 1, age_days=10)
+    running = _create_run(store, "demo", 1, age_days=10)
+    store.get_run(running).status = "running"
+    db.commit()
+
+    policy = RetentionPolicy(max_age_days=7)
+
+    assert policy.expired_run_ids(db) == [old]
+    sweep(db, policy)
+    assert db.query(Run).count() == 1
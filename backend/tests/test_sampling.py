@@ -0,0 +1,155 @@
+"""Tests para el modo muestreo con corte por intervalo de confianza"""
+import asyncio
+import threading
+
+import pytest
+
+from app.core.plugin import DemoPlugin, PluginFactory
+from app.core.runner import MassTestRunner
+from app.core.sampling import MAX_STRATA, CaseSampler, wilson_interval
+from app.core.store import ResultStore
+from app.models.dto import Case, Compare, Pred, RunConfig, SamplingConfig
+
+HIT = Compare(match=True, truth="T1", pred="T1", reason="Match")
+MISS = Compare(match=False, truth="T1", pred="T2", reason="Mismatch")
+PRED = Pred(ok=True, value="T1", status="success")
+
+
+class LargePlugin(DemoPlugin):
+    """Dataset grande (como stream) con 90% de aciertos"""
+
+    executed = 0
+
+    def obtener_casos(self, config):
+        for i in range(config.get("num_casos", 5000)):
+            yield Case(id=f"c{i}", data={"label": "T1"})
+
+    def ejecutar_test(self, caso, config):
+        LargePlugin.executed += 1
+        return Pred(ok=True, value="T1" if int(caso.id[1:]) % 10 else "T2", status="success")
+
+    def comparar_resultados(self, caso, pred, config):
+        return HIT if pred.value == "T1" else MISS
+
+
+class AsyncLargePlugin(LargePlugin):
+    async def ejecutar_test(self, caso, config):
+        await asyncio.sleep(0)
+        return LargePlugin.ejecutar_test(self, caso, config)
+
+
+@pytest.fixture
+def large():
+    LargePlugin.executed = 0
+    original_session = PluginFactory._db_session
+    PluginFactory.register("test_large", LargePlugin)
+    PluginFactory.register("test_large_async", AsyncLargePlugin)
+    try:
+        yield LargePlugin
+    finally:
+        PluginFactory._plugins.pop("test_large", None)
+        PluginFactory._plugins.pop("test_large_async", None)
+        PluginFactory._db_session = original_session
+
+
+def test_wilson_interval():
+    low, high = wilson_interval(50, 100)
+    assert low == pytest.approx(0.4038, abs=1e-4) and high == pytest.approx(0.5962, abs=1e-4)
+    # A diferencia del intervalo normal, no colapsa en 0 ni en 1
+    low, high = wilson_interval(20, 20)
+    assert 0.8 < low < 1 and high == 1.0
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+
+
+def test_reservoir_over_stream():
+    stream = (Case(id=f"c{i}", data={}) for i in range(1000))
+    sampler = CaseSampler(SamplingConfig(sample_size=100, seed=7))
+
+    sample = sampler.draw(stream)
+
+    assert len(sample) == 100 and len({caso.id for caso in sample}) == 100
+    assert sampler.population == 1000 and sampler.strata == {"all": {"population": 1000, "sample": 100}}
+    # Reproducible con la misma semilla, y no son los primeros casos del stream
+    again = CaseSampler(SamplingConfig(sample_size=100, seed=7)).draw(Case(id=f"c{i}", data={}) for i in range(1000))
+    assert [caso.id for caso in again] == [caso.id for caso in sample]
+    assert max(int(caso.id[1:]) for caso in sample) > 500
+
+
+def test_stratified_prefixes_keep_proportions():
+    casos = [Case(id=f"c{i}", data={"label": "B" if i % 10 == 0 else "A"}) for i in range(2000)]
+    sampler = CaseSampler(SamplingConfig(sample_size=200, stratify_by="label", seed=1))
+
+    sample = sampler.draw(casos)
+
+    assert sampler.strata == {"A": {"population": 1800, "sample": 180}, "B": {"population": 200, "sample": 20}}
+    # Cualquier prefijo mantiene la proporción (el corte temprano no sesga)
+    for n in (10, 50, 100, 200):
+        minority = sum(caso.data["label"] == "B" for caso in sample[:n])
+        assert abs(minority - n / 10) <= 1
+
+
+def test_small_population_is_kept_whole():
+    casos = [Case(id=f"c{i}", data={"label": str(i % 3)}) for i in range(30)]
+    sample = CaseSampler(SamplingConfig(sample_size=100, stratify_by="label")).draw(casos)
+    assert sorted(caso.id for caso in sample) == sorted(caso.id for caso in casos)
+
+
+def test_too_many_strata():
+    casos = [Case(id=f"c{i}", data={"id": i}) for i in range(MAX_STRATA + 1)]
+    with pytest.raises(ValueError, match="stratify_by"):
+        CaseSampler(SamplingConfig(stratify_by="id")).draw(casos)
+
+
+def test_stops_when_interval_is_narrow():
+    stop = threading.Event()
+    sampler = CaseSampler(SamplingConfig(target_width=0.1, min_cases=50), stop)
+
+    for i in range(1000):
+        sampler.observe(PRED, MISS if i % 10 == 0 else HIT)
+        if stop.is_set():
+            break
+
+    assert sampler.converged
+    # Con p ≈ 0.9 el ancho llega a 0.1 cerca de los 140 casos
+    assert 120 < sampler.evaluated < 160
+    report = sampler.report()
+    assert report["ci_width"] <= 0.1 and report["ci_low"] < report["accuracy"] < report["ci_high"]
+    # Los casos sin pred.value no cuentan (igual que en compute_metrics)
+    sampler.observe(Pred(ok=False, status="error"), MISS)
+    assert sampler.evaluated == report["evaluated"]
+
+
+@pytest.mark.parametrize("plugin_name", ["test_large", "test_large_async"])
+def test_run_stops_early(db, large, plugin_name):
+    store = ResultStore(db)
+    config = RunConfig(
+        plugin_name=plugin_name, batch_size=1, queue_size=2, concurrency=2,
+        sampling=SamplingConfig(sample_size=2000, target_width=0.1, min_cases=50, seed=3),
+    )
+
+    result = MassTestRunner(store).run(config, db)
+
+    run = store.get_run(result.run_id)
+    assert run.status == "completed" and run.stop_reason.startswith("Muestreo: IC 95%")
+    assert run.total_cases == 2000
+    assert run.processed_cases == large.executed < 200
+    sampling = run.sampling
+    assert sampling["population"] == 5000 and sampling["sample_size"] == 2000
+    assert sampling["stopped_early"] and sampling["evaluated"] == run.processed_cases
+    assert sampling["accuracy"] == pytest.approx(run.accuracy)
+    assert sampling["ci_low"] <= 0.9 <= sampling["ci_high"]
+
+
+def test_run_without_convergence_evaluates_whole_sample(db, large):
+    store = ResultStore(db)
+    config = RunConfig(
+        plugin_name="test_large", config={"num_casos": 300},
+        sampling=SamplingConfig(sample_size=100, target_width=0.001),
+    )
+
+    result = MassTestRunner(store).run(config, db)
+
+    run = store.get_run(result.run_id)
+    assert run.status == "completed" and run.stop_reason is None
+    assert run.processed_cases == 100
+    assert run.sampling["stopped_early"] is False and run.sampling["evaluated"] == 100
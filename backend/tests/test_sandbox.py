@@ -0,0 +1,143 @@
+"""Tests para el sandbox de subprocesos (PLUGIN_EXECUTION_MODE=subprocess)"""
+import os
+import sys
+
+import pytest
+
+from app.core import sandbox
+from app.core.plugin import PluginFactory
+from app.core.runner import MassTestRunner
+from app.core.store import ResultStore
+from app.models.db import Plugin
+from app.models.dto import RunConfig
+
+PLUGIN_CODE = '''
+import os
+
+class PidPlugin(TestPlugin):
+    def setup(self, config):
+        print("setup en el worker")  # no debe romper el protocolo
+        self.setups = getattr(self, "setups", 0) + 1
+
+    def obtener_casos(self, config):
+        return [Case(id=f"c{i}", data={"label": "T1"}) for i in range(config.get("num_casos", 10))]
+
+    def ejecutar_test(self, caso, config):
+        if config.get("crash_on") == caso.id:
+            os._exit(3)
+        if config.get("allocate_mb"):
+            bytearray(config["allocate_mb"] * 1024 * 1024)
+        return Pred(ok=True, value="T1", status="success", meta={"pid": os.getpid(), "setups": self.setups})
+
+    def comparar_resultados(self, caso, pred, config):
+        return Compare(match=pred.value == caso.data["label"], truth=caso.data["label"], pred=pred.value,
+                       reason="Match", detail={"pid": os.getpid()})
+'''
+
+
+@pytest.fixture
+def sandbox_mode(monkeypatch):
+    monkeypatch.setenv("PLUGIN_EXECUTION_MODE", "subprocess")
+    original_session = PluginFactory._db_session
+    try:
+        yield monkeypatch
+    finally:
+        sandbox.shutdown_pools()
+        PluginFactory._db_session = original_session
+
+
+def _add_plugin(db, name: str, code: str = PLUGIN_CODE) -> None:
+    db.add(Plugin(plugin_name=name, display_name=name, code=code, config_schema={}))
+    db.commit()
+
+
+def _pids(store, run_id):
+    return {d.pred_meta["pid"] for d in store.get_run_details(run_id, limit=1000)}
+
+
+def test_runs_plugin_in_worker_process(db, sandbox_mode):
+    _add_plugin(db, "sb-basic")
+    store = ResultStore(db)
+
+    result = MassTestRunner(store).run(RunConfig(plugin_name="sb-basic", config={"num_casos": 20}), db)
+
+    assert result.metrics.accuracy == 1.0
+    assert store.get_run(result.run_id).processed_cases == 20
+    details = store.get_run_details(result.run_id, limit=100)
+    assert {d.compare_detail["pid"] for d in details} == _pids(store, result.run_id)
+    assert os.getpid() not in _pids(store, result.run_id)
+    assert "plugin_sb_basic" not in sys.modules
+
+
+def test_workers_are_reused_and_recycled(db, sandbox_mode):
+    sandbox_mode.setenv("PLUGIN_SANDBOX_MAX_CASES", "8")
+    sandbox_mode.setenv("PLUGIN_SANDBOX_WORKERS", "1")
+    _add_plugin(db, "sb-recycle")
+    store = ResultStore(db)
+    runner = MassTestRunner(store)
+
+    first = runner.run(RunConfig(plugin_name="sb-recycle", config={"num_casos": 4}), db)
+    second = runner.run(RunConfig(plugin_name="sb-recycle", config={"num_casos": 4}), db)
+    # Mismo worker pre-cargado en los dos runs (se recicla recién al llegar a 8 casos)
+    assert _pids(store, first.run_id) == _pids(store, second.run_id)
+
+    big = runner.run(RunConfig(plugin_name="sb-recycle", config={"num_casos": 24}, batch_size=4), db)
+    assert len(_pids(store, big.run_id)) >= 3
+    # Cada worker nuevo recibe su propio setup
+    assert {d.pred_meta["setups"] for d in store.get_run_details(big.run_id, limit=100)} == {1}
+
+
+def test_worker_crash_fails_run(db, sandbox_mode):
+    _add_plugin(db, "sb-crash")
+    store = ResultStore(db)
+
+    with pytest.raises(sandbox.SandboxError, match="exit code 3"):
+        MassTestRunner(store).run(
+            RunConfig(plugin_name="sb-crash", config={"num_casos": 5, "crash_on": "c2"}, batch_size=1), db
+        )
+
+    run = store.get_runs()[0]
+    assert run.status == "failed"
+    assert run.processed_cases == 2
+
+
+@pytest.mark.skipif(sandbox.resource is None, reason="rlimits sólo en POSIX")
+def test_memory_limit(db, sandbox_mode):
+    sandbox_mode.setenv("PLUGIN_SANDBOX_MEMORY_MB", "512")
+    _add_plugin(db, "sb-memory")
+
+    with pytest.raises(RuntimeError):
+        MassTestRunner(ResultStore(db)).run(
+            RunConfig(plugin_name="sb-memory", config={"num_casos": 1, "allocate_mb": 1024}), db
+        )
+
+
+def test_load_errors_mark_plugin(db, sandbox_mode):
+    _add_plugin(db, "sb-noclass", code="x = 1\n")
+
+    success, message = PluginFactory.test_plugin("sb-noclass", db)
+
+    assert not success and "No se encontró una clase" in message
+    assert db.get(Plugin, "sb-noclass").status == "error"
+
+
+def test_smoke_test_through_proxy(db, sandbox_mode):
+    _add_plugin(db, "sb-smoke")
+
+    assert PluginFactory.test_plugin("sb-smoke", db) == (True, None)
+
+
+def test_cases_stream_in_chunks_across_recycling(db, sandbox_mode, monkeypatch):
+    """obtener_casos llega por chunks y sigue aunque el worker se recicle en el medio"""
+    monkeypatch.setattr(sandbox, "CASES_CHUNK", 3)
+    sandbox_mode.setenv("PLUGIN_SANDBOX_MAX_CASES", "8")
+    _add_plugin(db, "sb-stream")
+    store = ResultStore(db)
+
+    result = MassTestRunner(store).run(
+        RunConfig(plugin_name="sb-stream", config={"num_casos": 20}, batch_size=4), db
+    )
+
+    assert store.get_run(result.run_id).status == "completed"
+    assert store.get_run_details_count(result.run_id) == 20
+    assert len(_pids(store, result.run_id)) >= 2
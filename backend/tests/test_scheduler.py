@@ -0,0 +1,133 @@
+"""Tests para el scheduler de runs (cola, capacidad, prioridad y fair share)"""
+import threading
+
+import pytest
+
+from app.core.scheduler import RunScheduler, SchedulerConfig, fail_orphaned_queued_runs, parse_plugin_limits
+from app.core.store import ResultStore
+from app.models.dto import RunConfig
+
+
+class FakeRuns:
+    """execute() que registra el orden de arranque y bloquea hasta release()"""
+
+    def __init__(self):
+        self.started = []
+        self.gates = {}
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def execute(self, run_id, config):
+        with self.changed:
+            self.started.append(run_id)
+            gate = self.gates.setdefault(run_id, threading.Event())
+            self.changed.notify_all()
+        gate.wait(5)
+
+    def wait_started(self, count):
+        with self.changed:
+            assert self.changed.wait_for(lambda: len(self.started) >= count, 5)
+
+    def release(self, run_id):
+        with self.lock:
+            self.gates.setdefault(run_id, threading.Event()).set()
+
+
+@pytest.fixture
+def fake():
+    runs = FakeRuns()
+    yield runs
+    for run_id in list(runs.gates):
+        runs.release(run_id)
+
+
+def _config(plugin="demo", **kwargs):
+    return RunConfig(plugin_name=plugin, **kwargs)
+
+
+def test_global_limit_and_queue_positions(fake):
+    scheduler = RunScheduler(fake.execute, SchedulerConfig(max_concurrent_runs=2))
+
+    assert scheduler.submit("r1", _config()) is None
+    assert scheduler.submit("r2", _config()) is None
+    assert scheduler.submit("r3", _config()) == 1
+    assert scheduler.submit("r4", _config()) == 2
+    fake.wait_started(2)
+
+    snapshot = scheduler.snapshot()
+    assert [r["run_id"] for r in snapshot["running"]] == ["r1", "r2"]
+    assert [(r["run_id"], r["queue_position"]) for r in snapshot["queued"]] == [("r3", 1), ("r4", 2)]
+
+    fake.release("r1")
+    fake.wait_started(3)
+    assert fake.started[2] == "r3"
+    assert scheduler.position("r4") == 1
+
+    for run_id in ("r2", "r3", "r4"):
+        fake.release(run_id)
+    assert scheduler.wait_idle(5)
+
+
+def test_plugin_limit_does_not_block_other_plugins(fake):
+    scheduler = RunScheduler(fake.execute, SchedulerConfig(max_concurrent_runs=3, plugin_limits={"api": 1}))
+
+    scheduler.submit("api-1", _config("api"))
+    scheduler.submit("api-2", _config("api"))
+    scheduler.submit("demo-1", _config("demo"))
+    fake.wait_started(2)
+
+    assert sorted(fake.started) == ["api-1", "demo-1"]
+    assert scheduler.position("api-2") == 1
+
+    fake.release("api-1")
+    fake.wait_started(3)
+    assert fake.started[2] == "api-2"
+
+
+def test_priority_then_fair_share(fake):
+    scheduler = RunScheduler(fake.execute, SchedulerConfig(max_concurrent_runs=1))
+
+    scheduler.submit("a-1", _config(owner="ana"))
+    fake.wait_started(1)
+    scheduler.submit("a-2", _config(owner="ana"))
+    scheduler.submit("a-3", _config(owner="ana"))
+    scheduler.submit("b-1", _config(owner="beto"))
+    scheduler.submit("urgent", _config(owner="ana", priority=5))
+
+    # Prioridad primero; a igual prioridad, beto (sin runs activos) antes que ana
+    assert [r["run_id"] for r in scheduler.snapshot()["queued"]] == ["urgent", "b-1", "a-2", "a-3"]
+
+    # Después de urgent (de ana) le toca a beto aunque a-2 sea más antiguo
+    for expected in ("urgent", "b-1", "a-2", "a-3"):
+        fake.release(fake.started[-1])
+        fake.wait_started(len(fake.started) + 1)
+        assert fake.started[-1] == expected
+
+
+def test_discard_queued_run(fake):
+    scheduler = RunScheduler(fake.execute, SchedulerConfig(max_concurrent_runs=1))
+    scheduler.submit("r1", _config())
+    scheduler.submit("r2", _config())
+
+    assert scheduler.discard("r2")
+    assert not scheduler.discard("r1")  # ya arrancó
+    assert scheduler.snapshot()["queued"] == []
+
+
+def test_start_run_and_orphaned_queue(db):
+    store = ResultStore(db)
+    queued = store.create_run("demo", {}, status="queued")
+    orphan = store.create_run("demo", {}, status="queued")
+
+    assert store.start_run(queued)
+    assert not store.start_run(queued)
+    assert fail_orphaned_queued_runs(db) == 1
+    run = store.get_run(orphan)
+    assert run.status == "failed" and "reiniciar" in run.stop_reason and run.completed_at is not None
+    assert store.get_run(queued).status == "running"
+
+
+def test_parse_plugin_limits():
+    assert parse_plugin_limits(" api=1, demo = 4,") == {"api": 1, "demo": 4}
+    with pytest.raises(ValueError, match="SCHEDULER_PLUGIN_LIMITS"):
+        parse_plugin_limits("api")
@@ -0,0 +1,75 @@
+"""Tests para el serializador JSON (orjson / stdlib)"""
+import json
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import serialization
+from app.core.serialization import FastJSONResponse, JSONSerializer
+from app.core.store import ResultStore
+from app.models.db import Base
+from app.models.dto import Case, Compare, Pred
+
+
+@pytest.mark.parametrize("backend", serialization.available_backends())
+def test_backends_roundtrip_through_engine(backend):
+    """Las columnas JSON se leen igual con cualquier backend"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+        **JSONSerializer(backend).engine_options(),
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        store = ResultStore(db)
+        run_id = store.create_run("demo", {"ñandú": 1})
+        data = {"label": "T1", "texto": "áéí", "nested": {"a": [1, 2.5, None]}}
+        store.save_detail(
+            run_id,
+            Case(id="c1", data=data),
+            Pred(ok=True, value="T1", status="success", meta={"tokens": 3}),
+            Compare(match=True, truth="T1", pred="T1", reason="Match", detail={"score": 0.9}),
+        )
+
+        detail = store.get_run_details(run_id)[0]
+        assert store.load_case_data(detail) == data
+        assert detail.pred_meta == {"tokens": 3}
+        assert detail.compare_detail == {"score": 0.9}
+        assert store.get_run(run_id).config == {"ñandú": 1}
+    finally:
+        db.close()
+        engine.dispose()
+
+
+@pytest.mark.parametrize("backend", serialization.available_backends())
+def test_backends_produce_same_json(backend):
+    encoder = JSONSerializer(backend)
+    payload = {"texto": "ñ", 1: [True, None, 1.5]}
+
+    assert json.loads(encoder.dumps(payload)) == {"texto": "ñ", "1": [True, None, 1.5]}
+    assert encoder.loads(encoder.dumps_bytes(payload)) == encoder.loads(encoder.dumps(payload))
+
+
+def test_resolve_backend(monkeypatch):
+    monkeypatch.setenv("JSON_SERIALIZER", "json")
+    assert serialization.resolve_backend() == "json"
+    assert serialization.resolve_backend("") in serialization.available_backends()
+    with pytest.raises(ValueError, match="JSON_SERIALIZER"):
+        serialization.resolve_backend("ujson")
+
+
+def test_fast_json_response_renders_content():
+    response = FastJSONResponse([{"case_id": "c1", "case_data": {"texto": "ñ"}}])
+
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == [{"case_id": "c1", "case_data": {"texto": "ñ"}}]
+
+
+@pytest.mark.skipif(serialization.orjson is None, reason="orjson no instalado")
+def test_orjson_serializes_numpy():
+    assert json.loads(JSONSerializer("orjson").dumps({"scores": np.array([1, 2])})) == {"scores": [1, 2]}
@@ -0,0 +1,195 @@
+"""Tests para el smoke test de plugins (PluginFactory.smoke_test y jobs en background)"""
+import threading
+import time
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.api import plugin_routes
+from app.core import sandbox
+from app.core.plugin import DemoPlugin, PluginFactory
+from app.core.smoke_tests import SmokeTestJobs
+from app.models.db import Plugin
+from app.models.dto import Case, PluginCreate, PluginUpdate
+
+SLOW_CODE = '''
+import time
+
+class SlowSourcePlugin(TestPlugin):
+    def obtener_casos(self, config):
+        time.sleep(30)
+        return []
+
+    def ejecutar_test(self, caso, config):
+        return Pred(ok=True, value="T1", status="success")
+
+    def comparar_resultados(self, caso, pred, config):
+        return Compare(match=True, truth="T1", pred=pred.value, reason="Match")
+'''
+
+FAST_CODE = SLOW_CODE.replace("time.sleep(30)\n        return []", "return [Case(id='c1', data={})]")
+
+
+class LazySourcePlugin(DemoPlugin):
+    """Fuente "infinita": sólo se puede probar pidiendo el primer caso"""
+
+    pulled = 0
+    closed = False
+
+    def obtener_casos(self, config):
+        try:
+            while True:
+                LazySourcePlugin.pulled += 1
+                yield Case(id=f"c{LazySourcePlugin.pulled}", data={"expected_tipo": "T1"})
+        finally:
+            LazySourcePlugin.closed = True
+
+
+class HangingPlugin(DemoPlugin):
+    def ejecutar_test(self, caso, config):
+        time.sleep(2)
+        return super().ejecutar_test(caso, config)
+
+
+@pytest.fixture
+def plugins():
+    LazySourcePlugin.pulled, LazySourcePlugin.closed = 0, False
+    original_session = PluginFactory._db_session
+    PluginFactory.register("test_lazy", LazySourcePlugin)
+    PluginFactory.register("test_hanging", HangingPlugin)
+    try:
+        yield
+    finally:
+        PluginFactory._plugins.pop("test_lazy", None)
+        PluginFactory._plugins.pop("test_hanging", None)
+        PluginFactory._stuck_smoke_tests.pop("test_hanging", None)
+        PluginFactory._db_session = original_session
+
+
+def test_smoke_test_pulls_only_first_case(db, plugins):
+    result = PluginFactory.smoke_test("test_lazy", db)
+
+    assert result.success and not result.timed_out
+    assert LazySourcePlugin.pulled == 1 and LazySourcePlugin.closed
+    assert set(result.timings_ms) == {"load", "setup", "obtener_casos", "ejecutar_test", "comparar_resultados",
+                                      "teardown"}
+    assert result.total_ms >= sum(result.timings_ms.values()) - 1
+
+
+def test_smoke_test_timeout(db, plugins):
+    started = time.perf_counter()
+    result = PluginFactory.smoke_test("test_hanging", db, timeout=0.2)
+
+    assert time.perf_counter() - started < 1.5
+    assert not result.success and result.timed_out
+    assert result.phase == "ejecutar_test" and "0.2s" in result.message
+    assert "setup" in result.timings_ms and "ejecutar_test" not in result.timings_ms
+
+
+def test_smoke_test_refused_while_previous_is_stuck(db, plugins, monkeypatch):
+    """Un reintento no lanza otro thread mientras el anterior sigue colgado"""
+    torn_down = threading.Event()
+    monkeypatch.setattr(HangingPlugin, "teardown", lambda self: torn_down.set(), raising=False)
+
+    assert PluginFactory.smoke_test("test_hanging", db, timeout=0.2).timed_out
+    retry = PluginFactory.smoke_test("test_hanging", db, timeout=0.2)
+
+    assert not retry.success and not retry.timed_out and "sigue corriendo" in retry.message
+    # Cuando el plugin devuelve el control corre teardown y se puede volver a probar
+    assert torn_down.wait(5)
+    PluginFactory._stuck_smoke_tests["test_hanging"].join(5)
+    assert PluginFactory.smoke_test("test_hanging", db, timeout=0.2).timed_out
+
+
+def test_smoke_test_reports_failed_phase(db):
+    db.add(Plugin(plugin_name="no-cases", display_name="x", config_schema={}, code=SLOW_CODE.replace(
+        "time.sleep(30)\n        return []", "return []")))
+    db.commit()
+
+    result = PluginFactory.smoke_test("no-cases", db)
+
+    assert not result.success and result.phase == "obtener_casos"
+    assert "no genera casos" in result.message and "teardown" in result.timings_ms
+    # Error de ejecución: el plugin no queda en status=error
+    assert db.get(Plugin, "no-cases").status == "active"
+
+
+def test_sandbox_timeout_kills_worker(db, monkeypatch):
+    monkeypatch.setenv("PLUGIN_EXECUTION_MODE", "subprocess")
+    original_session = PluginFactory._db_session
+    db.add(Plugin(plugin_name="sb-slow", display_name="x", code=SLOW_CODE, config_schema={}))
+    db.commit()
+    try:
+        started = time.perf_counter()
+        result = PluginFactory.smoke_test("sb-slow", db, timeout=1.0)
+
+        assert result.timed_out and result.phase == "obtener_casos"
+        assert time.perf_counter() - started < 10
+    finally:
+        sandbox.shutdown_pools()
+        PluginFactory._db_session = original_session
+
+
+def test_background_smoke_test_job(db, monkeypatch):
+    jobs = SmokeTestJobs(sessionmaker(bind=db.get_bind()))
+    monkeypatch.setattr(plugin_routes, "smoke_tests", jobs)
+    original_session = PluginFactory._db_session
+    monkeypatch.setenv("PLUGIN_TEST_TIMEOUT_SECONDS", "0.5")
+    try:
+        info = plugin_routes.create_plugin(
+            PluginCreate(plugin_name="bg-slow", display_name="x", code=SLOW_CODE),
+            background_test=True, db=db,
+        )
+        assert info.test_job_id and info.status == "active"
+        # Un segundo pedido mientras corre devuelve el mismo job
+        assert plugin_routes.test_plugin("bg-slow", background=True, db=db).job_id == info.test_job_id
+
+        deadline = time.monotonic() + 5
+        job = plugin_routes.get_test_job("bg-slow", info.test_job_id)
+        while job.status == "running" and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert job.status == "completed" and job.result.timed_out
+
+        db.expire_all()
+        plugin = db.get(Plugin, "bg-slow")
+        assert "superó" in plugin.error_message and plugin.last_test_at is not None
+        with pytest.raises(Exception):
+            plugin_routes.get_test_job("otro", info.test_job_id)
+    finally:
+        PluginFactory._db_session = original_session
+
+
+def _wait(job_id, plugin_name, timeout=5):
+    deadline = time.monotonic() + timeout
+    job = plugin_routes.get_test_job(plugin_name, job_id)
+    while job.status == "running" and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return job
+
+
+def test_update_starts_new_background_job(db, monkeypatch):
+    """Un update no reutiliza el job del código viejo, que tampoco pisa el estado"""
+    jobs = SmokeTestJobs(sessionmaker(bind=db.get_bind()))
+    monkeypatch.setattr(plugin_routes, "smoke_tests", jobs)
+    monkeypatch.setenv("PLUGIN_TEST_TIMEOUT_SECONDS", "0.5")
+    original_session = PluginFactory._db_session
+
+    old = plugin_routes.create_plugin(
+        PluginCreate(plugin_name="bg-update", display_name="x", code=SLOW_CODE),
+        background_test=True, db=db,
+    )
+    time.sleep(0.2)  # que el primer job cargue el código viejo
+    new = plugin_routes.update_plugin(
+        "bg-update", PluginUpdate(code=FAST_CODE),
+        background_test=True, db=db,
+    )
+
+    assert new.test_job_id != old.test_job_id
+    assert _wait(new.test_job_id, "bg-update").result.success
+    assert _wait(old.test_job_id, "bg-update").result.timed_out
+    # Los jobs usan su propia sesión sin tocar la de PluginFactory
+    assert PluginFactory._db_session is original_session
+
+    db.expire_all()
+    plugin = db.get(Plugin, "bg-update")
+    assert plugin.status == "active" and plugin.error_message is None
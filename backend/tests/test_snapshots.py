@@ -0,0 +1,183 @@
+"""Tests para los snapshots locales de obtener_casos"""
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from app.core.plugin import DemoPlugin, PluginFactory
+from app.core.runner import MassTestRunner
+from app.core.snapshots import SnapshotCache, SnapshotConfig, SnapshotReader, write_snapshot
+from app.core.store import ResultStore
+from app.models.dto import Case, RunConfig
+
+
+def make_cases(n, prefix="c"):
+    return [Case(id=f"{prefix}{i}", data={"text": f"caso {i}", "label": "T1", "n": i}) for i in range(n)]
+
+
+class Source:
+    """obtener_casos que cuenta cuántas veces se llamó"""
+
+    def __init__(self, casos):
+        self.casos = casos
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        yield from self.casos
+
+
+class RemotePlugin(DemoPlugin):
+    """Plugin cuyo obtener_casos es caro (cuenta las llamadas)"""
+
+    fetches = 0
+
+    def obtener_casos(self, config):
+        RemotePlugin.fetches += 1
+        for i in range(config.get("num_casos", 30)):
+            yield Case(id=f"r{i}", data={"text": f"caso {i}", "label": "T1"})
+
+
+@pytest.fixture
+def remote():
+    RemotePlugin.fetches = 0
+    original_session = PluginFactory._db_session
+    PluginFactory.register("test_remote", RemotePlugin)
+    try:
+        yield RemotePlugin
+    finally:
+        PluginFactory._plugins.pop("test_remote", None)
+        PluginFactory._db_session = original_session
+
+
+def test_roundtrip_with_index(tmp_path):
+    casos = make_cases(2500)
+    path = tmp_path / "demo.snap"
+    write_snapshot(path, iter(casos), block_size=1000)
+
+    with SnapshotReader(path) as reader:
+        assert len(reader) == 2500 and len(reader._blocks) == 3
+        assert list(reader) == casos
+        assert reader.case(1500) == casos[1500] and reader.case(2499) == casos[2499]
+        with pytest.raises(IndexError):
+            reader.case(2500)
+    assert not [p for p in tmp_path.iterdir() if p.suffix == ".tmp"]
+
+
+def test_reuses_snapshot_until_refresh(tmp_path):
+    cache = SnapshotCache(SnapshotConfig(directory=str(tmp_path), block_size=100))
+    source = Source(make_cases(250))
+
+    first = list(cache.cases("demo", {"a": 1, "b": [1, 2]}, source))
+    # Mismo dict con otro orden de claves: misma clave de snapshot
+    second = list(cache.cases("demo", {"b": [1, 2], "a": 1}, source))
+    assert source.calls == 1 and first == second == source.casos
+
+    list(cache.cases("demo", {"a": 2}, source))
+    assert source.calls == 2
+
+    list(cache.cases("demo", {"a": 1, "b": [1, 2]}, source, refresh=True))
+    assert source.calls == 3
+
+
+def test_expired_snapshot_is_rebuilt(tmp_path):
+    cache = SnapshotCache(SnapshotConfig(directory=str(tmp_path), ttl_seconds=0))
+    source = Source(make_cases(10))
+
+    list(cache.cases("demo", {}, source))
+    time.sleep(0.01)
+    list(cache.cases("demo", {}, source))
+
+    assert source.calls == 2
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = SnapshotCache(SnapshotConfig(directory=str(tmp_path)))
+    for name in ("a", "b"):
+        cache.cases(name, {}, Source(make_cases(200, name))).close()
+    size = cache.path("a", {}).stat().st_size
+    old = time.time() - 100
+    os.utime(cache.path("a", {}), (old, cache.path("a", {}).stat().st_mtime))
+    os.utime(cache.path("b", {}), (old - 100, cache.path("b", {}).stat().st_mtime))
+    # Usar "a" lo deja como el más reciente
+    cache.cases("a", {}, Source([])).close()
+
+    cache.config.max_bytes = 2 * size + size // 2
+    cache.cases("c", {}, Source(make_cases(200, "c"))).close()
+
+    assert sorted(p.name.split("-")[0] for p in tmp_path.glob("*.snap")) == ["a", "c"]
+
+
+def test_failed_source_leaves_nothing(tmp_path):
+    cache = SnapshotCache(SnapshotConfig(directory=str(tmp_path)))
+
+    def broken():
+        yield Case(id="c0", data={})
+        raise ConnectionError("FTP caído")
+
+    with pytest.raises(ConnectionError):
+        cache.cases("demo", {}, broken)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_corrupt_snapshot_is_rebuilt(tmp_path):
+    cache = SnapshotCache(SnapshotConfig(directory=str(tmp_path)))
+    source = Source(make_cases(5))
+    cache.cases("demo", {}, source).close()
+    cache.path("demo", {}).write_bytes(b"basura")
+
+    assert list(cache.cases("demo", {}, source)) == source.casos
+    assert source.calls == 2
+
+
+def test_runner_reads_from_snapshot(db, remote, tmp_path):
+    store = ResultStore(db)
+    runner = MassTestRunner(store, snapshots=SnapshotCache(SnapshotConfig(directory=str(tmp_path))))
+    config = RunConfig(plugin_name="test_remote", config={"num_casos": 40})
+
+    first = runner.run(config, db)
+    second = runner.run(config, db)
+    assert remote.fetches == 1
+    for result in (first, second):
+        run = store.get_run(result.run_id)
+        assert run.status == "completed" and run.total_cases == run.processed_cases == 40
+
+    runner.run(config.model_copy(update={"refresh_snapshot": True}), db)
+    assert remote.fetches == 2
+
+
+def test_refresh_while_another_run_reads(tmp_path, monkeypatch):
+    """Con el snapshot abierto (Windows: no se puede borrar) el refresh escribe otra generación"""
+    cache = SnapshotCache(SnapshotConfig(directory=str(tmp_path)))
+    source = Source(make_cases(30))
+    reading = cache.cases("demo", {}, source)
+    old = reading.path
+    unlink = Path.unlink
+
+    def locked_unlink(self, *args, **kwargs):
+        if self == old:
+            raise PermissionError(13, "El archivo está siendo usado por otro proceso", str(self))
+        return unlink(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "unlink", locked_unlink)
+    with cache.cases("demo", {}, source, refresh=True) as fresh:
+        assert fresh.path != old and cache.path("demo", {}) == fresh.path
+    assert source.calls == 2 and list(reading) == source.casos
+    assert old.exists()
+
+    reading.close()
+    monkeypatch.setattr(Path, "unlink", unlink)
+    assert cache.evict() == 1 and not old.exists()
+
+
+def test_reader_without_pread(tmp_path, monkeypatch):
+    """Sin os.pread (Windows) se lee con seek + read"""
+    path = tmp_path / "x.snap"
+    write_snapshot(path, make_cases(25), block_size=10)
+    monkeypatch.delattr(os, "pread")
+
+    with SnapshotReader(path) as reader:
+        assert len(reader) == 25
+        assert reader.case(13).id == make_cases(25)[13].id
+        assert [c.id for c in reader] == [c.id for c in make_cases(25)]
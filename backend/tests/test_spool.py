@@ -0,0 +1,192 @@
+"""Tests para el spool local de resultados (SPOOL_DIR)"""
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.api import routes
+from app.core import spool
+from app.core.runner import MassTestRunner
+from app.core.spool import SpoolConfig, SpoolDrainer, SpoolPending, encode_record
+from app.core.store import ResultStore
+from app.models.db import RunDetail
+from app.models.dto import RunConfig
+
+
+@pytest.fixture
+def config(tmp_path):
+    return SpoolConfig(directory=str(tmp_path), flush_size=5, drain_batch=7, drain_interval=0.01, drain_timeout=10)
+
+
+@pytest.fixture
+def flaky_db(monkeypatch):
+    """save_details falla las primeras `failures` veces (base caída)"""
+    state = {"failures": 0, "calls": 0}
+    real_save = ResultStore.save_details
+
+    def save_details(self, *args, **kwargs):
+        state["calls"] += 1
+        if state["failures"]:
+            state["failures"] -= 1
+            raise OperationalError("INSERT", {}, Exception("connection refused"))
+        return real_save(self, *args, **kwargs)
+
+    monkeypatch.setattr(ResultStore, "save_details", save_details)
+    return state
+
+
+def _detail_count(db, run_id):
+    return db.query(RunDetail).filter(RunDetail.run_id == run_id).count()
+
+
+def _write_spool(path, num_casos, end=True, truncated=False, end_record=("e",)):
+    with open(path, "wb") as f:
+        f.write(encode_record(["t", num_casos]))
+        for i in range(num_casos):
+            f.write(encode_record([
+                "d", f"c{i}", {"label": "A"}, True, "A", "success", None, {}, True, "A", "A", "Match", {},
+            ]))
+        if end:
+            f.write(encode_record(list(end_record)))
+        if truncated:
+            f.write(encode_record(["d", "roto"])[:6])
+
+
+def test_run_through_spool(db, config):
+    store = ResultStore(db)
+
+    result = MassTestRunner(store, config).run(RunConfig(plugin_name="demo", config={"num_casos": 23}), db)
+
+    run = store.get_run(result.run_id)
+    db.refresh(run)
+    assert run.status == "completed"
+    assert run.total_cases == 23 and run.processed_cases == 23
+    assert _detail_count(db, result.run_id) == 23
+    assert run.spool_offset > 0
+    assert not config.path(result.run_id).exists()
+
+
+def test_database_outage_does_not_fail_run(db, config, flaky_db):
+    flaky_db["failures"] = 3
+    store = ResultStore(db)
+
+    result = MassTestRunner(store, config).run(RunConfig(plugin_name="demo", config={"num_casos": 30}), db)
+
+    assert flaky_db["calls"] > 3
+    assert store.get_run(result.run_id).status == "completed"
+    assert _detail_count(db, result.run_id) == 30
+
+
+def test_pending_spool_is_replayed(db, config, flaky_db):
+    flaky_db["failures"] = 10 ** 6
+    config.drain_timeout = 0.2
+    store = ResultStore(db)
+
+    with pytest.raises(SpoolPending):
+        MassTestRunner(store, config).run(RunConfig(plugin_name="demo", config={"num_casos": 12}), db)
+
+    run = store.get_runs()[0]
+    # Los resultados quedaron en disco y el run no se marcó como failed
+    assert run.status == "running"
+    assert config.path(run.run_id).exists()
+
+    # La base vuelve: el drainer del server lo termina de volcar y cierra el run
+    flaky_db["failures"] = 0
+    drainer = SpoolDrainer(sessionmaker(bind=db.get_bind()), config)
+    # El flock se suelta cuando el drainer del run termina su último intento
+    deadline = time.monotonic() + 5
+    replayed = drainer.replay()
+    while not replayed and time.monotonic() < deadline:
+        time.sleep(0.01)
+        replayed = drainer.replay()
+    assert replayed == {run.run_id: "completed"}
+    db.refresh(run)
+    assert run.processed_cases == 12 and _detail_count(db, run.run_id) == 12
+    assert run.accuracy is not None
+    assert not config.path(run.run_id).exists()
+
+
+def test_replay_resumes_from_offset(db, config):
+    store = ResultStore(db)
+    run_id = store.create_run("demo", {})
+    path = config.path(run_id)
+    _write_spool(path, 20, truncated=True)
+
+    # Un volcado anterior llegó hasta la mitad: el replay no duplica filas
+    records = spool.read_records(path, 0, 11)
+    store.save_details(run_id, [spool._detail_from_record(r) for _, r in records[1:]], spool_offset=records[-1][0])
+
+    assert SpoolDrainer(sessionmaker(bind=db.get_bind()), config).replay() == {run_id: "completed"}
+    assert _detail_count(db, run_id) == 20
+    assert store.get_run(run_id).processed_cases == 20
+
+
+def test_replay_without_end_marks_run_failed(db, config):
+    store = ResultStore(db)
+    run_id = store.create_run("demo", {})
+    _write_spool(config.path(run_id), 5, end=False)
+
+    assert SpoolDrainer(sessionmaker(bind=db.get_bind()), config).replay() == {run_id: "failed"}
+    assert _detail_count(db, run_id) == 5
+
+
+@pytest.mark.skipif(spool.fcntl is None, reason="flock sólo en POSIX")
+def test_replay_skips_spool_of_live_run(db, config):
+    store = ResultStore(db)
+    run_id = store.create_run("demo", {})
+
+    with spool.SpoolWriter(store, run_id, config):
+        assert SpoolDrainer(sessionmaker(bind=db.get_bind()), config).replay() == {}
+    assert not config.path(run_id).exists()
+
+
+def test_invalid_fsync_policy():
+    with pytest.raises(ValueError, match="SPOOL_FSYNC"):
+        SpoolConfig(directory="x", fsync="sometimes")
+
+
+def test_replay_closes_run_with_recorded_outcome(db, config):
+    """El registro de fin trae el estado final del runner (no siempre "completed")"""
+    store = ResultStore(db)
+    run_id = store.create_run("demo", {})
+    outcome = {"status": "cancelled", "stop_reason": "Cancelado por el usuario", "sampling": {"n": 4}}
+    _write_spool(config.path(run_id), 4, end_record=("e", outcome))
+
+    assert SpoolDrainer(sessionmaker(bind=db.get_bind()), config).replay() == {run_id: "cancelled"}
+    run = store.get_run(run_id)
+    db.refresh(run)
+    assert run.stop_reason == "Cancelado por el usuario" and run.sampling == {"n": 4}
+    assert run.accuracy == 1.0 and _detail_count(db, run_id) == 4
+
+
+def test_background_task_keeps_pending_spool_running(db, monkeypatch):
+    """SpoolPending no marca el run como failed: lo cierra el SpoolDrainer"""
+    def pending(self, run_id, config, db):
+        raise SpoolPending("spool pendiente")
+
+    monkeypatch.setattr(routes, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    monkeypatch.setattr(MassTestRunner, "run_existing", pending)
+    store = ResultStore(db)
+    run_id = store.create_run("demo", {}, status="queued")
+
+    routes.run_background_task(run_id, RunConfig(plugin_name="demo"))
+
+    db.expire_all()
+    assert store.get_run(run_id).status == "running"
+
+
+def test_replay_without_lock_only_at_startup(db, config, monkeypatch):
+    """Sin lock de archivos sólo el primer replay toma spools (los demás pueden ser de runs vivos)"""
+    monkeypatch.setattr(spool, "CAN_LOCK", False)
+    store = ResultStore(db)
+    drainer = SpoolDrainer(sessionmaker(bind=db.get_bind()), config)
+    first = store.create_run("demo", {})
+    _write_spool(config.path(first), 3)
+
+    assert drainer.replay() == {first: "completed"}
+
+    live = store.create_run("demo", {})
+    _write_spool(config.path(live), 3, end=False)
+    assert drainer.replay() == {}
+    assert config.path(live).exists()
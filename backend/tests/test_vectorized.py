@@ -0,0 +1,79 @@
+"""Tests para la comparación vectorizada (comparar_vectorizado)"""
+import numpy as np
+import pytest
+
+from app.core.plugin import DemoPlugin, PluginFactory, supports_vectorized_compare
+from app.core.runner import MassTestRunner
+from app.core.store import ResultStore
+from app.core.vectorized import compare_vectorized
+from app.models.dto import Case, Pred, RunConfig
+
+
+class TablePlugin(DemoPlugin):
+    """Plugin tabular: acierta en los casos pares y compara con pandas"""
+
+    def obtener_casos(self, config):
+        return [Case(id=f"c{i}", data={"label": "T1", "row": i}) for i in range(config.get("num_casos", 10))]
+
+    def ejecutar_test(self, caso, config):
+        if caso.data["row"] % 5 == 4:
+            return Pred(ok=False, status="error")
+        value = "T1" if caso.data["row"] % 2 == 0 else "T2"
+        return Pred(ok=True, value=value, status="success")
+
+    def comparar_resultados(self, caso, pred, config):
+        raise AssertionError("No debería compararse caso por caso")
+
+    def comparar_vectorizado(self, casos, preds, config):
+        match = preds["ok"] & (casos["label"] == preds["value"])
+        reason = np.where(match, "Match", np.where(preds["ok"], "Mismatch", "Error en ejecución"))
+        return {"match": match, "reason": reason, "truth": casos["label"]}
+
+
+@pytest.fixture
+def table_plugin():
+    original_session = PluginFactory._db_session
+    PluginFactory.register("test_table", TablePlugin)
+    try:
+        yield TablePlugin
+    finally:
+        PluginFactory._plugins.pop("test_table", None)
+        PluginFactory._db_session = original_session
+
+
+def test_compare_vectorized_builds_compares():
+    casos = [Case(id="a", data={"label": "T1"}), Case(id="b", data={})]
+    preds = [Pred(ok=True, value="T1", status="success"), Pred(ok=False, status="error")]
+
+    cmps = compare_vectorized(TablePlugin(), casos, preds, {})
+
+    assert [c.match for c in cmps] == [True, False]
+    assert [c.reason for c in cmps] == ["Match", "Error en ejecución"]
+    assert [c.truth for c in cmps] == ["T1", None]  # NaN de la clave faltante -> None
+    assert [c.pred for c in cmps] == ["T1", None]
+
+
+def test_compare_vectorized_requires_match_and_reason():
+    class Broken(TablePlugin):
+        def comparar_vectorizado(self, casos, preds, config):
+            return {"match": [True]}
+
+    with pytest.raises(ValueError, match="'match' y 'reason'"):
+        compare_vectorized(Broken(), [Case(id="a", data={"label": "T1"})], [Pred(ok=True, status="success")], {})
+
+
+def test_runner_uses_vectorized_compare(db, table_plugin):
+    assert supports_vectorized_compare(TablePlugin())
+    assert not supports_vectorized_compare(DemoPlugin())
+
+    store = ResultStore(db)
+    result = MassTestRunner(store).run(
+        RunConfig(plugin_name="test_table", config={"num_casos": 20}, batch_size=8), db
+    )
+
+    details = {d.case_id: d for d in store.get_run_details(result.run_id, limit=100)}
+    assert len(details) == 20
+    assert details["c0"].match and details["c0"].mismatch_reason is None
+    assert details["c1"].mismatch_reason == "Mismatch"
+    assert details["c4"].mismatch_reason == "Error en ejecución"
+    assert result.metrics.error_rate == pytest.approx(0.2)
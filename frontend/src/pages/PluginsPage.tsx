@@ -2,6 +2,9 @@ import { useState, useEffect } from 'react'
 import { apiService, PluginInfo, PluginCreate, PluginUpdate } from '../services/api'
 import './PluginsPage.css'
 
+// Plugins built-in del backend (no editables ni eliminables)
+const BUILTIN_PLUGINS = ['demo', 'loadtest']
+
 function PluginsPage() {
   const [plugins, setPlugins] = useState<PluginInfo[]>([])
   const [loading, setLoading] = useState(true)
@@ -69,8 +72,8 @@ function PluginsPage() {
   }
 
   const handleEditClick = (plugin: PluginInfo) => {
-    if (plugin.plugin_name === 'demo') {
-      alert('No se puede editar el plugin demo')
+    if (BUILTIN_PLUGINS.includes(plugin.plugin_name)) {
+      alert(`No se puede editar el plugin ${plugin.plugin_name}`)
       return
     }
     setEditingPlugin(plugin)
@@ -143,8 +146,8 @@ function PluginsPage() {
   }
 
   const handleDelete = async (pluginName: string) => {
-    if (pluginName === 'demo') {
-      alert('No se puede eliminar el plugin demo')
+    if (BUILTIN_PLUGINS.includes(pluginName)) {
+      alert(`No se puede eliminar el plugin ${pluginName}`)
       return
     }
     if (!confirm(`¿Estás seguro de eliminar el plugin "${pluginName}"?`)) {
@@ -473,7 +476,7 @@ class TestPlugin:
                       <button
                         className="btn btn-sm btn-secondary"
                         onClick={() => handleEditClick(plugin)}
-                        disabled={plugin.plugin_name === 'demo'}
+                        disabled={BUILTIN_PLUGINS.includes(plugin.plugin_name)}
                       >
                         Editar
                       </button>
@@ -487,7 +490,7 @@ class TestPlugin:
                       <button
                         className="btn btn-sm btn-danger"
                         onClick={() => handleDelete(plugin.plugin_name)}
-                        disabled={plugin.plugin_name === 'demo'}
+                        disabled={BUILTIN_PLUGINS.includes(plugin.plugin_name)}
                       >
                         Eliminar
                       </button>
@@ -85,13 +85,21 @@ function RunDetailPage() {
     }
   }
 
-  const openCaseDetail = (detail: RunDetail) => {
+  const openCaseDetail = async (detail: RunDetail) => {
     setSelectedCase(detail)
     setCommentForm({
       comment: detail.comment || '',
       tag: detail.tag || '',
       reviewed: detail.reviewed,
     })
+    // raw/case_data en almacenamiento frío se cargan recién al abrir el caso
+    if (runId && detail.cold_storage) {
+      try {
+        setSelectedCase(await apiService.getRunDetail(runId, detail.case_id))
+      } catch (error) {
+        console.error('Error loading case detail:', error)
+      }
+    }
   }
 
   const formatPercent = (value: number | null) => {
@@ -50,6 +50,7 @@ export interface RunDetail {
   comment: string | null
   tag: string | null
   reviewed: boolean
+  cold_storage?: boolean
 }
 
 export interface CommentRequest {
@@ -123,6 +124,12 @@ export const apiService = {
     return response.data
   },
 
+  // Obtener el detalle completo de un caso (incluye payloads en almacenamiento frío)
+  getRunDetail: async (runId: string, caseId: string): Promise<RunDetail> => {
+    const response = await api.get(`/api/runs/${runId}/details/${caseId}`)
+    return response.data
+  },
+
   // Agregar comentario
   addComment: async (
     runId: string,